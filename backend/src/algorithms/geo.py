@@ -0,0 +1,255 @@
+"""
+Geohash helpers for radius search.
+
+A radius query picks the coarsest geohash precision whose cells are smaller
+than the radius, then scans every cell that overlaps the circle's bounding
+box as a prefix range (``geohash >= p`` and ``< p + "~"``). Cells are
+returned nearest first so a caller that only needs the closest ``limit``
+pets can stop once the next cell cannot beat what it already has. Cost
+tracks the number of pets near the point rather than the size of the
+catalog; hits are refined by exact haversine distance.
+"""
+
+import bisect
+import math
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+_DECODE = {c: i for i, c in enumerate(_BASE32)}
+
+EARTH_RADIUS_KM = 6371.0088
+PET_GEOHASH_PRECISION = 9
+# upper bound that sorts after every base32 character
+PREFIX_END = "~"
+# upper bound on prefix scans per radius query
+MAX_COVER_CELLS = 36
+
+# approximate cell width/height in km at the equator, by precision
+_CELL_KM = [
+    (5009.4, 4992.6),
+    (1252.3, 624.1),
+    (156.5, 156.0),
+    (39.1, 19.5),
+    (4.89, 4.89),
+    (1.22, 0.61),
+    (0.153, 0.153),
+    (0.0382, 0.0191),
+]
+
+
+def encode(lat: float, lon: float, precision: int = PET_GEOHASH_PRECISION) -> str:
+    lat_lo, lat_hi = -90.0, 90.0
+    lon_lo, lon_hi = -180.0, 180.0
+    out = []
+    bits, ch, even = 0, 0, True
+    while len(out) < precision:
+        if even:
+            mid = (lon_lo + lon_hi) / 2
+            if lon >= mid:
+                ch = (ch << 1) | 1
+                lon_lo = mid
+            else:
+                ch <<= 1
+                lon_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                ch = (ch << 1) | 1
+                lat_lo = mid
+            else:
+                ch <<= 1
+                lat_hi = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            out.append(_BASE32[ch])
+            bits, ch = 0, 0
+    return "".join(out)
+
+
+def decode_bbox(gh: str) -> Tuple[float, float, float, float]:
+    """(lat_lo, lat_hi, lon_lo, lon_hi) of a geohash cell."""
+    lat_lo, lat_hi = -90.0, 90.0
+    lon_lo, lon_hi = -180.0, 180.0
+    even = True
+    for c in gh:
+        v = _DECODE[c]
+        for shift in range(4, -1, -1):
+            bit = (v >> shift) & 1
+            if even:
+                mid = (lon_lo + lon_hi) / 2
+                lon_lo, lon_hi = (mid, lon_hi) if bit else (lon_lo, mid)
+            else:
+                mid = (lat_lo + lat_hi) / 2
+                lat_lo, lat_hi = (mid, lat_hi) if bit else (lat_lo, mid)
+            even = not even
+    return lat_lo, lat_hi, lon_lo, lon_hi
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def precision_for_radius(radius_km: float, lat: float) -> int:
+    """Coarsest precision whose cells are no bigger than the radius."""
+    shrink = max(0.01, math.cos(math.radians(lat)))
+    for i, (w, h) in enumerate(_CELL_KM, start=1):
+        if min(w * shrink, h) <= radius_km:
+            return i
+    return len(_CELL_KM)
+
+
+def _cell_degrees(precision: int) -> Tuple[float, float]:
+    bits = 5 * precision
+    return 180.0 / (1 << (bits // 2)), 360.0 / (1 << (bits - bits // 2))
+
+
+def _cover(lat: float, lon: float, radius_km: float, precision: int) -> List[str]:
+    """Every cell at ``precision`` that overlaps the circle's bounding box."""
+    cell_lat, cell_lon = _cell_degrees(precision)
+    n_lat, n_lon = round(180.0 / cell_lat), round(360.0 / cell_lon)
+    dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    lat_lo, lat_hi = max(-90.0, lat - dlat), min(90.0, lat + dlat)
+    rows = range(
+        int((lat_lo + 90) // cell_lat),
+        min(int((lat_hi + 90) // cell_lat), n_lat - 1) + 1,
+    )
+    # the box is widest in longitude at its most poleward edge; a circle
+    # that reaches a pole spans every longitude
+    cos_lat = math.cos(math.radians(max(abs(lat_lo), abs(lat_hi))))
+    if abs(lat) + dlat >= 90 or dlat / cos_lat >= 180:
+        cols = range(n_lon)
+    else:
+        dlon = dlat / cos_lat
+        first = int((lon - dlon + 180) // cell_lon)
+        last = int((lon + dlon + 180) // cell_lon)
+        cols = range(first, min(last, first + n_lon - 1) + 1)
+    return [
+        encode(
+            -90 + (r + 0.5) * cell_lat,
+            -180 + (c % n_lon + 0.5) * cell_lon,
+            precision,
+        )
+        for r in rows
+        for c in cols
+    ]
+
+
+def min_distance_km(lat: float, lon: float, gh: str) -> float:
+    """Distance from the point to the nearest point of a cell (0 if inside)."""
+    lat_lo, lat_hi, lon_lo, lon_hi = decode_bbox(gh)
+    # measure across the antimeridian when that side is closer
+    mid = (lon_lo + lon_hi) / 2
+    lon = min((lon - 360, lon, lon + 360), key=lambda x: abs(x - mid))
+    if lon_lo <= lon <= lon_hi:
+        return haversine_km(lat, lon, min(max(lat, lat_lo), lat_hi), lon)
+    # otherwise the nearest point is on an edge meridian: at a corner, or
+    # at the foot of the perpendicular when that falls inside the cell
+    best = math.inf
+    for edge in (lon_lo, lon_hi):
+        lats = [lat_lo, lat_hi]
+        dl = math.radians(abs(lon - edge))
+        if dl < math.pi / 2:
+            foot = math.degrees(math.atan(math.tan(math.radians(lat)) / math.cos(dl)))
+            lats.append(min(max(foot, lat_lo), lat_hi))
+        best = min(best, *(haversine_km(lat, lon, y, edge) for y in lats))
+    return best
+
+
+def query_prefixes(lat: float, lon: float, radius_km: float) -> List[str]:
+    """Cells covering the circle, nearest first.
+
+    Falls back one precision level when the finer cover would need more
+    than MAX_COVER_CELLS prefix scans.
+    """
+    precision = precision_for_radius(radius_km, lat)
+    cells = _cover(lat, lon, radius_km, precision)
+    if len(cells) > MAX_COVER_CELLS and precision > 1:
+        cells = _cover(lat, lon, radius_km, precision - 1)
+    ranked = sorted((min_distance_km(lat, lon, c), c) for c in set(cells))
+    return [c for d, c in ranked if d <= radius_km]
+
+
+def parse_coords(lat: Any, lon: Any) -> Optional[Tuple[float, float]]:
+    try:
+        lat_f, lon_f = float(lat), float(lon)
+    except (TypeError, ValueError):
+        return None
+    if not (-90 <= lat_f <= 90 and -180 <= lon_f <= 180):
+        return None
+    return lat_f, lon_f
+
+
+def geo_fields(lat: float, lon: float) -> Dict[str, Any]:
+    return {"lat": lat, "lon": lon, "geohash": encode(lat, lon)}
+
+
+class GeohashIndex:
+    """
+    Sorted (geohash, id) list for in-process radius queries, fed by
+    PetStore.subscribe() like the search index.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._keys: List[Tuple[str, str]] = []
+        self._coords: Dict[str, Tuple[str, float, float]] = {}
+
+    def __len__(self):
+        return len(self._keys)
+
+    def rebuild(self, pets):
+        with self._lock:
+            self._coords = {}
+            for p in pets:
+                c = parse_coords(p.get("lat"), p.get("lon"))
+                if c:
+                    self._coords[p["id"]] = (p.get("geohash") or encode(*c), *c)
+            self._keys = sorted((gh, pid) for pid, (gh, _, _) in self._coords.items())
+
+    def upsert(self, pet: Dict[str, Any]):
+        with self._lock:
+            self.remove(pet["id"])
+            c = parse_coords(pet.get("lat"), pet.get("lon"))
+            if not c:
+                return
+            gh = pet.get("geohash") or encode(*c)
+            self._coords[pet["id"]] = (gh, *c)
+            bisect.insort(self._keys, (gh, pet["id"]))
+
+    def remove(self, pet_id: str):
+        with self._lock:
+            old = self._coords.pop(pet_id, None)
+            if old is None:
+                return
+            i = bisect.bisect_left(self._keys, (old[0], pet_id))
+            if i < len(self._keys) and self._keys[i] == (old[0], pet_id):
+                del self._keys[i]
+
+    def on_store_change(self, kind: str, pet_id, before, after):
+        if kind == "RESET":
+            self.rebuild(after.values())
+        elif after is None:
+            self.remove(pet_id)
+        else:
+            self.upsert(after)
+
+    def near(self, lat: float, lon: float, radius_km: float) -> List[Tuple[float, str]]:
+        """``[(distance_km, pet_id)]`` within the radius, nearest first."""
+        hits = []
+        with self._lock:
+            for prefix in query_prefixes(lat, lon, radius_km):
+                i = bisect.bisect_left(self._keys, (prefix, ""))
+                end = bisect.bisect_left(self._keys, (prefix + PREFIX_END, ""))
+                for _, pid in self._keys[i:end]:
+                    _, plat, plon = self._coords[pid]
+                    d = haversine_km(lat, lon, plat, plon)
+                    if d <= radius_km:
+                        hits.append((d, pid))
+        hits.sort()
+        return hits
@@ -0,0 +1,291 @@
+"""
+Faceted search over pets.
+
+Each pet gets a dense integer slot, and every (field, value) pair keeps a
+posting list stored as a Python int bitset. A query ANDs one OR-ed mask per
+field, so any combination of filters is a handful of big-int operations,
+and facet counts are popcounts of the result mask against each posting.
+"""
+
+import bisect
+import heapq
+import re
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+# (label, lo, hi) with hi exclusive
+AGE_BUCKETS = [
+    ("0-6", 0, 6),
+    ("6-12", 6, 12),
+    ("12-36", 12, 36),
+    ("36-96", 36, 96),
+    ("96+", 96, 10**6),
+]
+
+FACET_FIELDS = ("species", "breedName", "size", "sex", "status", "city", "age")
+FILTER_FIELDS = FACET_FIELDS + ("breed", "shelter")
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_OLDEST = datetime.min.replace(tzinfo=timezone.utc)
+
+
+def _norm(v: Any) -> Optional[str]:
+    if v is None:
+        return None
+    s = str(v).strip().lower()
+    return s or None
+
+
+def breed_tokens(breed: Any) -> List[str]:
+    return _TOKEN_RE.findall(str(breed or "").lower())
+
+
+def age_bucket(age_months: Any) -> Optional[str]:
+    try:
+        age = int(age_months)
+    except (TypeError, ValueError):
+        return None
+    for label, lo, hi in AGE_BUCKETS:
+        if lo <= age < hi:
+            return label
+    return None
+
+
+def _terms(pet: Dict[str, Any]) -> Dict[str, List[str]]:
+    out = {
+        "species": [_norm(pet.get("species"))],
+        "breedName": [_norm(pet.get("breed"))],
+        "breed": breed_tokens(pet.get("breed")),
+        "size": [_norm(pet.get("size"))],
+        "sex": [_norm(pet.get("sex"))],
+        "status": [_norm(pet.get("status"))],
+        "city": [_norm(pet.get("locationCity"))],
+        "age": [age_bucket(pet.get("ageMonths"))],
+        "shelter": [pet.get("shelterId")],
+    }
+    return {f: [v for v in vs if v] for f, vs in out.items()}
+
+
+def _edit_distance(a: str, b: str, cap: int) -> int:
+    if abs(len(a) - len(b)) > cap:
+        return cap + 1
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        if min(cur) > cap:
+            return cap + 1
+        prev = cur
+    return prev[-1]
+
+
+def _slots(mask: int) -> Iterable[int]:
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def _created_key(p: Dict[str, Any]):
+    ts = p.get("createdAt")
+    if isinstance(ts, datetime):
+        return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+    return _OLDEST
+
+
+class PetSearchIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._clear()
+
+    def _clear(self):
+        self._slot_of: Dict[str, int] = {}
+        self._docs: List[Optional[Dict[str, Any]]] = []
+        # createdAt per slot, so a page is a top-k pick instead of a full sort
+        self._created: List[datetime] = []
+        self._terms: List[Optional[Dict[str, List[str]]]] = []
+        self._free: List[int] = []
+        self._all = 0
+        self._postings: Dict[str, Dict[str, int]] = {f: {} for f in FILTER_FIELDS}
+        self._vocab: List[str] = []
+
+    def __len__(self):
+        return len(self._slot_of)
+
+    # --- maintenance ---
+    def rebuild(self, pets: Iterable[Dict[str, Any]]):
+        with self._lock:
+            self._clear()
+            for p in pets:
+                self._add(p)
+            self._vocab = sorted(self._postings["breed"])
+
+    def upsert(self, pet: Dict[str, Any]):
+        with self._lock:
+            self._remove(pet["id"])
+            self._add(pet)
+            self._vocab = sorted(self._postings["breed"])
+
+    def remove(self, pet_id: str):
+        with self._lock:
+            self._remove(pet_id)
+            self._vocab = sorted(self._postings["breed"])
+
+    def on_store_change(self, kind: str, pet_id, before, after):
+        """PetStore.subscribe() callback."""
+        if kind == "RESET":
+            self.rebuild(after.values())
+        elif after is None:
+            self.remove(pet_id)
+        else:
+            self.upsert(after)
+
+    def _add(self, pet: Dict[str, Any]):
+        slot = self._free.pop() if self._free else len(self._docs)
+        if slot == len(self._docs):
+            self._docs.append(None)
+            self._created.append(_OLDEST)
+            self._terms.append(None)
+        terms = _terms(pet)
+        self._slot_of[pet["id"]] = slot
+        self._docs[slot] = dict(pet)
+        self._created[slot] = _created_key(pet)
+        self._terms[slot] = terms
+        bit = 1 << slot
+        self._all |= bit
+        for field, values in terms.items():
+            postings = self._postings[field]
+            for v in values:
+                postings[v] = postings.get(v, 0) | bit
+
+    def _remove(self, pet_id: str):
+        slot = self._slot_of.pop(pet_id, None)
+        if slot is None:
+            return
+        bit = 1 << slot
+        self._all &= ~bit
+        for field, values in self._terms[slot].items():
+            postings = self._postings[field]
+            for v in values:
+                left = postings.get(v, 0) & ~bit
+                if left:
+                    postings[v] = left
+                else:
+                    postings.pop(v, None)
+        self._docs[slot] = None
+        self._terms[slot] = None
+        self._free.append(slot)
+
+    # --- queries ---
+    def _breed_matches(self, prefix: Optional[str], fuzzy: Optional[str]) -> List[str]:
+        tokens: List[str] = []
+        if prefix:
+            p = prefix.lower()
+            i = bisect.bisect_left(self._vocab, p)
+            while i < len(self._vocab) and self._vocab[i].startswith(p):
+                tokens.append(self._vocab[i])
+                i += 1
+        if fuzzy:
+            for q in breed_tokens(fuzzy):
+                cap = 0 if len(q) <= 2 else (1 if len(q) <= 5 else 2)
+                tokens.extend(
+                    t for t in self._vocab if _edit_distance(q, t, cap) <= cap
+                )
+        return tokens
+
+    def _field_masks(
+        self,
+        filters: Dict[str, List[str]],
+        age_min: Optional[int],
+        age_max: Optional[int],
+        breed_prefix: Optional[str],
+        breed_fuzzy: Optional[str],
+    ) -> Dict[str, int]:
+        masks: Dict[str, int] = {}
+        for field, values in filters.items():
+            if field not in self._postings:
+                raise KeyError(f"unknown filter: {field}")
+            wanted = [
+                v if field == "shelter" else _norm(v) for v in values if v is not None
+            ]
+            if not wanted:
+                continue
+            m = 0
+            for v in wanted:
+                m |= self._postings[field].get(v, 0)
+            masks[field] = m
+
+        if breed_prefix or breed_fuzzy:
+            m = 0
+            for t in self._breed_matches(breed_prefix, breed_fuzzy):
+                m |= self._postings["breed"].get(t, 0)
+            masks["breed"] = masks["breed"] & m if "breed" in masks else m
+
+        if age_min is not None or age_max is not None:
+            lo = age_min if age_min is not None else 0
+            hi = age_max if age_max is not None else 10**6
+            m = 0
+            for label, b_lo, b_hi in AGE_BUCKETS:
+                if b_lo <= hi and lo < b_hi:
+                    m |= self._postings["age"].get(label, 0)
+            # buckets are coarse; drop edge pets outside the exact range
+            for slot in _slots(m):
+                age = self._docs[slot].get("ageMonths")
+                try:
+                    if not (lo <= int(age) <= hi):
+                        m &= ~(1 << slot)
+                except (TypeError, ValueError):
+                    m &= ~(1 << slot)
+            masks["age"] = masks["age"] & m if "age" in masks else m
+        return masks
+
+    def search(
+        self,
+        filters: Optional[Dict[str, List[str]]] = None,
+        age_min: Optional[int] = None,
+        age_max: Optional[int] = None,
+        breed_prefix: Optional[str] = None,
+        breed_fuzzy: Optional[str] = None,
+        limit: int = 20,
+        offset: int = 0,
+        facets: bool = True,
+    ) -> Dict[str, Any]:
+        with self._lock:
+            masks = self._field_masks(
+                filters or {}, age_min, age_max, breed_prefix, breed_fuzzy
+            )
+            result = self._all
+            for m in masks.values():
+                result &= m
+
+            facet_counts: Dict[str, Dict[str, int]] = {}
+            if facets:
+                for field in FACET_FIELDS:
+                    # disjunctive facets: ignore this field's own filter so the
+                    # other values still show what selecting them would give
+                    base = self._all
+                    for f, m in masks.items():
+                        if f != field:
+                            base &= m
+                    counts = {}
+                    for v, posting in self._postings[field].items():
+                        n = (base & posting).bit_count()
+                        if n:
+                            counts[v] = n
+                    facet_counts[field] = dict(
+                        sorted(counts.items(), key=lambda kv: (-kv[1], kv[0]))
+                    )
+
+            total = result.bit_count()
+            top = heapq.nlargest(
+                offset + limit, _slots(result), key=self._created.__getitem__
+            )
+            page = [dict(self._docs[s]) for s in top[offset:]]
+
+        return {
+            "total": total,
+            "items": page,
+            "facets": facet_counts,
+        }
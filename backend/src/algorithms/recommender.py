@@ -1,37 +1,102 @@
 import math
 import os
+import threading
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Dict, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
 from dotenv import load_dotenv
 
 load_dotenv()
 
-import firebase_admin
-from firebase_admin import auth, credentials, firestore
-from flask import Flask, jsonify, render_template, request, send_from_directory
+from flask import (
+    Flask,
+    Response,
+    jsonify,
+    render_template,
+    request,
+    send_from_directory,
+)
+
+from algorithms import geo
+from algorithms.pet_search import PetSearchIndex
+from services import (
+    clients,
+    counters,
+    events,
+    feed,
+    images,
+    metrics,
+    pet_import,
+    profiling,
+    stream_tickets,
+)
+from services.application_events import ApplicationStatusFeed, topics_for
+from services.firestore_batch import commit_in_chunks
+from services.pet_store import PetStore
+from services.repository import Repository, install_request_stats, request_repository
+from services.session_store import SessionStore
+from services.view_counter import ViewCounter
 
 # --------------------------
-# Firebase Admin init
+# Firebase Admin init (deferred to first use, see services/clients.py)
 # --------------------------
-cred_path = os.environ.get("FIREBASE_CREDENTIALS")
-if not cred_path:
-    raise RuntimeError(
-        "Missing FIREBASE_CREDENTIALS env var (path to service account json)."
+firestore = clients.lazy_import("firebase_admin.firestore")
+db = clients.proxy("firestore")
+view_counter = ViewCounter(db)
+
+# Optional in-process mirror of pets (PET_STORE=1). Started lazily on first
+# use so pre-forked workers each open their own listener.
+pet_store = (
+    PetStore(
+        db,
+        statuses=os.environ.get("PET_STORE_STATUSES", "adoptable,pending").split(","),
+        resync_seconds=float(os.environ.get("PET_STORE_RESYNC_SECONDS", "3600")),
     )
+    if os.environ.get("PET_STORE") == "1"
+    else None
+)
+search_index = PetSearchIndex()
+geo_index = geo.GeohashIndex()
+if pet_store is not None:
+    pet_store.subscribe(search_index.on_store_change)
+    pet_store.subscribe(geo_index.on_store_change)
+
+# Resized photo derivatives (IMAGE_STORAGE=firebase|local, see services/images.py)
+image_pipeline = (
+    images.ImagePipeline(db, clients.get("image-storage"))
+    if os.environ.get("IMAGE_STORAGE")
+    else None
+)
+
+# Explore "load more": each session keeps its remaining pool and greedy
+# diversity state (?session=new, then ?session=<token>)
+EXPLORE_POOL = 120
+explore_sessions = SessionStore(
+    max_sessions=int(os.environ.get("EXPLORE_SESSIONS_MAX", "5000")),
+    ttl=float(os.environ.get("EXPLORE_SESSION_TTL_SECONDS", "900")),
+)
+
+
+def live_pet_store() -> Optional[PetStore]:
+    if pet_store is None:
+        return None
+    pet_store.ensure_started()
+    return pet_store if pet_store.ready else None
 
-if not firebase_admin._apps:
-    cred = credentials.Certificate(cred_path)
-    firebase_admin.initialize_app(cred)
-
-db = firestore.client()
 
 # --------------------------
 # Flask init (MUST be before any @app.route)
 # --------------------------
 _frontend = Path(__file__).resolve().parent.parent.parent / "frontend"
 app = Flask(__name__, template_folder=_frontend)
+install_request_stats(app)
+metrics.instrument_flask(app, "recommender")
+profiling.install_flask(app, "recommender")
+
+
+def repo() -> Repository:
+    return request_repository(db)
 
 
 @app.get("/")
@@ -120,22 +185,52 @@ def similarity(a: dict, b: dict) -> float:
     return s
 
 
+class DiversityCursor:
+    """``diversify_rank``'s greedy pass, resumable across ``take`` calls.
+
+    Each candidate keeps its minimum similarity to everything picked so far,
+    updated once per pick, so a page of n picks costs O(n * pool) however
+    many pages came before it.
+    """
+
+    def __init__(self, candidates: list):
+        self._remaining = list(candidates)
+        self._min_sim: List[float] = []
+        self._started = False
+        self._lock = threading.Lock()
+
+    @property
+    def exhausted(self) -> bool:
+        return not self._remaining
+
+    def _pick(self, i: int) -> dict:
+        best = self._remaining.pop(i)
+        if self._started:
+            self._min_sim.pop(i)
+            self._min_sim = [
+                min(m, similarity(c, best))
+                for c, m in zip(self._remaining, self._min_sim)
+            ]
+        else:
+            self._started = True
+            self._min_sim = [similarity(c, best) for c in self._remaining]
+        return best
+
+    def take(self, n: int) -> list:
+        with self._lock:
+            out = []
+            while self._remaining and len(out) < n:
+                if not self._started:
+                    out.append(self._pick(0))
+                    continue
+                # first candidate with the lowest score, as diversify_rank picks
+                i = min(range(len(self._min_sim)), key=self._min_sim.__getitem__)
+                out.append(self._pick(i))
+            return out
+
+
 def diversify_rank(candidates: list, k: int = 12) -> list:
-    if not candidates:
-        return []
-    picked = [candidates[0]]
-    remaining = candidates[1:]
-    while remaining and len(picked) < k:
-        best = None
-        best_score = None
-        for c in remaining:
-            sim = min(similarity(c, p) for p in picked)
-            if best is None or sim < best_score:
-                best = c
-                best_score = sim
-        picked.append(best)
-        remaining.remove(best)
-    return picked
+    return DiversityCursor(candidates).take(k)
 
 
 def compute_match(pet: dict, user: dict) -> dict:
@@ -193,6 +288,24 @@ def compute_match(pet: dict, user: dict) -> dict:
     return {"score": score, "reasons": reasons[:3], "warnings": warnings[:3]}
 
 
+def _image_prefs() -> Tuple[int, str]:
+    """Card image width and format for list responses (?imageWidth=&imageFormat=)."""
+    width = clamp(
+        int_or_none(request.args.get("imageWidth")) or images.CARD_WIDTH, 1, 4096
+    )
+    return width, request.args.get("imageFormat") or "webp"
+
+
+def _pet_cards(items: List[dict]) -> List[dict]:
+    width, fmt = _image_prefs()
+    return [images.pet_card(p, width, fmt) for p in items]
+
+
+def _post_cards(items: List[dict]) -> List[dict]:
+    width, fmt = _image_prefs()
+    return [images.post_card(p, width, fmt) for p in items]
+
+
 def _pet_public_fields(p: dict) -> dict:
     return {
         "id": p.get("id"),
@@ -204,28 +317,61 @@ def _pet_public_fields(p: dict) -> dict:
         "energy": p.get("energy"),
         "medicalNeeds": p.get("medicalNeeds"),
         "status": p.get("status"),
-        "coverImageUrl": p.get("coverImageUrl"),
+        "coverImageUrl": images.pick(
+            p.get("coverImage"), p.get("coverImageUrl"), *_image_prefs()
+        ),
         "locationCity": p.get("locationCity"),
         "createdAt": p.get("createdAt"),
         "views7d": p.get("views7d", 0),
     }
 
 
+def _adoptable_pets(limit: int) -> List[dict]:
+    store = live_pet_store()
+    if store is not None:
+        return store.find(status="adoptable")
+    snaps = repo().stream(
+        db.collection("pets").where("status", "==", "adoptable").limit(limit)
+    )
+    out = []
+    for s in snaps:
+        d = s.to_dict() or {}
+        d["id"] = s.id
+        out.append(d)
+    return out
+
+
+def _pet_by_id(pet_id: str) -> Optional[dict]:
+    store = live_pet_store()
+    pet = store.get(pet_id) if store is not None else None
+    if pet is not None:
+        return pet
+    snap = repo().get(db.collection("pets").document(pet_id))
+    if not snap.exists:
+        return None
+    d = snap.to_dict() or {}
+    d["id"] = snap.id
+    return d
+
+
+def _explore_items(pets: List[dict]) -> List[dict]:
+    out = []
+    for d in pets:
+        o = _pet_public_fields(d)
+        o["urgencyScore"] = round(float(d["_urgency"]), 2)
+        out.append(o)
+    return out
+
+
 def register_algo_routes(app: Flask):
     @app.get("/api/pets/urgent")
     def api_urgent_pets():
         limit = int(request.args.get("limit", "12"))
         limit = max(1, min(50, limit))
 
-        snaps = (
-            db.collection("pets").where("status", "==", "adoptable").limit(100).stream()
-        )
-        items = []
-        for s in snaps:
-            d = s.to_dict() or {}
-            d["id"] = s.id
+        items = _adoptable_pets(100)
+        for d in items:
             d["_urgency"] = compute_urgency(d)
-            items.append(d)
 
         items.sort(key=lambda x: x["_urgency"], reverse=True)
         out = []
@@ -244,37 +390,56 @@ def register_algo_routes(app: Flask):
     def api_explore_pets():
         limit = int(request.args.get("limit", "12"))
         limit = max(1, min(50, limit))
+        session = request.args.get("session")
+
+        # ?session=<token>: the next page of an earlier ?session=new call
+        if session and session != "new":
+            cursor = explore_sessions.get(session)
+            if cursor is None:
+                return (
+                    jsonify({"ok": False, "error": "explore session expired"}),
+                    410,
+                )
+            page = cursor.take(limit)
+            if cursor.exhausted:
+                explore_sessions.delete(session)
+            return jsonify(
+                {
+                    "ok": True,
+                    "items": _explore_items(page),
+                    "session": session,
+                    "hasMore": not cursor.exhausted,
+                }
+            )
 
-        snaps = (
-            db.collection("pets").where("status", "==", "adoptable").limit(120).stream()
-        )
-        pool = []
-        for s in snaps:
-            d = s.to_dict() or {}
-            d["id"] = s.id
+        pool = _adoptable_pets(EXPLORE_POOL)
+        for d in pool:
             d["_urgency"] = compute_urgency(d)
-            pool.append(d)
 
         pool.sort(key=lambda x: x["_urgency"], reverse=True)
-        diversified = diversify_rank(pool, k=limit)
+        pool = pool[:EXPLORE_POOL]
+        if session != "new":
+            return jsonify(
+                {"ok": True, "items": _explore_items(diversify_rank(pool, k=limit))}
+            )
 
-        out = []
-        for d in diversified:
-            o = _pet_public_fields(d)
-            o["urgencyScore"] = round(float(d["_urgency"]), 2)
-            out.append(o)
+        cursor = DiversityCursor(pool)
+        page = cursor.take(limit)
+        body = {"ok": True, "items": _explore_items(page), "hasMore": False}
+        if not cursor.exhausted:
+            body.update(session=explore_sessions.create(cursor), hasMore=True)
+        return jsonify(body)
 
-        return jsonify({"ok": True, "items": out})
+    @app.get("/api/pets/explore/sessions")
+    def api_explore_sessions():
+        return jsonify({"ok": True, **explore_sessions.metrics()})
 
     @app.get("/api/pets/<pet_id>/match")
     def api_pet_match(pet_id: str):
-        snap = db.collection("pets").document(pet_id).get()
-        if not snap.exists:
+        pet = _pet_by_id(pet_id)
+        if pet is None:
             return jsonify({"ok": False, "error": "pet not found"}), 404
 
-        pet = snap.to_dict() or {}
-        pet["id"] = snap.id
-
         user = {
             "hasYard": request.args.get("hasYard", "unknown"),
             "hoursPerWeek": request.args.get("hoursPerWeek", "5"),
@@ -319,17 +484,16 @@ def require_user() -> Tuple[str, Dict[str, Any]]:
     token = get_bearer_token()
     if not token:
         raise PermissionError("Missing Authorization: Bearer <Firebase ID token>")
-    decoded = auth.verify_id_token(token)
+    decoded = clients.get("auth").verify_id_token(token)
     return decoded["uid"], decoded
 
 
 def get_role(uid: str) -> str:
-    shelter_doc = db.collection("shelters").document(uid).get()
+    # anyone without a shelters/{uid} doc is treated as a user, so that is
+    # the only read needed
+    shelter_doc = repo().get(db.collection("shelters").document(uid))
     if shelter_doc.exists:
         return "shelter"
-    user_doc = db.collection("users").document(uid).get()
-    if user_doc.exists:
-        return "user"
     return "user"
 
 
@@ -374,7 +538,7 @@ def health():
 @app.get("/api/shelters")
 def list_shelters():
     limit = clamp(int_or_none(request.args.get("limit")) or 20, 1, 50)
-    snaps = db.collection("shelters").limit(limit).stream()
+    snaps = repo().stream(db.collection("shelters").limit(limit))
     items = [{"id": s.id, **(s.to_dict() or {})} for s in snaps]
     return ok({"items": items})
 
@@ -390,6 +554,37 @@ def search_pets():
     city = request.args.get("city")
     shelter_id = request.args.get("shelterId")
 
+    near = request.args.get("near")
+    if near:
+        center = geo.parse_coords(*(near.split(",", 1) + [None])[:2])
+        if center is None:
+            return fail("invalid near: expected lat,lon", 400)
+        try:
+            radius_km = float(request.args.get("radiusKm", "10"))
+        except ValueError:
+            return fail("invalid radiusKm", 400)
+        radius_km = max(0.1, min(MAX_RADIUS_KM, radius_km))
+        filters = {
+            "shelterId": shelter_id,
+            "status": status,
+            "locationCity": city,
+            "breed": breed,
+        }
+        items = _pets_near(center, radius_km, limit, filters)
+        return ok({"items": _pet_cards(items), "radiusKm": radius_km})
+
+    store = live_pet_store()
+    if store is not None and store.covers(status):
+        items = store.find(
+            limit=limit,
+            newest_first=True,
+            shelterId=shelter_id or None,
+            status=status or None,
+            locationCity=city or None,
+            breed=breed or None,
+        )
+        return ok({"items": _pet_cards(items)})
+
     q = db.collection("pets")
     if shelter_id:
         q = q.where("shelterId", "==", shelter_id)
@@ -401,57 +596,236 @@ def search_pets():
         q = q.where("breed", "==", breed)
 
     q = q.order_by("createdAt", direction=firestore.Query.DESCENDING).limit(limit)
-    snaps = q.stream()
+    snaps = repo().stream(q)
     items = [{"id": s.id, **(s.to_dict() or {})} for s in snaps]
-    return ok({"items": items})
+    return ok({"items": _pet_cards(items)})
+
+
+MAX_RADIUS_KM = 200.0
+GEO_SCAN_PAGE = 500
+
+
+def _pets_near(center, radius_km: float, limit: int, filters: dict) -> list:
+    lat, lon = center
+    wanted = {k: v for k, v in filters.items() if v}
+
+    store = live_pet_store()
+    if store is not None and store.covers(wanted.get("status")):
+        out = []
+        for dist, pet_id in geo_index.near(lat, lon, radius_km):
+            pet = store.get(pet_id)
+            if pet and all(pet.get(k) == v for k, v in wanted.items()):
+                pet["distanceKm"] = round(dist, 3)
+                out.append(pet)
+                if len(out) >= limit:
+                    break
+        return out
+
+    # cells come nearest first; once `limit` hits are no farther than the
+    # next cell can possibly be, the remaining cells cannot change the page
+    hits = {}
+    for prefix in geo.query_prefixes(lat, lon, radius_km):
+        if len(hits) >= limit:
+            kth = sorted(dist for dist, _ in hits.values())[limit - 1]
+            if kth <= geo.min_distance_km(lat, lon, prefix):
+                break
+        q = (
+            db.collection("pets")
+            .where("geohash", ">=", prefix)
+            .where("geohash", "<", prefix + geo.PREFIX_END)
+        )
+        if wanted.get("status"):
+            q = q.where("status", "==", wanted["status"])
+        q = q.order_by("geohash").order_by("__name__").limit(GEO_SCAN_PAGE)
+        page = repo().stream(q)
+        while page:
+            for s in page:
+                d = s.to_dict() or {}
+                coords = geo.parse_coords(d.get("lat"), d.get("lon"))
+                if not coords or not all(d.get(k) == v for k, v in wanted.items()):
+                    continue
+                dist = geo.haversine_km(lat, lon, *coords)
+                if dist <= radius_km:
+                    pet = {"id": s.id, **d, "distanceKm": round(dist, 3)}
+                    hits[s.id] = (dist, pet)
+            if len(page) < GEO_SCAN_PAGE:
+                break
+            page = repo().stream(q.start_after(page[-1]))
+    return [pet for _, pet in sorted(hits.values(), key=lambda h: h[0])[:limit]]
+
+
+def _multi_arg(name: str) -> list:
+    out = []
+    for v in request.args.getlist(name):
+        out.extend(x.strip() for x in v.split(",") if x.strip())
+    return out
+
+
+@app.get("/api/pets/search")
+def faceted_search_pets():
+    """
+    Filters (comma-separated values are OR-ed): species, breed, size, sex,
+    status, city, shelterId. Also ageMin/ageMax (months), breedPrefix and q
+    (typo-tolerant breed match). Returns facet counts unless facets=0.
+    """
+    limit = clamp(int_or_none(request.args.get("limit")) or 20, 1, 50)
+    offset = max(0, int_or_none(request.args.get("offset")) or 0)
+    filters = {
+        "species": _multi_arg("species"),
+        "breedName": _multi_arg("breed"),
+        "size": _multi_arg("size"),
+        "sex": _multi_arg("sex"),
+        "status": _multi_arg("status"),
+        "city": _multi_arg("city"),
+        "shelter": _multi_arg("shelterId"),
+    }
+    index = search_index
+    truncated = False
+    store = live_pet_store()
+    if store is None or not all(store.covers(s) for s in filters["status"]):
+        # no mirror (PET_STORE off, warming up or resyncing) or it doesn't
+        # hold these statuses: index a bounded Firestore read for this
+        # request instead
+        index, truncated = _search_fallback_index(filters)
+    result = index.search(
+        filters,
+        age_min=int_or_none(request.args.get("ageMin")),
+        age_max=int_or_none(request.args.get("ageMax")),
+        breed_prefix=request.args.get("breedPrefix"),
+        breed_fuzzy=request.args.get("q"),
+        limit=limit,
+        offset=offset,
+        facets=request.args.get("facets", "1") != "0",
+    )
+    result["items"] = _pet_cards(result["items"])
+    if truncated:
+        result["truncated"] = True
+    return ok(result)
+
+
+SEARCH_FALLBACK_SCAN = 1000
+
+
+def _search_fallback_index(filters: Dict[str, list]) -> Tuple[PetSearchIndex, bool]:
+    """A throwaway index over the newest SEARCH_FALLBACK_SCAN matching pets."""
+    q = db.collection("pets")
+    if filters["status"]:
+        q = q.where("status", "in", filters["status"][:30])
+    # other values are matched case-insensitively by the index, so only the
+    # exact shelter id is safe to push down
+    if len(filters["shelter"]) == 1:
+        q = q.where("shelterId", "==", filters["shelter"][0])
+    q = q.order_by("createdAt", direction=firestore.Query.DESCENDING)
+    snaps = repo().stream(q.limit(SEARCH_FALLBACK_SCAN))
+    index = PetSearchIndex()
+    index.rebuild({**(s.to_dict() or {}), "id": s.id} for s in snaps)
+    return index, len(snaps) >= SEARCH_FALLBACK_SCAN
 
 
 @app.get("/api/pets/<pet_id>")
 def get_pet(pet_id: str):
-    snap = db.collection("pets").document(pet_id).get()
-    if not snap.exists:
+    pet = _pet_by_id(pet_id)
+    if pet is None:
         return fail("pet not found", 404)
-    return ok({"pet": doc_to_dict(snap)})
+    return ok({"pet": pet})
+
+
+@app.get("/api/pet-store/stats")
+def pet_store_stats():
+    if pet_store is None:
+        return ok({"enabled": False})
+    return ok({"enabled": True, **pet_store.metrics()})
+
+
+@app.get("/api/images/stats")
+def image_pipeline_stats():
+    if image_pipeline is None:
+        return ok({"enabled": False})
+    return ok({"enabled": True, **image_pipeline.metrics()})
+
+
+@app.get("/api/media/<path:key>")
+def local_media(key: str):
+    storage = image_pipeline.storage if image_pipeline is not None else None
+    if not isinstance(storage, images.LocalStorage):
+        return fail("not found", 404)
+    resp = send_from_directory(storage.root.resolve(), key)
+    resp.headers["Cache-Control"] = images.CACHE_CONTROL
+    return resp
+
+
+@app.post("/api/pets/<pet_id>/view")
+def record_pet_view(pet_id: str):
+    pet_id = pet_id.strip()
+    if not pet_id or "/" in pet_id:
+        return fail("invalid pet id", 400)
+    view_counter.record(pet_id)
+    return ok({"petId": pet_id}, 202)
 
 
 # --------------------------
 # Pets (shelter write)
 # --------------------------
+PET_REQUIRED_FIELDS = ["name", "breed", "ageMonths", "size", "sex"]
+
+
+def build_pet_doc(body: Dict[str, Any], shelter_uid: str) -> Dict[str, Any]:
+    for k in PET_REQUIRED_FIELDS:
+        if k not in body or body.get(k) is None or str(body.get(k)).strip() == "":
+            raise ValueError(f"missing field: {k}")
+    age_months = int_or_none(body["ageMonths"])
+    if age_months is None:
+        raise ValueError("invalid field: ageMonths")
+
+    location = {}
+    lat = body.get("lat", body.get("latitude"))
+    lon = body.get("lon", body.get("longitude"))
+    if lat not in (None, "") or lon not in (None, ""):
+        coords = geo.parse_coords(lat, lon)
+        if coords is None:
+            raise ValueError("invalid field: lat/lon")
+        location = geo.geo_fields(*coords)
+
+    return {
+        "shelterId": shelter_uid,
+        "name": str(body["name"]).strip(),
+        "breed": str(body["breed"]).strip(),
+        "ageMonths": age_months,
+        "size": str(body["size"]).strip(),
+        "sex": str(body["sex"]).strip(),
+        "status": str(body.get("status") or "adoptable").strip(),
+        "locationCity": (
+            str(body.get("locationCity")).strip() if body.get("locationCity") else None
+        ),
+        "coverImageUrl": (
+            str(body.get("coverImageUrl")).strip()
+            if body.get("coverImageUrl")
+            else None
+        ),
+        **location,
+        "createdAt": firestore.SERVER_TIMESTAMP,
+        "updatedAt": firestore.SERVER_TIMESTAMP,
+    }
+
+
 @app.post("/api/pets")
 def create_pet():
     try:
         shelter_uid = require_role("shelter")
         body = request.get_json(force=True) or {}
 
-        required = ["name", "breed", "ageMonths", "size", "sex"]
-        for k in required:
-            if k not in body or str(body.get(k)).strip() == "":
-                return fail(f"missing field: {k}", 400)
-
-        pet = {
-            "shelterId": shelter_uid,
-            "name": str(body["name"]).strip(),
-            "breed": str(body["breed"]).strip(),
-            "ageMonths": int(body["ageMonths"]),
-            "size": str(body["size"]).strip(),
-            "sex": str(body["sex"]).strip(),
-            "status": str(body.get("status", "adoptable")).strip(),
-            "locationCity": (
-                str(body.get("locationCity")).strip()
-                if body.get("locationCity")
-                else None
-            ),
-            "coverImageUrl": (
-                str(body.get("coverImageUrl")).strip()
-                if body.get("coverImageUrl")
-                else None
-            ),
-            "createdAt": firestore.SERVER_TIMESTAMP,
-            "updatedAt": firestore.SERVER_TIMESTAMP,
-        }
+        try:
+            pet = build_pet_doc(body, shelter_uid)
+        except ValueError as e:
+            return fail(str(e), 400)
 
         ref = db.collection("pets").document()
-        ref.set(pet)
+        batch = repo().batch()
+        batch.set(ref, pet)
+        counters.add_to_batch(batch, db, [("pets", shelter_uid, None, pet["status"])])
+        batch.commit()
+        if image_pipeline is not None:
+            image_pipeline.submit_pet(ref.id, pet["coverImageUrl"])
         return ok({"petId": ref.id}, 201)
     except PermissionError as e:
         return fail(str(e), 401)
@@ -459,12 +833,60 @@ def create_pet():
         return fail("create_pet failed", 500, {"detail": str(e)})
 
 
+@app.post("/api/pets/import")
+def import_pets():
+    """
+    Streams a CSV or NDJSON upload (?format=csv|ndjson, or by Content-Type).
+    Every row needs an externalId; re-running an import updates in place.
+    Uploads over IMPORT_SYNC_MAX_BYTES (or ?async=1) run as a background job.
+    """
+    try:
+        shelter_uid = require_role("shelter")
+        fmt = pet_import.detect_format(request.args.get("format"), request.mimetype)
+        if not fmt:
+            return fail("unsupported format: use csv or ndjson", 415)
+
+        size = request.content_length or 0
+        background = request.args.get("async") == "1" or (
+            size > pet_import.IMPORT_SYNC_MAX_BYTES
+        )
+        if not background:
+            job = pet_import.ImportJob(shelter_uid, fmt)
+            pet_import.run_import(db, job, request.stream, build_pet_doc)
+            if job.state != "done":
+                return fail("import failed", 500, {"job": job.to_dict()})
+            return ok({"job": job.to_dict()})
+
+        job = pet_import.start_background_import(
+            db, shelter_uid, fmt, request.stream, build_pet_doc
+        )
+        return ok({"jobId": job.id, "job": job.to_dict()}, 202)
+    except PermissionError as e:
+        return fail(str(e), 401)
+    except Exception as e:
+        return fail("import_pets failed", 500, {"detail": str(e)})
+
+
+@app.get("/api/pets/import/<job_id>")
+def import_pets_status(job_id: str):
+    try:
+        shelter_uid = require_role("shelter")
+        job = pet_import.get_job(db, job_id)
+        if not job or job.get("shelterId") != shelter_uid:
+            return fail("import job not found", 404)
+        return ok({"job": job})
+    except PermissionError as e:
+        return fail(str(e), 401)
+    except Exception as e:
+        return fail("import_pets_status failed", 500, {"detail": str(e)})
+
+
 @app.patch("/api/pets/<pet_id>")
 def update_pet(pet_id: str):
     try:
-        shelter_uid = require_role("shelter")
         ref = db.collection("pets").document(pet_id)
-        snap = ref.get()
+        snap = repo().load(ref)
+        shelter_uid = require_role("shelter")
         if not snap.exists:
             return fail("pet not found", 404)
         pet = snap.to_dict() or {}
@@ -485,9 +907,26 @@ def update_pet(pet_id: str):
         patch = {k: body[k] for k in body.keys() if k in allowed}
         if "ageMonths" in patch:
             patch["ageMonths"] = int(patch["ageMonths"])
+        if "lat" in body or "lon" in body:
+            coords = geo.parse_coords(
+                body.get("lat", pet.get("lat")), body.get("lon", pet.get("lon"))
+            )
+            if coords is None:
+                return fail("invalid field: lat/lon", 400)
+            patch.update(geo.geo_fields(*coords))
         patch["updatedAt"] = firestore.SERVER_TIMESTAMP
 
-        ref.set(patch, merge=True)
+        batch = repo().batch()
+        batch.set(ref, patch, merge=True)
+        if "status" in patch:
+            counters.add_to_batch(
+                batch,
+                db,
+                [("pets", shelter_uid, pet.get("status"), patch["status"])],
+            )
+        batch.commit()
+        if image_pipeline is not None and "coverImageUrl" in patch:
+            image_pipeline.submit_pet(pet_id, patch["coverImageUrl"])
         return ok({"petId": pet_id, "updated": list(patch.keys())})
     except PermissionError as e:
         return fail(str(e), 401)
@@ -495,6 +934,19 @@ def update_pet(pet_id: str):
         return fail("update_pet failed", 500, {"detail": str(e)})
 
 
+@app.get("/api/shelter/stats")
+def shelter_stats():
+    """Pet and application counts by status for the caller, one document read."""
+    try:
+        shelter_uid = require_role("shelter")
+        snap = repo().get(counters.shelter_stats_ref(db, shelter_uid))
+        return ok({"shelterId": shelter_uid, **counters.read_stats(snap)})
+    except PermissionError as e:
+        return fail(str(e), 401)
+    except Exception as e:
+        return fail("shelter_stats failed", 500, {"detail": str(e)})
+
+
 @app.get("/api/shelter/pets")
 def shelter_my_pets():
     try:
@@ -506,9 +958,9 @@ def shelter_my_pets():
             .order_by("createdAt", direction=firestore.Query.DESCENDING)
             .limit(limit)
         )
-        snaps = q.stream()
+        snaps = repo().stream(q)
         items = [{"id": s.id, **(s.to_dict() or {})} for s in snaps]
-        return ok({"items": items})
+        return ok({"items": _pet_cards(items)})
     except PermissionError as e:
         return fail(str(e), 401)
     except Exception as e:
@@ -531,9 +983,9 @@ def feed_posts():
         q = q.where("shelterId", "==", shelter_id)
 
     q = q.order_by("createdAt", direction=firestore.Query.DESCENDING).limit(limit)
-    snaps = q.stream()
+    snaps = repo().stream(q)
     items = [{"id": s.id, **(s.to_dict() or {})} for s in snaps]
-    return ok({"items": items})
+    return ok({"items": _post_cards(items)})
 
 
 @app.post("/api/posts")
@@ -547,7 +999,7 @@ def create_post():
         if not pet_id or not caption:
             return fail("missing petId or caption", 400)
 
-        pet_snap = db.collection("pets").document(pet_id).get()
+        pet_snap = repo().get(db.collection("pets").document(pet_id))
         if not pet_snap.exists:
             return fail("pet not found", 404)
         pet = pet_snap.to_dict() or {}
@@ -561,17 +1013,27 @@ def create_post():
         if not isinstance(image_urls, list):
             image_urls = []
 
+        score = feed.now_score(compute_urgency(pet))
         post = {
             "shelterId": shelter_uid,
             "petId": pet_id,
             "caption": caption,
             "tags": [str(x) for x in tags],
             "imageUrls": [str(x) for x in image_urls],
+            "feedScore": score,
             "createdAt": firestore.SERVER_TIMESTAMP,
         }
 
         ref = db.collection("posts").document()
-        ref.set(post)
+        repo().set(ref, post)
+        if image_pipeline is not None and post["imageUrls"]:
+            # fan out once derivatives exist, so feed copies carry them
+            def _fan_out(records, post_id=ref.id):
+                feed.fan_out_post(db, post_id, {**post, "images": records}, score)
+
+            image_pipeline.submit_post(ref.id, post["imageUrls"], _fan_out)
+        else:
+            feed.fan_out_post_async(db, ref.id, post, score)
         return ok({"postId": ref.id}, 201)
     except PermissionError as e:
         return fail(str(e), 401)
@@ -579,17 +1041,73 @@ def create_post():
         return fail("create_post failed", 500, {"detail": str(e)})
 
 
+# --------------------------
+# Follows + personalized feed
+# --------------------------
+@app.post("/api/shelters/<shelter_id>/follow")
+def follow_shelter(shelter_id: str):
+    try:
+        uid, _ = require_user()
+        feed.follow(repo(), uid, shelter_id)
+        return ok({"shelterId": shelter_id, "following": True})
+    except PermissionError as e:
+        return fail(str(e), 401)
+    except LookupError as e:
+        return fail(str(e), 404)
+    except Exception as e:
+        return fail("follow_shelter failed", 500, {"detail": str(e)})
+
+
+@app.delete("/api/shelters/<shelter_id>/follow")
+def unfollow_shelter(shelter_id: str):
+    try:
+        uid, _ = require_user()
+        feed.unfollow(repo(), uid, shelter_id)
+        return ok({"shelterId": shelter_id, "following": False})
+    except PermissionError as e:
+        return fail(str(e), 401)
+    except Exception as e:
+        return fail("unfollow_shelter failed", 500, {"detail": str(e)})
+
+
+@app.get("/api/feed")
+def personal_feed():
+    try:
+        uid, _ = require_user()
+        limit = clamp(int_or_none(request.args.get("limit")) or 20, 1, 50)
+        cursor = request.args.get("cursor") or None
+        try:
+            if cursor:
+                feed.decode_cursor(cursor)
+        except ValueError:
+            return fail("invalid cursor", 400)
+        page = feed.read_feed(repo(), uid, limit, cursor)
+        page["items"] = _post_cards(page["items"])
+        return ok(page)
+    except PermissionError as e:
+        return fail(str(e), 401)
+    except Exception as e:
+        return fail("personal_feed failed", 500, {"detail": str(e)})
+
+
 # --------------------------
 # Applications (User -> Pet)  [DOUBLE WRITE]
 # --------------------------
 @app.post("/api/pets/<pet_id>/apply")
 def apply_for_pet(pet_id: str):
     try:
-        user_uid = require_role("user")
         body = request.get_json(force=True) or {}
-
         pet_ref = db.collection("pets").document(pet_id)
-        pet_snap = pet_ref.get()
+        pet_snap = repo().load(pet_ref)
+        # a re-submitted appId moves its old status back to submitted
+        client_app_id = str(body.get("appId", "")).strip()
+        prev_inbox = (
+            repo().load(pet_ref.collection("applications").document(client_app_id))
+            if client_app_id
+            else None
+        )
+        user_uid = require_role("user")
+
         if not pet_snap.exists:
             return fail("pet not found", 404)
 
@@ -652,6 +1170,9 @@ def apply_for_pet(pet_id: str):
         payload_inbox = {
             "petId": pet_id,
             "shelterId": shelter_id,
+            # tells shelter copies apart from users/*/applications in
+            # collection-group queries
+            "inbox": True,
             "userId": user_uid,
             "status": "submitted",
             "summary": summary,
@@ -659,9 +1180,18 @@ def apply_for_pet(pet_id: str):
             "updatedAt": firestore.SERVER_TIMESTAMP,
         }
 
-        batch = db.batch()
+        prev_status = (
+            (prev_inbox.to_dict() or {}).get("status")
+            if prev_inbox is not None and prev_inbox.exists
+            else None
+        )
+
+        batch = repo().batch()
         batch.set(user_app_ref, payload_user, merge=True)
         batch.set(pet_inbox_ref, payload_inbox, merge=True)
+        counters.add_to_batch(
+            batch, db, [("applications", shelter_id, prev_status, "submitted")]
+        )
         batch.commit()
 
         return ok({"appId": app_id, "petId": pet_id, "shelterId": shelter_id}, 201)
@@ -678,9 +1208,9 @@ def apply_for_pet(pet_id: str):
 @app.get("/api/pets/<pet_id>/applications")
 def list_pet_applications(pet_id: str):
     try:
+        pet_snap = repo().load(db.collection("pets").document(pet_id))
         shelter_uid = require_role("shelter")
 
-        pet_snap = db.collection("pets").document(pet_id).get()
         if not pet_snap.exists:
             return fail("pet not found", 404)
         pet = pet_snap.to_dict() or {}
@@ -695,7 +1225,7 @@ def list_pet_applications(pet_id: str):
             .order_by("createdAt", direction=firestore.Query.DESCENDING)
             .limit(limit)
         )
-        snaps = q.stream()
+        snaps = repo().stream(q)
         items = [{"id": s.id, **(s.to_dict() or {})} for s in snaps]
         return ok({"items": items})
 
@@ -705,25 +1235,89 @@ def list_pet_applications(pet_id: str):
         return fail("list_pet_applications failed", 500, {"detail": str(e)})
 
 
+INBOX_STATUSES = ("submitted", "reviewing", "approved", "rejected")
+
+
+@app.get("/api/shelter/applications")
+def shelter_inbox():
+    """
+    Every application across the caller's pets, newest first:
+    ?status=submitted,reviewing&limit=&cursor=<petId>/<appId>
+
+    One collection-group query; ownership comes from the shelterId stored on
+    each inbox entry. Needs a collection-group index on applications:
+    inbox ASC, shelterId ASC, status ASC, createdAt DESC.
+    """
+    try:
+        shelter_uid = require_role("shelter")
+        limit = clamp(int_or_none(request.args.get("limit")) or 50, 1, 100)
+        statuses = [s for s in _multi_arg("status") if s]
+        bad = [s for s in statuses if s not in INBOX_STATUSES]
+        if bad:
+            return fail("invalid status", 400, {"invalid": bad})
+
+        q = (
+            db.collection_group("applications")
+            .where("inbox", "==", True)
+            .where("shelterId", "==", shelter_uid)
+        )
+        if len(statuses) == 1:
+            q = q.where("status", "==", statuses[0])
+        elif statuses:
+            q = q.where("status", "in", statuses)
+        q = q.order_by("createdAt", direction=firestore.Query.DESCENDING)
+
+        cursor = request.args.get("cursor")
+        if cursor:
+            pet_id, _, app_id = cursor.partition("/")
+            if not pet_id or not app_id:
+                return fail("invalid cursor", 400)
+            cursor_snap = repo().get(
+                db.collection("pets")
+                .document(pet_id)
+                .collection("applications")
+                .document(app_id)
+            )
+            if not cursor_snap.exists or (
+                (cursor_snap.to_dict() or {}).get("shelterId") != shelter_uid
+            ):
+                return fail("invalid cursor", 400)
+            # a snapshot cursor also breaks createdAt ties by document path
+            q = q.start_after(cursor_snap)
+
+        snaps = repo().stream(q.limit(limit))
+        items = [{"id": s.id, **(s.to_dict() or {})} for s in snaps]
+        next_cursor = (
+            f"{items[-1].get('petId')}/{items[-1]['id']}"
+            if len(items) == limit
+            else None
+        )
+        return ok({"items": items, "nextCursor": next_cursor})
+    except PermissionError as e:
+        return fail(str(e), 401)
+    except Exception as e:
+        return fail("shelter_inbox failed", 500, {"detail": str(e)})
+
+
 @app.patch("/api/pets/<pet_id>/applications/<app_id>")
 def review_application(pet_id: str, app_id: str):
     try:
+        pet_ref = db.collection("pets").document(pet_id)
+        inbox_ref = pet_ref.collection("applications").document(app_id)
+        pet_snap = repo().load(pet_ref)
+        inbox_snap = repo().load(inbox_ref)
         shelter_uid = require_role("shelter")
         body = request.get_json(force=True) or {}
         new_status = str(body.get("status", "")).strip()
         if new_status not in ("reviewing", "approved", "rejected"):
             return fail("invalid status", 400)
 
-        pet_ref = db.collection("pets").document(pet_id)
-        pet_snap = pet_ref.get()
         if not pet_snap.exists:
             return fail("pet not found", 404)
         pet = pet_snap.to_dict() or {}
         if pet.get("shelterId") != shelter_uid:
             return fail("forbidden: not your pet", 403)
 
-        inbox_ref = pet_ref.collection("applications").document(app_id)
-        inbox_snap = inbox_ref.get()
         if not inbox_snap.exists:
             return fail("application not found", 404)
         inbox = inbox_snap.to_dict() or {}
@@ -738,7 +1332,7 @@ def review_application(pet_id: str, app_id: str):
             .document(app_id)
         )
 
-        batch = db.batch()
+        batch = repo().batch()
         batch.set(
             inbox_ref,
             {"status": new_status, "updatedAt": firestore.SERVER_TIMESTAMP},
@@ -750,12 +1344,15 @@ def review_application(pet_id: str, app_id: str):
             merge=True,
         )
 
+        transitions = [("applications", shelter_uid, inbox.get("status"), new_status)]
         if new_status == "approved":
             batch.set(
                 pet_ref,
                 {"status": "pending", "updatedAt": firestore.SERVER_TIMESTAMP},
                 merge=True,
             )
+            transitions.append(("pets", shelter_uid, pet.get("status"), "pending"))
+        counters.add_to_batch(batch, db, transitions)
 
         batch.commit()
         return ok({"petId": pet_id, "appId": app_id, "status": new_status})
@@ -766,6 +1363,200 @@ def review_application(pet_id: str, app_id: str):
         return fail("review_application failed", 500, {"detail": str(e)})
 
 
+REVIEW_STATUSES = ("reviewing", "approved", "rejected")
+TERMINAL_STATUSES = ("approved", "rejected")
+
+
+def _parse_bulk_changes(body: Dict[str, Any]) -> Dict[str, str]:
+    changes = body.get("changes") or {}
+    if isinstance(changes, list):
+        changes = {
+            str(c.get("appId", "")).strip(): str(c.get("status", "")).strip()
+            for c in changes
+            if isinstance(c, dict)
+        }
+    if not isinstance(changes, dict):
+        return {}
+    return {
+        str(k).strip(): str(v).strip() for k, v in changes.items() if str(k).strip()
+    }
+
+
+@app.post("/api/pets/<pet_id>/applications/bulk-review")
+def bulk_review_applications(pet_id: str):
+    """
+    Body: {"changes": {appId: status, ...}} and/or
+          {"approve": appId, "rejectOthers": true}
+    """
+    try:
+        pet_ref = db.collection("pets").document(pet_id)
+        pet_snap = repo().load(pet_ref)
+        shelter_uid = require_role("shelter")
+        body = request.get_json(force=True) or {}
+        changes = _parse_bulk_changes(body)
+        approve_id = str(body.get("approve", "")).strip()
+        reject_others = bool(body.get("rejectOthers", False))
+
+        bad = {k: v for k, v in changes.items() if v not in REVIEW_STATUSES}
+        if bad:
+            return fail("invalid status", 400, {"invalid": bad})
+        if approve_id:
+            changes[approve_id] = "approved"
+        if not changes and not reject_others:
+            return fail("no changes", 400)
+        if reject_others and not approve_id:
+            return fail("rejectOthers requires approve", 400)
+
+        if not pet_snap.exists:
+            return fail("pet not found", 404)
+        pet = pet_snap.to_dict() or {}
+        if pet.get("shelterId") != shelter_uid:
+            return fail("forbidden: not your pet", 403)
+
+        apps_col = pet_ref.collection("applications")
+        inbox = {}
+        if reject_others:
+            # one query covers every other open application on this pet
+            for s in repo().stream(apps_col):
+                inbox[s.id] = s.to_dict() or {}
+                if s.id not in changes and inbox[s.id].get("status") not in (
+                    TERMINAL_STATUSES
+                ):
+                    changes[s.id] = "rejected"
+        else:
+            refs = [apps_col.document(app_id) for app_id in changes]
+            for s in repo().get_all(refs):
+                if s.exists:
+                    inbox[s.id] = s.to_dict() or {}
+
+        not_found = [a for a in changes if a not in inbox]
+        missing_user = [a for a in changes if a in inbox and not inbox[a].get("userId")]
+        if approve_id and (approve_id in not_found or approve_id in missing_user):
+            return fail("application not found", 404, {"appId": approve_id})
+
+        # approvals go first so the pet flips to pending in the same batch
+        ordered = sorted(
+            (a for a in changes if a in inbox and a not in missing_user),
+            key=lambda a: changes[a] != "approved",
+        )
+        writes = []
+        transitions = []
+        pet_marked = False
+        for app_id in ordered:
+            patch = {"status": changes[app_id], "updatedAt": firestore.SERVER_TIMESTAMP}
+            user_app_ref = (
+                db.collection("users")
+                .document(inbox[app_id]["userId"])
+                .collection("applications")
+                .document(app_id)
+            )
+            writes.append((apps_col.document(app_id), patch, True))
+            writes.append((user_app_ref, patch, True))
+            transitions.append(
+                (
+                    "applications",
+                    shelter_uid,
+                    inbox[app_id].get("status"),
+                    changes[app_id],
+                )
+            )
+            if changes[app_id] == "approved" and not pet_marked:
+                pet_marked = True
+                writes.append(
+                    (
+                        pet_ref,
+                        {"status": "pending", "updatedAt": firestore.SERVER_TIMESTAMP},
+                        True,
+                    )
+                )
+                transitions.append(("pets", shelter_uid, pet.get("status"), "pending"))
+        # counters ride in the last chunk; reconcile repairs them if an
+        # earlier chunk fails
+        writes.extend(counters.counter_writes(db, transitions))
+
+        batches = commit_in_chunks(repo(), writes)
+        return ok(
+            {
+                "petId": pet_id,
+                "updated": {a: changes[a] for a in ordered},
+                "notFound": not_found,
+                "missingUserId": missing_user,
+                "batches": batches,
+            }
+        )
+
+    except PermissionError as e:
+        return fail(str(e), 401)
+    except Exception as e:
+        return fail("bulk_review_applications failed", 500, {"detail": str(e)})
+
+
+# --------------------------
+# Live application status (server-sent events)
+# --------------------------
+status_feed = ApplicationStatusFeed(db, events.hub)
+
+
+@app.post("/api/applications/events/ticket")
+def application_events_ticket():
+    """
+    Single-use ticket for opening the event stream from an EventSource,
+    which can't send an Authorization header: GET ...?ticket=<ticket>.
+    """
+    try:
+        uid, _ = require_user()
+        ticket = stream_tickets.issue(db, uid)
+        return ok({"ticket": ticket, "expiresIn": stream_tickets.TTL_SECONDS})
+    except PermissionError as e:
+        return fail(str(e), 401)
+    except Exception as e:
+        return fail("application_events_ticket failed", 500, {"detail": str(e)})
+
+
+def require_stream_user() -> str:
+    """Bearer token, or a ticket from POST /api/applications/events/ticket."""
+    if get_bearer_token():
+        return require_user()[0]
+    uid = stream_tickets.redeem(db, request.args.get("ticket"))
+    if not uid:
+        raise PermissionError("Missing Authorization: Bearer token or valid ?ticket=")
+    return uid
+
+
+@app.get("/api/applications/events")
+def application_events():
+    """
+    text/event-stream of "application.status" events for the caller's own
+    applications and, for shelters, applications to their pets. Reconnects
+    resume from Last-Event-ID (header, or ?lastEventId=); a "reset" event
+    means the gap could not be replayed and the client should refetch.
+    """
+    try:
+        uid = require_stream_user()
+        topics = topics_for(uid, get_role(uid))
+        status_feed.ensure_started()
+        last_id = request.headers.get("Last-Event-ID") or request.args.get(
+            "lastEventId"
+        )
+        return Response(
+            events.sse_stream(events.hub, topics, last_id),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+    except PermissionError as e:
+        return fail(str(e), 401)
+    except Exception as e:
+        return fail("application_events failed", 500, {"detail": str(e)})
+
+
+@app.get("/api/applications/events/stats")
+def application_events_stats():
+    # per-topic subscriber details, so operators only (same token as profiles)
+    if not profiling.authorized(request.headers.get(profiling.TOKEN_HEADER)):
+        return fail(f"{profiling.TOKEN_HEADER} required", 403)
+    return ok({"hub": events.hub.metrics(), "feed": status_feed.stats})
+
+
 # --------------------------
 # Legacy debug endpoint
 # --------------------------
@@ -0,0 +1,231 @@
+"""
+Shelter-to-shelter similarity served from a prebuilt, memory-mapped artifact.
+
+``build_artifact`` runs the legacy pipeline once, offline
+(``legacy_recommender.build_advanced_matrix``, then cosine similarity
+between shelter columns). It writes flat ``.npy`` arrays into a versioned
+directory:
+
+    <root>/CURRENT                  name of the live version
+    <root>/<version>/manifest.json
+    <root>/<version>/shelter_ids.npy   int64[S]
+    <root>/<version>/foster_ids.npy    int64[F]
+    <root>/<version>/matrix.npy        float32[F, S]  normalized interactions
+    <root>/<version>/neighbours.npy    int32[S, K]    column indices, -1 = none
+    <root>/<version>/scores.npy        float32[S, K]  cosine similarity
+
+Workers open the arrays with ``mmap_mode="r"``. Loading costs a few page
+faults instead of a rebuild, and every worker on the host reads the same
+page-cache pages instead of keeping a private copy. A new version is
+published by renaming its finished directory into place and then replacing
+CURRENT atomically. ``ArtifactStore`` notices the change and swaps the
+reference it hands out. Readers that still hold the old arrays keep them:
+the old files stay mapped even after they are pruned.
+"""
+
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from services import clients
+
+np = clients.lazy_import("numpy")
+
+FORMAT = 1
+TOP_K = 20
+CURRENT = "CURRENT"
+ARRAYS = ("shelter_ids", "foster_ids", "matrix", "neighbours", "scores")
+# rows of the S x S similarity computed at a time, to bound peak memory
+BLOCK_ROWS = 512
+
+
+# --------------------------
+# Offline build
+# --------------------------
+def _neighbours(matrix, top_k: int):
+    """Top-k cosine neighbours of every column, excluding the column itself."""
+    norms = np.linalg.norm(matrix, axis=0)
+    unit = matrix / np.where(norms == 0, 1, norms)
+    n = unit.shape[1]
+    k = min(top_k, max(0, n - 1))
+    idx = np.full((n, top_k), -1, dtype=np.int32)
+    scores = np.zeros((n, top_k), dtype=np.float32)
+    if k == 0:
+        return idx, scores
+    for lo in range(0, n, BLOCK_ROWS):
+        hi = min(n, lo + BLOCK_ROWS)
+        sim = unit[:, lo:hi].T @ unit
+        sim[np.arange(hi - lo), np.arange(lo, hi)] = -np.inf
+        top = np.argpartition(-sim, k - 1, axis=1)[:, :k]
+        top_sim = np.take_along_axis(sim, top, axis=1)
+        order = np.argsort(-top_sim, axis=1, kind="stable")
+        idx[lo:hi, :k] = np.take_along_axis(top, order, axis=1)
+        scores[lo:hi, :k] = np.take_along_axis(top_sim, order, axis=1)
+    return idx, scores
+
+
+def build_artifact(
+    raw_records: Iterable[Dict[str, Any]],
+    root: str,
+    top_k: int = TOP_K,
+    keep: int = 3,
+) -> str:
+    """Build a new version under ``root``, make it current; returns its name."""
+    from algorithms import legacy_recommender
+
+    frame = legacy_recommender.build_advanced_matrix(list(raw_records))
+    if frame.empty:
+        raise ValueError("no interaction records to build from")
+    matrix = np.ascontiguousarray(frame.to_numpy(dtype=np.float32))
+    neighbours, scores = _neighbours(matrix.astype(np.float64), top_k)
+    arrays = {
+        "shelter_ids": np.asarray(frame.columns, dtype=np.int64),
+        "foster_ids": np.asarray(frame.index, dtype=np.int64),
+        "matrix": matrix,
+        "neighbours": neighbours,
+        "scores": scores.astype(np.float32),
+    }
+
+    now = datetime.now(timezone.utc)
+    version = f"{now:%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:6]}"
+    base = Path(root)
+    base.mkdir(parents=True, exist_ok=True)
+    staging = base / f".building-{version}"
+    staging.mkdir()
+    try:
+        for name, arr in arrays.items():
+            with open(staging / f"{name}.npy", "wb") as f:
+                np.save(f, arr, allow_pickle=False)
+                f.flush()
+                os.fsync(f.fileno())
+        manifest = {
+            "format": FORMAT,
+            "version": version,
+            "createdAt": now.isoformat(),
+            "shelters": int(matrix.shape[1]),
+            "fosters": int(matrix.shape[0]),
+            "topK": top_k,
+            "weights": legacy_recommender.WEIGHT_CONFIG,
+        }
+        (staging / "manifest.json").write_text(json.dumps(manifest, indent=2))
+        os.rename(staging, base / version)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    pointer = base / f".{CURRENT}-{version}"
+    pointer.write_text(version + "\n")
+    os.replace(pointer, base / CURRENT)
+    prune(root, keep)
+    return version
+
+
+def prune(root: str, keep: int = 3) -> List[str]:
+    """Delete all but the newest ``keep`` versions (never the current one)."""
+    base = Path(root)
+    current = read_current(root)
+    versions = sorted(
+        p.name for p in base.iterdir() if p.is_dir() and not p.name.startswith(".")
+    )
+    doomed = [v for v in versions[: max(0, len(versions) - keep)] if v != current]
+    for v in doomed:
+        shutil.rmtree(base / v, ignore_errors=True)
+    return doomed
+
+
+def read_current(root: str) -> Optional[str]:
+    try:
+        return (Path(root) / CURRENT).read_text().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+# --------------------------
+# Serving
+# --------------------------
+class SimilarityArtifact:
+    """One version of the artifact, arrays mapped read-only."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.manifest = json.loads((path / "manifest.json").read_text())
+        if self.manifest.get("format") != FORMAT:
+            raise ValueError(f"unsupported artifact format in {path}")
+        self.version = self.manifest["version"]
+        for name in ARRAYS:
+            setattr(
+                self,
+                name,
+                np.load(path / f"{name}.npy", mmap_mode="r", allow_pickle=False),
+            )
+        # shelter id -> column; S ints, the only per-worker copy
+        self._column = {int(s): i for i, s in enumerate(self.shelter_ids)}
+
+    def similar(self, shelter_id: int, limit: int = 10) -> List[Tuple[int, float]]:
+        """Most similar shelters first, as ``get_hybrid_recommendations`` ranks them."""
+        col = self._column.get(int(shelter_id))
+        if col is None:
+            return []
+        out = []
+        for j, score in zip(self.neighbours[col][:limit], self.scores[col][:limit]):
+            if j < 0:
+                break
+            out.append((int(self.shelter_ids[j]), float(score)))
+        return out
+
+
+class ArtifactStore:
+    """Hands out the current artifact and swaps in new versions as they appear."""
+
+    def __init__(self, root: str, check_every: float = 5.0):
+        self.root = root
+        self.check_every = check_every
+        self._artifact: Optional[SimilarityArtifact] = None
+        self._checked = float("-inf")
+        self._lock = threading.Lock()
+        self.swaps = 0
+        self.last_error: Optional[str] = None
+
+    def current(self) -> Optional[SimilarityArtifact]:
+        now = time.monotonic()
+        if now - self._checked >= self.check_every:
+            # only the first load makes callers wait; later checks are skipped
+            # by threads that find another one already checking
+            if self._lock.acquire(self._artifact is None):
+                try:
+                    if now - self._checked >= self.check_every:
+                        self._checked = now
+                        self._refresh()
+                finally:
+                    self._lock.release()
+        return self._artifact
+
+    def _refresh(self):
+        version = read_current(self.root)
+        loaded = self._artifact
+        if version is None or (loaded is not None and loaded.version == version):
+            return
+        try:
+            self._artifact = SimilarityArtifact(Path(self.root) / version)
+            self.swaps += 1
+            self.last_error = None
+        except (OSError, ValueError, KeyError) as e:
+            # keep serving the previous version
+            self.last_error = f"{version}: {e}"
+            print(f"[similarity] could not load artifact {version}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        artifact = self._artifact
+        return {
+            "root": self.root,
+            "version": artifact.version if artifact else None,
+            "shelters": artifact.manifest["shelters"] if artifact else 0,
+            "swaps": self.swaps,
+            "lastError": self.last_error,
+        }
@@ -1,6 +1,7 @@
 #
 
 
+import hashlib
 import html
 import json
 import os
@@ -9,14 +10,8 @@ import uuid
 from pathlib import Path
 from urllib.parse import urljoin, urlparse
 
-import firebase_admin
-import google.genai as genai
-import requests as http_requests
 import typing_extensions as typing
-from bs4 import BeautifulSoup
 from dotenv import load_dotenv
-from elevenlabs import ElevenLabs
-from firebase_admin import credentials, firestore, storage
 from flask import (
     Flask,
     Response,
@@ -25,17 +20,35 @@ from flask import (
     request,
     send_from_directory,
 )
-from google.genai import types as genai_types
-
-# from algorithms.recommender import build_advanced_matrix, get_hybrid_recommendations
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+from algorithms.shelter_similarity import ArtifactStore
+from services import (
+    admission,
+    clients,
+    email_index,
+    http_client,
+    metrics,
+    profiling,
+)
+from services.repository import Repository, install_request_stats, request_repository
+from services.single_flight import SingleFlight
+from services.write_behind import WriteBehindJournal, doc_id_for
 
 load_dotenv()
 
-cred_path = os.environ.get("FIREBASE_CREDENTIALS")
-elevenlabs_api_path = os.environ.get("ELEVEN_LABS_API_KEY")
-GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
+# SDKs are imported and their clients built on first use (services/clients.py)
+firestore = clients.lazy_import("firebase_admin.firestore")
+gcloud_exceptions = clients.lazy_import("google.api_core.exceptions")
+db = clients.proxy("firestore")
+_gemini_client = clients.proxy("gemini")
+elevenlabs_client = clients.proxy("elevenlabs")
 
-_gemini_client = genai.Client(api_key=GEMINI_API_KEY)
+# identical concurrent upstream calls share one in-flight request
+_gemini_flight = SingleFlight("gemini")
+_tts_flight = SingleFlight("elevenlabs")
+_overpass_flight = SingleFlight("overpass")
+_ipapi_flight = SingleFlight("ip-api")
 
 
 class ShelterRecord(typing.TypedDict):
@@ -45,8 +58,8 @@ class ShelterRecord(typing.TypedDict):
     image_url: str
 
 
-def extract_shelter_data_from_text(raw_website_text: str, shelter_id: int):
-    prompt = f"""
+def _extract_prompt(shelter_id: int) -> str:
+    return f"""
 You are a data extraction assistant analyzing raw website text from a local animal shelter.
 Find all the available dogs.
 Calculate the lowest age among the dogs found and return it as an integer in months for 'lowest_age'.
@@ -54,32 +67,61 @@ Count the total number of dogs found for 'quantity_anim'.
 Find one valid image URL of a dog and return it for 'image_url'.
 Use {shelter_id} for the shelter_id.
 """
+
+
+GEMINI_MODEL = "gemini-2.5-flash"
+
+
+def _extract_request(raw_website_text: str, shelter_id: int):
+    """(contents, config, single-flight key) shared by the sync and async paths."""
+    from google.genai import types as genai_types
+
+    contents = f"{_extract_prompt(shelter_id)}\n\nRAW TEXT:\n{raw_website_text}"
+    config = genai_types.GenerateContentConfig(
+        response_mime_type="application/json",
+        response_schema=list[ShelterRecord],
+    )
+    return contents, config, hashlib.sha256(contents.encode("utf-8")).hexdigest()
+
+
+def extract_shelter_data_from_text(raw_website_text: str, shelter_id: int):
+    contents, config, key = _extract_request(raw_website_text, shelter_id)
+
+    def _call():
+        limiter = admission.controller.enter("extract", None)
+        try:
+            with metrics.dependency("gemini"):
+                result = _gemini_client.models.generate_content(
+                    model=GEMINI_MODEL, contents=contents, config=config
+                )
+        finally:
+            limiter.release()
+        return result.text
+
     try:
-        result = _gemini_client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=f"{prompt}\n\nRAW TEXT:\n{raw_website_text}",
-            config=genai_types.GenerateContentConfig(
-                response_mime_type="application/json",
-                response_schema=list[ShelterRecord],
-            ),
-        )
-        return json.loads(result.text)
+        return json.loads(_gemini_flight.do(key, _call))
     except Exception:
         return []
 
 
-if not firebase_admin._apps:
-    cred = credentials.Certificate(cred_path)
-    firebase_admin.initialize_app(cred)
-
-db = firestore.client()
-elevenlabs_client = ElevenLabs(api_key=elevenlabs_api_path)
+# X-Forwarded-For entries appended by our own proxies (load balancer, ...);
+# anything further left is client-supplied and never trusted
+TRUSTED_PROXY_HOPS = int(os.environ.get("TRUSTED_PROXY_HOPS", "0"))
 
 _frontend = Path(__file__).resolve().parent.parent.parent / "frontend"
 app = Flask(
     __name__,
     template_folder=_frontend,
 )
+install_request_stats(app)
+metrics.instrument_flask(app, "app")
+profiling.install_flask(app, "app")
+if TRUSTED_PROXY_HOPS:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_HOPS)
+
+
+def repo() -> Repository:
+    return request_repository(db)
 
 
 @app.route("/", defaults={"path": ""})
@@ -108,8 +150,25 @@ def signup():
     if not email or not password or not username:
         return jsonify({"status": "error", "message": "Missing required fields"}), 400
 
-    existing = db.collection("userIdentification").where("email", "==", email).get()
-    if existing:
+    handle = f"{username}-{uuid.uuid4().hex[:8]}"
+    user_ref = db.collection("userIdentification").document()
+    account = {
+        "email": email,
+        "password": password,
+        "username": username,
+        "handle": handle,
+    }
+
+    # create() fails the whole batch if the email is already indexed, so two
+    # concurrent signups for the same address can't both succeed
+    batch = repo().batch()
+    batch.create(
+        email_index.index_ref(db, email), email_index.index_entry(account, user_ref.id)
+    )
+    batch.set(user_ref, account)
+    try:
+        batch.commit()
+    except gcloud_exceptions.AlreadyExists:
         return jsonify(
             {
                 "status": "error",
@@ -117,11 +176,6 @@ def signup():
             }
         ), 409
 
-    handle = f"{username}-{uuid.uuid4().hex[:8]}"
-    db.collection("userIdentification").add(
-        {"email": email, "password": password, "username": username, "handle": handle}
-    )
-
     return jsonify({"status": "success", "username": username, "handle": handle})
 
 
@@ -134,16 +188,17 @@ def login():
     if not email or not password:
         return jsonify({"status": "error", "message": "Missing email or password"}), 400
 
-    results = (
-        db.collection("userIdentification")
-        .where("email", "==", email)
-        .where("password", "==", password)
-        .get()
-    )
-    if not results:
+    snap = repo().get(email_index.index_ref(db, email))
+    user = snap.to_dict() if snap.exists else None
+    account = None
+    if user and user.get("userId"):
+        account_snap = repo().get(
+            db.collection("userIdentification").document(user["userId"])
+        )
+        account = account_snap.to_dict() if account_snap.exists else None
+    if not account or account.get("password") != password:
         return jsonify({"status": "error", "message": "Invalid email or password"}), 401
 
-    user = results[0].to_dict()
     return jsonify(
         {
             "status": "success",
@@ -165,10 +220,17 @@ def _strip_html(raw):
 
 
 def _fetch_soup(url, timeout=8):
-    resp = http_requests.get(
-        url, headers=_SCRAPE_HEADERS, timeout=timeout, allow_redirects=True
+    resp = http_client.client.get(
+        url,
+        "scrape",
+        headers=_SCRAPE_HEADERS,
+        timeout=timeout,
+        retries=0,
+        allow_redirects=True,
     )
     resp.raise_for_status()
+    from bs4 import BeautifulSoup
+
     return BeautifulSoup(resp.text, "html.parser")
 
 
@@ -198,6 +260,15 @@ def _candidate_adopt_urls(base_url, home_soup):
     return found[:6]
 
 
+def _body_text(soup):
+    body = soup.find("body")
+    if not body:
+        return ""
+    for tag in body.find_all(["script", "style", "noscript"]):
+        tag.decompose()
+    return re.sub(r"\s{2,}", " ", body.get_text(separator=" ", strip=True)).strip()
+
+
 def _scrape_shelter_text(website):
     """Fetch shelter homepage + candidate adoption pages, return combined plain body text."""
     texts = []
@@ -206,14 +277,6 @@ def _scrape_shelter_text(website):
     except Exception:
         return ""
 
-    def _body_text(soup):
-        body = soup.find("body")
-        if not body:
-            return ""
-        for tag in body.find_all(["script", "style", "noscript"]):
-            tag.decompose()
-        return re.sub(r"\s{2,}", " ", body.get_text(separator=" ", strip=True)).strip()
-
     texts.append(_body_text(home)[:3000])
 
     for url in _candidate_adopt_urls(website, home)[:3]:
@@ -225,58 +288,117 @@ def _scrape_shelter_text(website):
     return " ".join(texts)[:8000]
 
 
+# overridable so load tests can point them at local stubs
+OVERPASS_URL = os.environ.get(
+    "OVERPASS_URL", "https://overpass-api.de/api/interpreter"
+)
+IP_API_URL = os.environ.get("IP_API_URL", "http://ip-api.com/json")
+NEARBY_POSTS_BUDGET = float(os.environ.get("NEARBY_POSTS_BUDGET_SECONDS", "12"))
+
+
+def _overpass_query(lat, lon, radius):
+    return f'[out:json][timeout:25];(node["amenity"="animal_shelter"](around:{radius},{lat},{lon});way["amenity"="animal_shelter"](around:{radius},{lat},{lon}););out center tags;'
+
+
 def _overpass_shelters(lat, lon, radius):
-    q = f'[out:json][timeout:25];(node["amenity"="animal_shelter"](around:{radius},{lat},{lon});way["amenity"="animal_shelter"](around:{radius},{lat},{lon}););out center tags;'
-    resp = http_requests.post(
-        "https://overpass-api.de/api/interpreter", data=q, timeout=20
-    )
-    return resp.json().get("elements", [])
+    q = _overpass_query(lat, lon, radius)
+
+    def _call():
+        # Overpass queries are read-only, so retrying the POST is safe
+        resp = http_client.client.post(
+            OVERPASS_URL, "overpass", data=q, timeout=20, idempotent=True
+        )
+        return resp.json().get("elements", [])
 
+    return _overpass_flight.do(q, _call)
 
-def get_user_location(request_obj):
-    ip = request_obj.headers.get("X-Forwarded-For", request_obj.remote_addr)
+
+DEFAULT_LOCATION = (37.338, -121.886, "San José")
+
+
+def _client_ip(forwarded_for, remote_addr):
+    """
+    The client address as ProxyFix(x_for=TRUSTED_PROXY_HOPS) resolves it,
+    for requests that don't pass through the Flask app (asgi.py routes).
+    """
+    if TRUSTED_PROXY_HOPS and forwarded_for:
+        hops = [h.strip() for h in forwarded_for.split(",")]
+        if len(hops) >= TRUSTED_PROXY_HOPS:
+            return hops[-TRUSTED_PROXY_HOPS]
+    return remote_addr or ""
+
+
+def _location_ip(forwarded_for, remote_addr):
+    """
+    Address to geolocate: the leftmost X-Forwarded-For entry, i.e. the
+    original client behind any proxies. A client that spoofs it only moves
+    its own location, so unlike the rate-limit key this doesn't need the
+    trusted-hop rule.
+    """
+    ip = forwarded_for or remote_addr or ""
     if "," in ip:
         ip = ip.split(",")[0].strip()
+    return ip
+
+
+def _request_client_key():
+    # ProxyFix has already resolved remote_addr from the trusted hops
+    return request.remote_addr or ""
+
+
+def _location_from_ipapi(geo):
+    if geo.get("status") == "success":
+        return geo.get("lat"), geo.get("lon"), geo.get("city", "Nearby")
+    return DEFAULT_LOCATION
+
+
+def get_user_location(request_obj):
+    ip = _location_ip(
+        request_obj.headers.get("X-Forwarded-For"), request_obj.remote_addr
+    )
     try:
-        res = http_requests.get(f"http://ip-api.com/json/{ip}", timeout=3)
-        geo = res.json()
-        if geo.get("status") == "success":
-            return geo.get("lat"), geo.get("lon"), geo.get("city", "Nearby")
+        geo = _ipapi_flight.do(
+            ip,
+            lambda: http_client.client.get(
+                f"{IP_API_URL}/{ip}", "ip-api", timeout=3, retries=1
+            ).json(),
+        )
+        return _location_from_ipapi(geo)
     except Exception:
         pass
-    return 37.338, -121.886, "San José"
+    return DEFAULT_LOCATION
+
+
+def _nearby_posts_payload(elements, city):
+    result = []
+    for i, s in enumerate(elements[:10]):
+        tags = s.get("tags", {})
+        name = tags.get("name", "Local Animal Shelter")
+        result.append(
+            {
+                "id": i + 1,
+                "poster": name,
+                "isShelter": True,
+                "website": tags.get("website", ""),
+                "text": f"{name} is an animal shelter near {city}. Visit us to find your next companion!",
+                "media": "",
+                "likes": 0,
+                "location": city,
+                "comments": [],
+            }
+        )
+    return result
 
 
 @app.route("/api/nearby-posts", methods=["GET"])
+@admission.guard("nearby", key=_request_client_key)
+@http_client.with_deadline(NEARBY_POSTS_BUDGET)
 def nearby_posts():
     lat, lon, city = get_user_location(request)
 
-    q = f'[out:json][timeout:25];(node["amenity"="animal_shelter"](around:30000,{lat},{lon});way["amenity"="animal_shelter"](around:30000,{lat},{lon}););out center tags;'
     try:
-        overpass_res = http_requests.post(
-            "https://overpass-api.de/api/interpreter", data=q, timeout=20
-        )
-        elements = overpass_res.json().get("elements", [])
-
-        result = []
-        for i, s in enumerate(elements[:10]):
-            tags = s.get("tags", {})
-            name = tags.get("name", "Local Animal Shelter")
-            result.append(
-                {
-                    "id": i + 1,
-                    "poster": name,
-                    "isShelter": True,
-                    "website": tags.get("website", ""),
-                    "text": f"{name} is an animal shelter near {city}. Visit us to find your next companion!",
-                    "media": "",
-                    "likes": 0,
-                    "location": city,
-                    "comments": [],
-                }
-            )
-
-        return jsonify(result)
+        elements = _overpass_shelters(lat, lon, 30000)
+        return jsonify(_nearby_posts_payload(elements, city))
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -359,22 +481,56 @@ def _months_to_age_str(months):
     return label
 
 
+@app.route("/api/upstreams", methods=["GET"])
+def upstream_stats():
+    return jsonify({"ok": True, "upstreams": http_client.client.stats()})
+
+
+@app.route("/api/admission", methods=["GET"])
+def admission_stats():
+    return jsonify({"ok": True, "policies": admission.controller.stats()})
+
+
 @app.route("/api/adoptable-animals", methods=["GET"])
 def adoptable_animals():
     return jsonify(_DEMO_ANIMALS)
 
 
+# foster-interest submits are journaled locally and flushed to Firestore in
+# batches (FOSTER_WRITE_BEHIND=0 writes straight through instead)
+foster_journal = (
+    WriteBehindJournal(db, "fosterInterest")
+    if os.environ.get("FOSTER_WRITE_BEHIND", "1") != "0"
+    else None
+)
+
+
 @app.route("/api/foster-interest", methods=["POST"])
 def foster_interest():
     data = request.get_json() or {}
-    db.collection("fosterInterest").add(
-        {
-            **data,
-            "submittedAt": firestore.SERVER_TIMESTAMP,
-            "status": "pending",
-        }
-    )
-    return jsonify({"ok": True, "message": "Application received!"})
+    doc = {**data, "status": "pending"}
+    key = request.headers.get("Idempotency-Key") or data.get("idempotencyKey")
+
+    if foster_journal is not None:
+        try:
+            doc_id = foster_journal.submit(doc, idempotency_key=key)
+            return jsonify(
+                {"ok": True, "message": "Application received!", "id": doc_id}
+            )
+        except OSError as e:
+            print(f"[foster-interest] journal unavailable, writing through: {e}")
+
+    ref = db.collection("fosterInterest")
+    ref = ref.document(doc_id_for(key)) if key else ref.document()
+    repo().set(ref, {**doc, "submittedAt": firestore.SERVER_TIMESTAMP})
+    return jsonify({"ok": True, "message": "Application received!", "id": ref.id})
+
+
+@app.route("/api/foster-interest/journal", methods=["GET"])
+def foster_journal_stats():
+    if foster_journal is None:
+        return jsonify({"ok": True, "enabled": False})
+    return jsonify({"ok": True, "enabled": True, **foster_journal.metrics()})
 
 
 @app.route("/find-shelters", methods=["POST"])
@@ -393,7 +549,15 @@ def find_shelters():
     )
 
 
+TTS_MODEL = "eleven_turbo_v2_5"
+
+
+def _tts_key(gender, text):
+    return (VOICE_IDS[gender], " ".join(text.split()))
+
+
 @app.route("/generate-animal-speech", methods=["POST"])
+@admission.guard("tts", key=_request_client_key)
 def generate_animal_speech():
     data = request.get_json() or {}
     text = data.get("text")
@@ -405,11 +569,16 @@ def generate_animal_speech():
         gender = "male"
 
     print(f"[TTS] gender={gender} voice={VOICE_IDS[gender]} text={text[:60]!r}")
+
+    def _synthesize():
+        with metrics.dependency("elevenlabs"):
+            audio_chunks = elevenlabs_client.text_to_speech.convert(
+                text=text, voice_id=VOICE_IDS[gender], model_id=TTS_MODEL
+            )
+            return b"".join(audio_chunks)
+
     try:
-        audio_chunks = elevenlabs_client.text_to_speech.convert(
-            text=text, voice_id=VOICE_IDS[gender], model_id="eleven_turbo_v2_5"
-        )
-        audio_bytes = b"".join(audio_chunks)
+        audio_bytes = _tts_flight.do(_tts_key(gender, text), _synthesize)
         print(f"[TTS] success, {len(audio_bytes)} bytes")
         return Response(audio_bytes, mimetype="audio/mpeg")
     except Exception as e:
@@ -417,45 +586,59 @@ def generate_animal_speech():
         return jsonify({"error": str(e)}), 500
 
 
-# @app.route("/api/recommend", methods=["GET"])
-# def recommend():
-#     try:
-#         target_id = request.args.get("shelter_id", type=int)
-
-#         interactions_ref = db.collection("interactions")
-#         docs = interactions_ref.stream()
-
-#         raw_data = []
-#         for doc in docs:
-#             data = doc.to_dict()
-#             raw_data.append({
-#                 "foster_id": data.get("foster_id"),
-#                 "shelter_id": data.get("shelter_id"),
-#                 "follow": data.get("follow"),
-#                 "star": data.get("star"),
-#                 "lowest_age": data.get("lowest_age"),
-#                 "quantity_anim": data.get("quantity_anim")
-#             })
-
-#         matrix = build_advanced_matrix(raw_data)
-#         recommendations = get_hybrid_recommendations(target_id, matrix)
-
-#         enriched_results = []
-#         for s_id, score in recommendations.items():
-#             shelter_doc = db.collection("shelters").document(str(s_id)).get()
-
-#             if shelter_doc.exists:
-#                 info = shelter_doc.to_dict()
-#                 enriched_results.append({
-#                     "shelter_id": int(s_id),
-#                     "name": info.get("name"),
-#                     "image_url": info.get("image_url"),
-#                     "similarity": round(float(score), 2)
-#                 })
-
-#         return jsonify(enriched_results)
-#     except Exception as e:
-#         return jsonify({"error": str(e)}), 500
+# --------------------------
+# Similar shelters (prebuilt artifact, see algorithms/shelter_similarity.py)
+# --------------------------
+similarity_store = (
+    ArtifactStore(os.environ["SIMILARITY_ARTIFACT_DIR"])
+    if os.environ.get("SIMILARITY_ARTIFACT_DIR")
+    else None
+)
+
+
+@app.route("/api/recommend", methods=["GET"])
+def recommend():
+    target_id = request.args.get("shelter_id", type=int)
+    limit = min(request.args.get("limit", 10, type=int), 50)
+    if target_id is None:
+        return jsonify({"error": "shelter_id is required"}), 400
+    artifact = similarity_store.current() if similarity_store else None
+    if artifact is None:
+        return jsonify({"error": "similarity artifact not built"}), 503
+    # the artifact only keeps topK neighbours per shelter; the applied limit
+    # goes in a header so the list body keeps its shape
+    limit = max(0, min(limit, int(artifact.manifest["topK"])))
+    try:
+        neighbours = artifact.similar(target_id, limit)
+        refs = [db.collection("shelters").document(str(s_id)) for s_id, _ in neighbours]
+        docs = {d.id: d for d in repo().get_all(refs)}
+
+        enriched_results = []
+        for s_id, score in neighbours:
+            shelter_doc = docs.get(str(s_id))
+            if shelter_doc is not None and shelter_doc.exists:
+                info = shelter_doc.to_dict()
+                enriched_results.append(
+                    {
+                        "shelter_id": s_id,
+                        "name": info.get("name"),
+                        "image_url": info.get("image_url"),
+                        "similarity": round(score, 2),
+                    }
+                )
+        resp = jsonify(enriched_results)
+        resp.headers["X-Recommend-Limit"] = str(limit)
+        return resp
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/api/recommend/artifact", methods=["GET"])
+def recommend_artifact_stats():
+    if similarity_store is None:
+        return jsonify({"ok": True, "enabled": False})
+    similarity_store.current()
+    return jsonify({"ok": True, "enabled": True, **similarity_store.stats()})
 
 
 if __name__ == "__main__":
@@ -0,0 +1,558 @@
+"""
+ASGI entry point (async serving mode).
+
+    cd backend/src && uvicorn asgi:application --workers 2
+
+The slow, I/O-bound routes of app.py are served natively on asyncio here,
+so a request waiting on Overpass or ElevenLabs costs a coroutine instead of
+a worker thread:
+
+    GET  /api/nearby-posts
+    POST /generate-animal-speech
+
+Async counterparts of the scraping and Gemini extraction helpers live here
+too. Everything else is handed to the unchanged Flask app on a bounded thread
+pool, so the sync handlers keep working as-is. Native routes buffer their
+body (up to MAX_BODY_BYTES); fallback routes read theirs as a stream, so
+large uploads such as the pet import are not capped here.
+
+The pets/applications API (algorithms/recommender.py) has its own entry
+point, ``asgi:recommender_application``. Its application status stream
+(``GET /api/applications/events``) runs natively, so each idle SSE
+connection costs a coroutine and a queue instead of a pool thread.
+"""
+
+import asyncio
+import inspect
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+import app as flask_app_module
+from services import (
+    admission,
+    async_http,
+    clients,
+    events,
+    http_client,
+    metrics,
+    stream_tickets,
+)
+from services.single_flight import AsyncSingleFlight
+
+WSGI_THREADS = int(os.environ.get("ASGI_WSGI_THREADS", "32"))
+# native routes buffer their (small JSON) bodies; WSGI routes stream theirs
+MAX_BODY_BYTES = 1024 * 1024
+
+_wsgi_pool = ThreadPoolExecutor(max_workers=WSGI_THREADS, thread_name_prefix="wsgi")
+_overpass_flight = AsyncSingleFlight("overpass")
+_ipapi_flight = AsyncSingleFlight("ip-api")
+_tts_flight = AsyncSingleFlight("elevenlabs")
+_gemini_flight = AsyncSingleFlight("gemini")
+
+
+# --------------------------
+# Minimal request/response helpers
+# --------------------------
+class AsyncRequest:
+    def __init__(self, scope, body: bytes):
+        self.scope = scope
+        self.body = body
+        self.headers = {
+            k.decode("latin-1").lower(): v.decode("latin-1")
+            for k, v in scope.get("headers", [])
+        }
+        self.args = {
+            k: v[0]
+            for k, v in parse_qs(scope.get("query_string", b"").decode()).items()
+        }
+
+    @property
+    def remote_addr(self):
+        client = self.scope.get("client")
+        return client[0] if client else ""
+
+    def json(self) -> Dict[str, Any]:
+        try:
+            data = json.loads(self.body or b"{}")
+        except ValueError:
+            return {}
+        return data if isinstance(data, dict) else {}
+
+
+Reply = Tuple[int, str, bytes]
+
+
+def json_reply(payload: Any, status: int = 200) -> Reply:
+    return status, "application/json", json.dumps(payload).encode("utf-8")
+
+
+async def _read_body(receive) -> bytes:
+    chunks: List[bytes] = []
+    size = 0
+    more = True
+    while more:
+        msg = await receive()
+        chunk = msg.get("body", b"")
+        size += len(chunk)
+        if size > MAX_BODY_BYTES:
+            raise ValueError("request body too large")
+        chunks.append(chunk)
+        more = msg.get("more_body", False)
+    return b"".join(chunks)
+
+
+async def _send(send, reply: Reply, headers: Optional[Dict[str, str]] = None):
+    status, content_type, body = reply
+    raw_headers = [
+        (b"content-type", content_type.encode("latin-1")),
+        (b"content-length", str(len(body)).encode("latin-1")),
+    ]
+    for k, v in (headers or {}).items():
+        raw_headers.append((k.lower().encode("latin-1"), v.encode("latin-1")))
+    await send(
+        {"type": "http.response.start", "status": status, "headers": raw_headers}
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _wait_disconnect(receive):
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+async def _send_stream(send, receive, chunks, headers: Dict[str, str]):
+    """Stream an async iterator of str chunks until it ends or the client leaves."""
+    await send(
+        {
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (k.lower().encode("latin-1"), v.encode("latin-1"))
+                for k, v in headers.items()
+            ],
+        }
+    )
+
+    async def pump():
+        async for chunk in chunks:
+            await send(
+                {
+                    "type": "http.response.body",
+                    "body": chunk.encode("utf-8"),
+                    "more_body": True,
+                }
+            )
+
+    tasks = [
+        asyncio.ensure_future(pump()),
+        asyncio.ensure_future(_wait_disconnect(receive)),
+    ]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await chunks.aclose()
+    if tasks[0].done() and not tasks[0].cancelled() and tasks[0].exception() is None:
+        await send({"type": "http.response.body", "body": b""})
+
+
+# --------------------------
+# Async upstream calls
+# --------------------------
+async def get_user_location(req: AsyncRequest):
+    ip = flask_app_module._location_ip(
+        req.headers.get("x-forwarded-for"), req.remote_addr
+    )
+
+    async def _call():
+        resp = await async_http.client.get(
+            f"{flask_app_module.IP_API_URL}/{ip}", "ip-api", timeout=3, retries=1
+        )
+        return resp.json()
+
+    try:
+        return flask_app_module._location_from_ipapi(await _ipapi_flight.do(ip, _call))
+    except Exception:
+        return flask_app_module.DEFAULT_LOCATION
+
+
+async def overpass_shelters(lat, lon, radius):
+    q = flask_app_module._overpass_query(lat, lon, radius)
+
+    async def _call():
+        resp = await async_http.client.post(
+            flask_app_module.OVERPASS_URL,
+            "overpass",
+            content=q,
+            timeout=20,
+            idempotent=True,
+        )
+        return resp.json().get("elements", [])
+
+    return await _overpass_flight.do(q, _call)
+
+
+async def fetch_soup(url, timeout=8):
+    resp = await async_http.client.get(
+        url,
+        "scrape",
+        headers=flask_app_module._SCRAPE_HEADERS,
+        timeout=timeout,
+        retries=0,
+    )
+    resp.raise_for_status()
+    from bs4 import BeautifulSoup
+
+    return BeautifulSoup(resp.text, "html.parser")
+
+
+async def scrape_shelter_text(website):
+    try:
+        home = await fetch_soup(website)
+    except Exception:
+        return ""
+    texts = [flask_app_module._body_text(home)[:3000]]
+
+    urls = flask_app_module._candidate_adopt_urls(website, home)[:3]
+    pages = await asyncio.gather(*(fetch_soup(u) for u in urls), return_exceptions=True)
+    for page in pages:
+        if not isinstance(page, Exception):
+            texts.append(flask_app_module._body_text(page)[:3000])
+    return " ".join(texts)[:8000]
+
+
+async def extract_shelter_data_from_text(raw_website_text: str, shelter_id: int):
+    contents, config, key = flask_app_module._extract_request(
+        raw_website_text, shelter_id
+    )
+
+    async def _call():
+        limiter = await admission.controller.enter_async("extract", None)
+        sem = await async_http.client.acquire("gemini")
+        try:
+            with metrics.dependency("gemini"):
+                result = await clients.get("gemini").aio.models.generate_content(
+                    model=flask_app_module.GEMINI_MODEL,
+                    contents=contents,
+                    config=config,
+                )
+            return result.text
+        finally:
+            sem.release()
+            limiter.release()
+
+    try:
+        return json.loads(await _gemini_flight.do(key, _call))
+    except Exception:
+        return []
+
+
+async def synthesize(text: str, gender: str) -> bytes:
+    async def _call():
+        sem = await async_http.client.acquire("elevenlabs")
+        try:
+            with metrics.dependency("elevenlabs"):
+                stream = clients.get("elevenlabs-async").text_to_speech.convert(
+                    text=text,
+                    voice_id=flask_app_module.VOICE_IDS[gender],
+                    model_id=flask_app_module.TTS_MODEL,
+                )
+                if inspect.isawaitable(stream):
+                    stream = await stream
+                return b"".join([chunk async for chunk in stream])
+        finally:
+            sem.release()
+
+    return await _tts_flight.do(flask_app_module._tts_key(gender, text), _call)
+
+
+# --------------------------
+# Async routes
+# --------------------------
+async def nearby_posts(req: AsyncRequest) -> Reply:
+    with http_client.deadline(flask_app_module.NEARBY_POSTS_BUDGET):
+        lat, lon, city = await get_user_location(req)
+        try:
+            elements = await overpass_shelters(lat, lon, 30000)
+            return json_reply(flask_app_module._nearby_posts_payload(elements, city))
+        except Exception as e:
+            return json_reply({"error": str(e)}, 500)
+
+
+async def generate_animal_speech(req: AsyncRequest) -> Reply:
+    data = req.json()
+    text = data.get("text")
+    gender = (data.get("gender") or "male").lower()
+    if not text:
+        return json_reply({"error": "Missing text"}, 400)
+    if gender not in flask_app_module.VOICE_IDS:
+        gender = "male"
+    try:
+        audio = await synthesize(text, gender)
+        return 200, "audio/mpeg", audio
+    except Exception as e:
+        print(f"[TTS] ERROR: {e}")
+        return json_reply({"error": str(e)}, 500)
+
+
+ROUTES: Dict[Tuple[str, str], Callable[[AsyncRequest], Awaitable[Reply]]] = {
+    ("GET", "/api/nearby-posts"): nearby_posts,
+    ("POST", "/generate-animal-speech"): generate_animal_speech,
+}
+# admission policy per native route, as on the Flask views
+ROUTE_POLICIES = {
+    "/api/nearby-posts": "nearby",
+    "/generate-animal-speech": "tts",
+}
+
+
+async def _admitted_reply(handler, req: AsyncRequest):
+    policy = ROUTE_POLICIES.get(req.scope["path"])
+    if policy is None:
+        return await handler(req), None
+    key = flask_app_module._client_ip(
+        req.headers.get("x-forwarded-for"), req.remote_addr
+    )
+    try:
+        limiter = await admission.controller.enter_async(policy, key)
+    except admission.Rejected as e:
+        reply = json_reply({"error": str(e), "retryAfter": e.retry_after_header}, 429)
+        return reply, {"Retry-After": e.retry_after_header}
+    try:
+        return await handler(req), None
+    finally:
+        limiter.release()
+
+
+async def _admit_and_handle(handler, req: AsyncRequest, send):
+    started = time.perf_counter()
+    reply, headers = await _admitted_reply(handler, req)
+    # same labels as the Flask view would get from instrument_flask
+    metrics.observe_request(
+        "app",
+        req.scope["path"],
+        req.scope["method"],
+        reply[0],
+        time.perf_counter() - started,
+    )
+    await _send(send, reply, headers)
+
+
+# --------------------------
+# Recommender API: native SSE stream
+# --------------------------
+def _recommender():
+    # imported on first request so `asgi:application` doesn't pay for it
+    from algorithms import recommender
+
+    return recommender
+
+
+async def _authenticate(req: AsyncRequest):
+    """Bearer token, or a single-use ?ticket= as in recommender.require_stream_user."""
+    h = req.headers.get("authorization", "")
+    token = h.split(" ", 1)[1].strip() if h.startswith("Bearer ") else None
+    if token:
+        decoded = await asyncio.to_thread(clients.get("auth").verify_id_token, token)
+        return decoded["uid"]
+    uid = await asyncio.to_thread(
+        stream_tickets.redeem, clients.get("firestore"), req.args.get("ticket")
+    )
+    if not uid:
+        raise PermissionError("Missing Authorization: Bearer token or valid ?ticket=")
+    return uid
+
+
+def _role(uid: str) -> str:
+    db = clients.get("firestore")
+    return "shelter" if db.collection("shelters").document(uid).get().exists else "user"
+
+
+async def application_events(req: AsyncRequest, receive, send):
+    rec = _recommender()
+    try:
+        uid = await _authenticate(req)
+        topics = rec.topics_for(uid, await asyncio.to_thread(_role, uid))
+        await asyncio.to_thread(rec.status_feed.ensure_started)
+    except PermissionError as e:
+        await _send(send, json_reply({"ok": False, "error": str(e)}, 401))
+        return
+    except Exception as e:
+        reply = {"ok": False, "error": "application_events failed", "detail": str(e)}
+        await _send(send, json_reply(reply, 500))
+        return
+    last_id = req.headers.get("last-event-id") or req.args.get("lastEventId")
+    await _send_stream(
+        send,
+        receive,
+        events.sse_stream_async(events.hub, topics, last_id),
+        {
+            "Content-Type": "text/event-stream",
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+        },
+    )
+
+
+RECOMMENDER_STREAMS = {
+    ("GET", "/api/applications/events"): application_events,
+}
+
+
+# --------------------------
+# WSGI fallback for every other route
+# --------------------------
+class _BodyStream(io.RawIOBase):
+    """
+    ``wsgi.input`` that pulls ASGI body messages as the WSGI app reads, so
+    uploads of any size stream through without being buffered here. Read
+    from the pool thread; each receive() is run on the event loop.
+    """
+
+    def __init__(self, receive, loop):
+        self._receive = receive
+        self._loop = loop
+        self._chunk = b""
+        self._pos = 0
+        self._more = True
+
+    def readable(self):
+        return True
+
+    def readinto(self, buf) -> int:
+        while self._pos >= len(self._chunk) and self._more:
+            msg = asyncio.run_coroutine_threadsafe(self._receive(), self._loop).result()
+            if msg["type"] == "http.disconnect":
+                self._more = False
+                raise ConnectionError("client disconnected during upload")
+            self._chunk, self._pos = msg.get("body", b""), 0
+            self._more = msg.get("more_body", False)
+        n = min(len(buf), len(self._chunk) - self._pos)
+        buf[:n] = self._chunk[self._pos : self._pos + n]
+        self._pos += n
+        return n
+
+
+def _wsgi_environ(scope, body) -> Dict[str, Any]:
+    server = scope.get("server") or ("localhost", 80)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": (scope.get("client") or ("", 0))[0],
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": body,
+        # the stream ends with the last ASGI body message, with or without
+        # a Content-Length (chunked uploads)
+        "wsgi.input_terminated": True,
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    for raw_name, raw_value in scope.get("headers", []):
+        name = raw_name.decode("latin-1").upper().replace("-", "_")
+        value = raw_value.decode("latin-1")
+        if name in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+            environ[name] = value
+        else:
+            key = f"HTTP_{name}"
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+def _run_wsgi(wsgi_app, environ):
+    started: Dict[str, Any] = {}
+
+    def start_response(status, headers, exc_info=None):
+        started["status"] = int(status.split(" ", 1)[0])
+        started["headers"] = headers
+
+    result = wsgi_app(environ, start_response)
+    try:
+        body = b"".join(result)
+    finally:
+        if hasattr(result, "close"):
+            result.close()
+    return started["status"], started["headers"], body
+
+
+async def _serve_wsgi(wsgi_app, scope, receive, send):
+    loop = asyncio.get_running_loop()
+    body = _BodyStream(receive, loop)
+    status, headers, payload = await loop.run_in_executor(
+        _wsgi_pool, _run_wsgi, wsgi_app, _wsgi_environ(scope, body)
+    )
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": payload})
+
+
+async def _lifespan(receive, send):
+    while True:
+        msg = await receive()
+        if msg["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif msg["type"] == "lifespan.shutdown":
+            await async_http.client.aclose()
+            _wsgi_pool.shutdown(wait=False)
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await _lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+
+    handler = ROUTES.get((scope["method"], scope["path"]))
+    if handler is None:
+        await _serve_wsgi(flask_app_module.app.wsgi_app, scope, receive, send)
+        return
+    try:
+        body = await _read_body(receive)
+    except ValueError as e:
+        await _send(send, json_reply({"ok": False, "error": str(e)}, 413))
+        return
+    await _admit_and_handle(handler, AsyncRequest(scope, body), send)
+
+
+async def recommender_application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await _lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+
+    stream = RECOMMENDER_STREAMS.get((scope["method"], scope["path"]))
+    if stream is None:
+        await _serve_wsgi(_recommender().app.wsgi_app, scope, receive, send)
+        return
+    try:
+        body = await _read_body(receive)
+    except ValueError as e:
+        await _send(send, json_reply({"ok": False, "error": str(e)}, 413))
+        return
+    await stream(AsyncRequest(scope, body), receive, send)
@@ -0,0 +1,146 @@
+"""Seeded synthetic data shaped like the production collections.
+
+Every generator takes ``n`` and a ``seed`` and returns the same rows for the
+same arguments, so benchmark runs and load-test fixtures are comparable
+across machines and commits. Distributions are rough but not uniform: most
+pets are dogs and cats, a few breeds dominate, stays and view counts are
+long-tailed, and a few shelters get most of the foster interactions.
+"""
+
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional
+
+SPECIES = {
+    "dog": (
+        ["labrador retriever", "pit bull terrier", "german shepherd", "chihuahua"]
+        + ["beagle", "boxer", "husky", "dachshund", "poodle", "border collie"]
+        + ["golden retriever", "shih tzu", "rottweiler", "mixed breed"]
+    ),
+    "cat": ["domestic shorthair", "domestic longhair", "siamese", "maine coon"]
+    + ["tabby", "tuxedo", "calico"],
+    "rabbit": ["lionhead", "holland lop", "rex"],
+    "bird": ["parakeet", "cockatiel"],
+}
+SPECIES_WEIGHTS = {"dog": 55, "cat": 38, "rabbit": 5, "bird": 2}
+SIZES = ("small", "medium", "large")
+STATUSES = ("adoptable",) * 8 + ("pending", "adopted")
+CITIES = (
+    "Chicago",
+    "Evanston",
+    "Oak Park",
+    "Naperville",
+    "Aurora",
+    "Joliet",
+    "Skokie",
+    "Cicero",
+)
+# roughly the Chicago metro area
+LAT_RANGE = (41.6, 42.1)
+LON_RANGE = (-88.3, -87.5)
+
+
+def _rng(seed: int, stream: str) -> random.Random:
+    # one stream per generator, so adding a field to one doesn't shift another
+    return random.Random(f"{seed}:{stream}")
+
+
+def _weighted(rng: random.Random, weights: Dict[str, int]) -> str:
+    return rng.choices(list(weights), weights=list(weights.values()))[0]
+
+
+def _breed(rng: random.Random, species: str) -> str:
+    breeds = SPECIES[species]
+    # the first breeds of each list are the common ones
+    return breeds[min(len(breeds) - 1, int(rng.expovariate(0.35)))]
+
+
+def iter_pets(
+    n: int,
+    seed: int = 0,
+    shelters: Optional[int] = None,
+    now: Optional[datetime] = None,
+) -> Iterator[Dict[str, Any]]:
+    rng = _rng(seed, "pets")
+    shelters = shelters or max(1, n // 40)
+    now = now or datetime(2026, 1, 1, tzinfo=timezone.utc)
+    for i in range(n):
+        species = _weighted(rng, SPECIES_WEIGHTS)
+        stay_days = min(720.0, rng.expovariate(1 / 25))
+        yield {
+            "id": f"pet{i:07d}",
+            "shelterId": f"shelter{int(rng.paretovariate(1.2)) % shelters:05d}",
+            "name": f"Pet {i}",
+            "species": species,
+            "breed": _breed(rng, species),
+            "ageMonths": int(rng.expovariate(1 / 30)) + 1,
+            "size": rng.choice(SIZES),
+            "sex": rng.choice(("m", "f")),
+            "energy": rng.randint(1, 5),
+            "medicalNeeds": rng.random() < 0.15,
+            "views7d": int(rng.expovariate(1 / 12)),
+            "status": rng.choice(STATUSES),
+            "locationCity": rng.choice(CITIES),
+            "lat": round(rng.uniform(*LAT_RANGE), 5),
+            "lon": round(rng.uniform(*LON_RANGE), 5),
+            "createdAt": now - timedelta(days=stay_days),
+        }
+
+
+def pets(n: int, seed: int = 0, **kwargs) -> List[Dict[str, Any]]:
+    return list(iter_pets(n, seed, **kwargs))
+
+
+def user_profiles(n: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """Query-string style profiles, as sent to /api/pets/<id>/match."""
+    rng = _rng(seed, "users")
+    return [
+        {
+            "hasYard": rng.choice(("yes", "no", "unknown")),
+            "hoursPerWeek": str(rng.choice((2, 4, 5, 8, 10, 15, 20, 30))),
+            "experienceLevel": str(rng.randint(0, 3)),
+            "prefersSize": rng.choice(("any", "any") + SIZES),
+        }
+        for _ in range(n)
+    ]
+
+
+def foster_interactions(
+    n: int,
+    seed: int = 0,
+    fosters: Optional[int] = None,
+    shelters: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """Rows in the shape ``legacy_recommender.build_advanced_matrix`` expects."""
+    rng = _rng(seed, "interactions")
+    fosters = fosters or max(2, n // 20)
+    shelters = shelters or max(2, min(1000, n // 100))
+    profile = {
+        s: (rng.randint(0, 6), rng.randint(5, 120))  # lowest_age, quantity_anim
+        for s in range(1, shelters + 1)
+    }
+    rows = []
+    for _ in range(n):
+        shelter = 1 + int(rng.paretovariate(1.1)) % shelters
+        lowest_age, quantity = profile[shelter]
+        rows.append(
+            {
+                "foster_id": 100 + rng.randrange(fosters),
+                "shelter_id": shelter,
+                "follow": int(rng.random() < 0.4),
+                "star": round(rng.uniform(1.0, 5.0), 1),
+                "lowest_age": lowest_age,
+                "quantity_anim": quantity,
+            }
+        )
+    return rows
+
+
+SCALES = {"1k": 1_000, "10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+
+
+def parse_scale(value: str) -> int:
+    value = value.strip().lower()
+    if value in SCALES:
+        return SCALES[value]
+    return int(value)
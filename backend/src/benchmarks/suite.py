@@ -0,0 +1,265 @@
+"""Benchmark cases for the ranking and matching code.
+
+A case builds its input once per scale (untimed), then times one call of
+the hot path over that input. ``run_case`` reports the best and median
+wall time over ``repeat`` runs and the peak traced allocation of one extra
+run. The allocation run happens separately because tracemalloc slows the
+code it traces.
+
+Results are plain dicts, so a run can be saved as a JSON baseline and
+checked later with ``compare``.
+"""
+
+import gc
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from benchmarks import generators
+
+# Measurements below these are mostly noise; compare ignores them.
+MIN_COMPARABLE_SECONDS = 0.002
+MIN_COMPARABLE_KIB = 256.0
+
+
+@dataclass
+class Case:
+    name: str
+    # n, seed -> zero-argument callable that runs the hot path once
+    setup: Callable[[int, int], Callable[[], Any]]
+    max_n: int = generators.SCALES["1m"]
+    # modules the case needs that may not be installed
+    requires: Tuple[str, ...] = ()
+
+
+def _recommender():
+    from algorithms import recommender
+
+    return recommender
+
+
+def _legacy():
+    from algorithms import legacy_recommender
+
+    return legacy_recommender
+
+
+def _urgency(n: int, seed: int):
+    r = _recommender()
+    pets = generators.pets(n, seed)
+    return lambda: [r.compute_urgency(p) for p in pets]
+
+
+def _urgent_top(n: int, seed: int):
+    """What /api/pets/urgent does with a candidate pool: score, sort, take 12."""
+    r = _recommender()
+    pets = generators.pets(n, seed)
+
+    def run():
+        scored = [(r.compute_urgency(p), p) for p in pets]
+        scored.sort(key=lambda x: x[0], reverse=True)
+        return [r.build_why_urgent(p) for _, p in scored[:12]]
+
+    return run
+
+
+def _match(n: int, seed: int):
+    r = _recommender()
+    pets = generators.pets(n, seed)
+    users = generators.user_profiles(n, seed)
+    return lambda: [r.compute_match(p, u) for p, u in zip(pets, users)]
+
+
+def _similarity(n: int, seed: int):
+    r = _recommender()
+    pets = generators.pets(n, seed)
+    pairs = list(zip(pets, pets[1:] + pets[:1]))
+    return lambda: [r.similarity(a, b) for a, b in pairs]
+
+
+def _diversify(n: int, seed: int):
+    r = _recommender()
+    pets = generators.pets(n, seed)
+    pets.sort(key=r.compute_urgency, reverse=True)
+    # diversify_rank removes picks from its input, so give it a copy
+    return lambda: r.diversify_rank(list(pets), k=12)
+
+
+def _build_matrix(n: int, seed: int):
+    legacy = _legacy()
+    rows = generators.foster_interactions(n, seed)
+    return lambda: legacy.build_advanced_matrix(rows)
+
+
+def _hybrid(n: int, seed: int):
+    legacy = _legacy()
+    matrix = legacy.build_advanced_matrix(generators.foster_interactions(n, seed))
+    target = matrix.columns[0]
+    return lambda: legacy.get_hybrid_recommendations(target, matrix)
+
+
+CASES: Dict[str, Case] = {
+    c.name: c
+    for c in (
+        Case("compute_urgency", _urgency),
+        Case("urgent_top12", _urgent_top),
+        Case("compute_match", _match),
+        Case("similarity", _similarity),
+        # O(n * k^2) similarity calls
+        Case("diversify_rank", _diversify, max_n=generators.SCALES["100k"]),
+        Case(
+            "build_advanced_matrix",
+            _build_matrix,
+            requires=("pandas", "sklearn"),
+        ),
+        # the dense fosters x shelters matrix outgrows memory past 100k rows
+        Case(
+            "get_hybrid_recommendations",
+            _hybrid,
+            max_n=generators.SCALES["100k"],
+            requires=("pandas", "sklearn"),
+        ),
+    )
+}
+
+
+def _missing(modules) -> List[str]:
+    import importlib.util
+
+    return [m for m in modules if importlib.util.find_spec(m) is None]
+
+
+def run_case(case: Case, n: int, seed: int = 0, repeat: int = 3) -> Dict[str, Any]:
+    result: Dict[str, Any] = {"case": case.name, "n": n}
+    missing = _missing(case.requires)
+    if missing:
+        return {**result, "skipped": f"missing {', '.join(missing)}"}
+    if n > case.max_n:
+        return {**result, "skipped": f"n above case limit of {case.max_n}"}
+
+    fn = case.setup(n, seed)
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    best = min(times)
+    return {
+        **result,
+        "seconds": round(best, 6),
+        "medianSeconds": round(statistics.median(times), 6),
+        "perItemUs": round(best / n * 1e6, 3),
+        "peakKiB": round(peak / 1024, 1),
+        "repeat": repeat,
+    }
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).resolve().parent,
+            capture_output=True,
+            text=True,
+            timeout=5,
+        )
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def run_suite(
+    pairs: List[Tuple[str, int]],
+    seed: int = 0,
+    repeat: int = 3,
+    progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> Dict[str, Any]:
+    """Run each (case name, n) pair; the result is what --save writes."""
+    results = []
+    for name, n in pairs:
+        r = run_case(CASES[name], n, seed=seed, repeat=repeat)
+        results.append(r)
+        if progress:
+            progress(r)
+    return {
+        "meta": {
+            "createdAt": datetime.now(timezone.utc).isoformat(),
+            "revision": _git_revision(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "seed": seed,
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def compare(
+    baseline: Dict[str, Any],
+    current: Dict[str, Any],
+    threshold: float = 0.2,
+    memory_threshold: float = 0.25,
+) -> List[Dict[str, Any]]:
+    """
+    One row per (case, n) measured in the baseline. ``regressed`` is set when
+    time or peak memory grew by more than the given fraction. A case the
+    current run skipped or left out gets ``missing`` (the reason) instead of
+    ratios, so it can't silently drop out of the comparison.
+    """
+    cur = {(r["case"], r["n"]): r for r in current.get("results", [])}
+    rows = []
+    for b in baseline.get("results", []):
+        if "seconds" not in b:
+            continue
+        r = cur.get((b["case"], b["n"]))
+        if r is None or "seconds" not in r:
+            rows.append(
+                {
+                    "case": b["case"],
+                    "n": b["n"],
+                    "baselineSeconds": b["seconds"],
+                    "missing": (r or {}).get("skipped", "not run"),
+                    "regressed": False,
+                }
+            )
+            continue
+        time_ratio = r["seconds"] / b["seconds"] if b["seconds"] else 1.0
+        mem_ratio = r["peakKiB"] / b["peakKiB"] if b["peakKiB"] else 1.0
+        slower = (
+            time_ratio > 1 + threshold
+            and max(r["seconds"], b["seconds"]) >= MIN_COMPARABLE_SECONDS
+        )
+        grew = (
+            mem_ratio > 1 + memory_threshold
+            and max(r["peakKiB"], b["peakKiB"]) >= MIN_COMPARABLE_KIB
+        )
+        rows.append(
+            {
+                "case": r["case"],
+                "n": r["n"],
+                "baselineSeconds": b["seconds"],
+                "seconds": r["seconds"],
+                "timeRatio": round(time_ratio, 3),
+                "memoryRatio": round(mem_ratio, 3),
+                "regressed": slower or grew,
+            }
+        )
+    return rows
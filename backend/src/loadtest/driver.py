@@ -0,0 +1,194 @@
+"""Closed-loop load driver for the frontend's API calls.
+
+``concurrency`` workers each send one request at a time, picking the next
+route from a weighted mix, until ``duration`` runs out. Requests carry an
+``X-Forwarded-For`` address from a pool of virtual clients, as a load
+balancer would add it. With the target trusting that one hop
+(``TRUSTED_PROXY_HOPS=1``), per-client rate limits and the per-IP location
+lookups act as they would in production. ``report`` turns the samples into per-route throughput and
+p50/p95/p99 latency.
+"""
+
+import math
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import requests
+
+# the phrases pet.js sends to /generate-animal-speech, more or less
+SPEECH = (
+    "Hi! I'm {name}. I love belly rubs and long walks.",
+    "Hello friend, I'm {name}. Will you take me home?",
+    "I'm {name}! I'm a little shy at first but I warm up fast.",
+    "Woof! {name} here. I know sit, stay and paw.",
+)
+
+
+@dataclass
+class Route:
+    name: str
+    target: str  # "app" or "recommender"
+    method: str
+    # (rng, context) -> (path with query, JSON body or None)
+    build: Callable[[random.Random, Dict[str, Any]], Tuple[str, Optional[dict]]]
+    weight: float
+
+
+def _urgent(rng, ctx):
+    return f"/api/pets/urgent?limit={rng.choice((6, 12, 12, 24))}", None
+
+
+def _explore(rng, ctx):
+    return f"/api/pets/explore?limit={rng.choice((12, 12, 24))}", None
+
+
+def _match(rng, ctx):
+    user = rng.choice(ctx["profiles"])
+    query = "&".join(f"{k}={v}" for k, v in user.items())
+    return f"/api/pets/{rng.choice(ctx['adoptableIds'])}/match?{query}", None
+
+
+def _nearby(rng, ctx):
+    return "/api/nearby-posts", None
+
+
+def _speech(rng, ctx):
+    text = rng.choice(SPEECH).format(name=rng.choice(ctx["names"]))
+    return "/generate-animal-speech", {
+        "text": text,
+        "gender": rng.choice(("male", "female")),
+    }
+
+
+ROUTES = {
+    r.name: r
+    for r in (
+        Route("urgent", "recommender", "GET", _urgent, 30),
+        Route("explore", "recommender", "GET", _explore, 25),
+        Route("match", "recommender", "GET", _match, 25),
+        Route("nearby-posts", "app", "GET", _nearby, 12),
+        Route("animal-speech", "app", "POST", _speech, 8),
+    )
+}
+
+
+def parse_mix(spec: Optional[str]) -> Dict[str, float]:
+    """``urgent=30,match=10`` -> weights; unnamed routes keep their defaults."""
+    weights = {name: r.weight for name, r in ROUTES.items()}
+    for part in (spec or "").split(","):
+        if not part.strip():
+            continue
+        name, _, value = part.partition("=")
+        if name.strip() not in ROUTES:
+            raise ValueError(f"unknown route in mix: {name.strip()}")
+        weights[name.strip()] = float(value)
+    return {k: v for k, v in weights.items() if v > 0}
+
+
+# (route, seconds, status or 0 on a connection error, started at)
+Sample = Tuple[str, float, int, float]
+
+
+def run(
+    targets: Dict[str, str],
+    context: Dict[str, Any],
+    duration: float = 30.0,
+    concurrency: int = 16,
+    mix: Optional[Dict[str, float]] = None,
+    clients: int = 200,
+    seed: int = 0,
+    timeout: float = 30.0,
+) -> Tuple[List[Sample], float]:
+    """Drive the targets; returns (samples, elapsed seconds)."""
+    mix = mix or parse_mix(None)
+    names, weights = list(mix), list(mix.values())
+    ips = [f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}" for i in range(clients)]
+    deadline = time.monotonic() + duration
+    samples: List[Sample] = []
+    lock = threading.Lock()
+
+    def worker(index: int):
+        rng = random.Random(f"{seed}:{index}")
+        session = requests.Session()
+        mine: List[Sample] = []
+        while time.monotonic() < deadline:
+            route = ROUTES[rng.choices(names, weights=weights)[0]]
+            path, body = route.build(rng, context)
+            started = time.perf_counter()
+            try:
+                resp = session.request(
+                    route.method,
+                    targets[route.target] + path,
+                    json=body,
+                    headers={"X-Forwarded-For": rng.choice(ips)},
+                    timeout=timeout,
+                )
+                resp.content
+                status = resp.status_code
+            except requests.RequestException:
+                status = 0
+            mine.append((route.name, time.perf_counter() - started, status, started))
+        with lock:
+            samples.extend(mine)
+
+    started = time.perf_counter()
+    threads = [
+        threading.Thread(target=worker, args=(i,), name=f"load-{i}", daemon=True)
+        for i in range(concurrency)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return samples, time.perf_counter() - started
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def _summary(latencies: List[float], statuses: List[int], elapsed: float):
+    latencies = sorted(latencies)
+    codes: Dict[str, int] = {}
+    for s in statuses:
+        codes[str(s)] = codes.get(str(s), 0) + 1
+    ok = sum(1 for s in statuses if 200 <= s < 300)
+    return {
+        "requests": len(latencies),
+        "ok": ok,
+        "errors": len(latencies) - ok,
+        "rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50Ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95Ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99Ms": round(percentile(latencies, 99) * 1000, 2),
+        "maxMs": round((latencies[-1] if latencies else 0.0) * 1000, 2),
+        "statuses": dict(sorted(codes.items())),
+    }
+
+
+def report(samples: List[Sample], elapsed: float, warmup: float = 0.0):
+    """Per-route and overall summaries, ignoring the first ``warmup`` seconds."""
+    if samples and warmup:
+        first = min(s[3] for s in samples)
+        samples = [s for s in samples if s[3] - first >= warmup]
+        elapsed = max(1e-9, elapsed - warmup)
+    by_route: Dict[str, Tuple[List[float], List[int]]] = {}
+    for name, seconds, status, _ in samples:
+        lat, codes = by_route.setdefault(name, ([], []))
+        lat.append(seconds)
+        codes.append(status)
+    return {
+        "elapsedSeconds": round(elapsed, 2),
+        "routes": {
+            name: _summary(lat, codes, elapsed)
+            for name, (lat, codes) in sorted(by_route.items())
+        },
+        "total": _summary([s[1] for s in samples], [s[2] for s in samples], elapsed),
+    }
@@ -0,0 +1,30 @@
+"""Seeded in-memory Firestore for load tests."""
+
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+from benchmarks import generators
+from services.firestore_batch import commit_in_chunks
+from services.memory_firestore import MemoryFirestore
+
+
+def seed_firestore(pets: int = 5000, seed: int = 0) -> Dict[str, Any]:
+    """A MemoryFirestore with shelters and pets, plus the ids the driver needs."""
+    db = MemoryFirestore()
+    rows = generators.pets(pets, seed, now=datetime.now(timezone.utc))
+    shelter_ids = sorted({p["shelterId"] for p in rows})
+    writes: List = [
+        (db.collection("shelters").document(sid), {"name": f"Shelter {sid}"}, False)
+        for sid in shelter_ids
+    ]
+    for p in rows:
+        doc = {k: v for k, v in p.items() if k != "id"}
+        writes.append((db.collection("pets").document(p["id"]), doc, False))
+    commit_in_chunks(db, writes)
+    db.reset_stats()
+    return {
+        "db": db,
+        "petIds": [p["id"] for p in rows],
+        "adoptableIds": [p["id"] for p in rows if p["status"] == "adoptable"],
+        "shelterIds": shelter_ids,
+    }
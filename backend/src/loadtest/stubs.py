@@ -0,0 +1,227 @@
+"""Local stand-ins for the HTTP upstreams.
+
+Each upstream gets its own threaded HTTP server on a free local port. The
+servers answer with realistic payload shapes, and latency and failures are
+configured per upstream:
+
+    overpass    POST /api/interpreter            {"elements": [...]}
+    ip-api      GET  /json/<ip>                  {"status": "success", ...}
+    gemini      POST /v1beta/models/<m>:generateContent
+    elevenlabs  POST /v1/text-to-speech/<voice>  audio/mpeg bytes
+
+``start_stubs`` returns the servers. ``stub_env`` gives the environment
+variables that point the app (OVERPASS_URL, IP_API_URL) and the SDKs
+(GEMINI_BASE_URL, ELEVEN_LABS_BASE_URL) at them.
+"""
+
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional, Tuple
+
+from benchmarks import generators
+
+UPSTREAMS = ("overpass", "ip-api", "gemini", "elevenlabs")
+
+# (status, content type, body)
+StubReply = Tuple[int, str, bytes]
+
+
+@dataclass
+class Behaviour:
+    latency_ms: float = 50.0
+    # each call takes latency_ms * uniform(1 - jitter, 1 + jitter) ...
+    jitter: float = 0.5
+    # ... and one in `slow_every` takes slow_factor times as long
+    slow_every: int = 50
+    slow_factor: float = 10.0
+    error_rate: float = 0.0
+    error_status: int = 503
+
+    def delay(self, rng: random.Random) -> float:
+        seconds = self.latency_ms / 1000 * rng.uniform(1 - self.jitter, 1 + self.jitter)
+        if self.slow_every and rng.randrange(self.slow_every) == 0:
+            seconds *= self.slow_factor
+        return max(0.0, seconds)
+
+
+def _json(payload, status: int = 200) -> StubReply:
+    return status, "application/json", json.dumps(payload).encode("utf-8")
+
+
+def _overpass(method: str, path: str, body: bytes) -> StubReply:
+    rng = random.Random(hashlib.sha256(body).hexdigest())
+    lat, lon = rng.uniform(*generators.LAT_RANGE), rng.uniform(*generators.LON_RANGE)
+    elements = [
+        {
+            "type": "node",
+            "id": rng.randrange(10**9),
+            "lat": lat + rng.uniform(-0.2, 0.2),
+            "lon": lon + rng.uniform(-0.2, 0.2),
+            "tags": {
+                "amenity": "animal_shelter",
+                "name": f"{rng.choice(generators.CITIES)} Animal Shelter {i}",
+                "website": f"https://shelter{i}.example.org",
+            },
+        }
+        for i in range(rng.randint(3, 25))
+    ]
+    return _json({"version": 0.6, "elements": elements})
+
+
+def _ipapi(method: str, path: str, body: bytes) -> StubReply:
+    ip = path.rsplit("/", 1)[-1]
+    rng = random.Random(ip)
+    return _json(
+        {
+            "status": "success",
+            "query": ip,
+            "city": rng.choice(generators.CITIES),
+            "lat": rng.uniform(*generators.LAT_RANGE),
+            "lon": rng.uniform(*generators.LON_RANGE),
+        }
+    )
+
+
+_GEMINI_PATH = re.compile(r"/v1\w*/models/[^/:]+:generateContent")
+
+
+def _gemini(method: str, path: str, body: bytes) -> StubReply:
+    if not _GEMINI_PATH.match(path):
+        return _json({"error": {"code": 404, "message": "not found"}}, 404)
+    m = re.search(rb"Use (\d+) for the shelter_id", body)
+    record = {
+        "shelter_id": int(m.group(1)) if m else 0,
+        "lowest_age": 4,
+        "quantity_anim": 12,
+        "image_url": "https://images.example.org/dog.jpg",
+    }
+    return _json(
+        {
+            "candidates": [
+                {
+                    "content": {
+                        "role": "model",
+                        "parts": [{"text": json.dumps([record])}],
+                    },
+                    "finishReason": "STOP",
+                }
+            ],
+            "usageMetadata": {"promptTokenCount": len(body) // 4},
+        }
+    )
+
+
+def _elevenlabs(method: str, path: str, body: bytes) -> StubReply:
+    if "/text-to-speech/" not in path:
+        return _json({"detail": "not found"}, 404)
+    try:
+        text = json.loads(body or b"{}").get("text") or ""
+    except ValueError:
+        text = ""
+    # roughly 1 KB of 32 kbps mp3 per 15 characters of speech
+    size = max(1024, len(text) * 70)
+    return (
+        200,
+        "audio/mpeg",
+        b"ID3" + hashlib.sha256(text.encode()).digest() * (size // 32),
+    )
+
+
+HANDLERS: Dict[str, Callable[[str, str, bytes], StubReply]] = {
+    "overpass": _overpass,
+    "ip-api": _ipapi,
+    "gemini": _gemini,
+    "elevenlabs": _elevenlabs,
+}
+
+
+class StubServer:
+    def __init__(self, name: str, behaviour: Behaviour, seed: int = 0):
+        self.name = name
+        self.behaviour = behaviour
+        self.stats = {"requests": 0, "errors": 0}
+        self._rng = random.Random(f"{seed}:{name}")
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _decide(self) -> Tuple[float, bool]:
+        with self._lock:
+            self.stats["requests"] += 1
+            fail = self._rng.random() < self.behaviour.error_rate
+            if fail:
+                self.stats["errors"] += 1
+            return self.behaviour.delay(self._rng), fail
+
+    def _handler_class(self):
+        stub = self
+        handler = HANDLERS[self.name]
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _serve(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                delay, fail = stub._decide()
+                time.sleep(delay)
+                if fail:
+                    status, ctype, payload = _json(
+                        {"error": "injected failure"}, stub.behaviour.error_status
+                    )
+                else:
+                    status, ctype, payload = handler(self.command, self.path, body)
+                self.send_response(status)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            do_GET = do_POST = _serve
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "StubServer":
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name=f"stub-{self.name}", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def start_stubs(
+    behaviours: Optional[Dict[str, Behaviour]] = None, seed: int = 0
+) -> Dict[str, StubServer]:
+    behaviours = behaviours or {}
+    return {
+        name: StubServer(name, behaviours.get(name, Behaviour()), seed).start()
+        for name in UPSTREAMS
+    }
+
+
+def stub_env(stubs: Dict[str, StubServer]) -> Dict[str, str]:
+    return {
+        "OVERPASS_URL": f"{stubs['overpass'].url}/api/interpreter",
+        "IP_API_URL": f"{stubs['ip-api'].url}/json",
+        "GEMINI_BASE_URL": stubs["gemini"].url,
+        "ELEVEN_LABS_BASE_URL": stubs["elevenlabs"].url,
+    }
@@ -0,0 +1,86 @@
+"""
+Backfill userEmailIndex from existing userIdentification documents.
+
+    cd backend/src && python -m scripts.backfill_email_index [--dry-run]
+
+Safe to re-run: emails that are already indexed are left untouched. When
+several legacy accounts share a normalized email only the first one seen is
+indexed and the rest are reported so they can be merged by hand.
+
+Index entries from before ids were hashed (keyed by the raw email, with a
+copy of the password) are deleted once their hashed entry exists.
+"""
+
+import argparse
+import re
+import sys
+
+from dotenv import load_dotenv
+
+from services import clients, email_index
+from services.firestore_batch import BATCH_LIMIT, chunked, commit_in_chunks
+
+_HASHED_ID = re.compile(r"^[0-9a-f]{64}$")
+
+
+def backfill(db, dry_run=False):
+    candidates = {}
+    conflicts = []
+    skipped = 0
+    for snap in db.collection("userIdentification").stream():
+        d = snap.to_dict() or {}
+        key = email_index.normalize_email(d.get("email"))
+        if not key:
+            skipped += 1
+            continue
+        if email_index.index_id(key) in candidates:
+            conflicts.append({"email": key, "userId": snap.id})
+            continue
+        candidates[email_index.index_id(key)] = email_index.index_entry(d, snap.id)
+
+    index = db.collection(email_index.COLLECTION)
+    writes = []
+    already = 0
+    for keys in chunked(list(candidates), BATCH_LIMIT):
+        refs = [index.document(k) for k in keys]
+        existing = {s.id for s in db.get_all(refs) if s.exists}
+        already += len(existing)
+        writes.extend(
+            (ref, candidates[ref.id], False) for ref in refs if ref.id not in existing
+        )
+
+    legacy = [s.reference for s in index.stream() if not _HASHED_ID.match(s.id)]
+    if not dry_run:
+        commit_in_chunks(db, writes)
+        for chunk in chunked(legacy, BATCH_LIMIT):
+            batch = db.batch()
+            for ref in chunk:
+                batch.delete(ref)
+            batch.commit()
+    return {
+        "indexed": len(writes),
+        "legacyDeleted": len(legacy),
+        "alreadyIndexed": already,
+        "conflicts": conflicts,
+        "skippedNoEmail": skipped,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    report = backfill(clients.get("firestore"), dry_run=args.dry_run)
+
+    print(f"indexed={report['indexed']} already={report['alreadyIndexed']}")
+    print(f"legacy entries deleted={report['legacyDeleted']}")
+    print(f"skipped (no email)={report['skippedNoEmail']}")
+    for c in report["conflicts"]:
+        print(f"conflict: {c['email']} also used by {c['userId']}")
+    return 1 if report["conflicts"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
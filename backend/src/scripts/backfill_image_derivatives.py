@@ -0,0 +1,77 @@
+"""
+Generate resized derivatives for existing pet and post photos.
+
+    cd backend/src && IMAGE_STORAGE=firebase python -m scripts.backfill_image_derivatives [--dry-run] [--limit N]
+
+New uploads are processed in the background by the API (services/images.py).
+Photos added before that, through pet imports, or whose processing failed
+have no usable derivatives; this processes them one at a time. Safe to
+re-run: photos already processed are skipped and stored files are reused.
+"""
+
+import argparse
+import sys
+
+from dotenv import load_dotenv
+
+from services import clients, images
+
+
+def backfill(db, storage, dry_run=False, limit=None):
+    report = {"pets": 0, "posts": 0, "failed": 0, "skipped": 0}
+    pipeline = images.ImagePipeline(db, storage, workers=1)
+
+    def budget_left():
+        return limit is None or report["pets"] + report["posts"] < limit
+
+    for snap in db.collection("pets").select(["coverImageUrl", "coverImage"]).stream():
+        if not budget_left():
+            break
+        d = snap.to_dict() or {}
+        if not images.needs_processing(d.get("coverImage"), d.get("coverImageUrl")):
+            report["skipped"] += 1
+            continue
+        report["pets"] += 1
+        if not dry_run:
+            pipeline.process_pet(snap.id, d["coverImageUrl"])
+
+    for snap in db.collection("posts").select(["imageUrls", "images"]).stream():
+        if not budget_left():
+            break
+        d = snap.to_dict() or {}
+        records = {r.get("source"): r for r in d.get("images") or [] if r}
+        urls = d.get("imageUrls") or []
+        if not any(images.needs_processing(records.get(u), u) for u in urls):
+            report["skipped"] += 1
+            continue
+        report["posts"] += 1
+        if not dry_run:
+            pipeline.process_post(snap.id, urls)
+
+    report["failed"] = pipeline.metrics()["failed"]
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--limit", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    storage = clients.get("image-storage")
+    if storage is None:
+        print("IMAGE_STORAGE is not set (firebase or local)", file=sys.stderr)
+        return 2
+    report = backfill(
+        clients.get("firestore"), storage, dry_run=args.dry_run, limit=args.limit
+    )
+    print(
+        f"pets={report['pets']} posts={report['posts']} "
+        f"failed={report['failed']} skipped={report['skipped']}"
+    )
+    return 0 if not report["failed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
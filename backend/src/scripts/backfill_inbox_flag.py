@@ -0,0 +1,54 @@
+"""
+Mark existing pet inbox entries with inbox=true.
+
+    cd backend/src && python -m scripts.backfill_inbox_flag [--dry-run]
+
+GET /api/shelter/applications reads pets/*/applications through a
+collection-group query filtered on inbox == true, which keeps the users'
+own copies (users/*/applications) out of the results. Entries written
+before that flag existed need it set once. Safe to re-run.
+"""
+
+import argparse
+import sys
+
+from dotenv import load_dotenv
+
+from services import clients
+from services.firestore_batch import commit_in_chunks
+
+
+def _is_pet_inbox(ref) -> bool:
+    parts = ref.path.split("/")
+    return len(parts) == 4 and parts[0] == "pets" and parts[2] == "applications"
+
+
+def backfill(db, dry_run=False):
+    writes = []
+    already = 0
+    for snap in db.collection_group("applications").stream():
+        if not _is_pet_inbox(snap.reference):
+            continue
+        if (snap.to_dict() or {}).get("inbox") is True:
+            already += 1
+            continue
+        writes.append((snap.reference, {"inbox": True}, True))
+
+    if not dry_run:
+        commit_in_chunks(db, writes)
+    return {"flagged": len(writes), "alreadyFlagged": already}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    report = backfill(clients.get("firestore"), dry_run=args.dry_run)
+    print(f"flagged={report['flagged']} already={report['alreadyFlagged']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+"""
+Benchmark the ranking and matching code on synthetic data.
+
+    cd backend/src && python -m scripts.benchmark [--scales 1k,10k,100k] [--cases compute_urgency,...]
+    python -m scripts.benchmark --save benchmarks/baselines/main.json
+    python -m scripts.benchmark --compare benchmarks/baselines/main.json [--threshold 0.2]
+
+Inputs come from seeded generators (benchmarks/generators.py), so two runs
+with the same --seed time identical data. --compare re-runs the cases and
+scales recorded in the baseline. It exits non-zero when any of them got
+slower than --threshold, or grew peak memory by more than --memory-threshold
+(both fractions), or could not be measured this time (e.g. an optional
+dependency is missing) unless --allow-missing is given. Baselines are machine-specific: record one on the machine
+that will run the comparison, e.g. the CI runner, from the main branch.
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+from benchmarks import generators, suite
+
+
+def _print_result(r):
+    if "skipped" in r:
+        print(f"  {r['case']:<28} n={r['n']:<9} skipped: {r['skipped']}")
+        return
+    print(
+        f"  {r['case']:<28} n={r['n']:<9} {r['seconds'] * 1000:10.2f} ms "
+        f"{r['perItemUs']:9.3f} us/item {r['peakKiB']:11.1f} KiB peak"
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cases", default=",".join(suite.CASES))
+    parser.add_argument("--scales", default="1k,10k,100k")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--save", help="write results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON to check against")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    parser.add_argument("--memory-threshold", type=float, default=0.25)
+    parser.add_argument(
+        "--allow-missing",
+        action="store_true",
+        help="don't fail on baseline cases this run skipped",
+    )
+    args = parser.parse_args(argv)
+
+    baseline = None
+    names = [c.strip() for c in args.cases.split(",") if c.strip()]
+    scales = [generators.parse_scale(s) for s in args.scales.split(",") if s.strip()]
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+        recorded = [r for r in baseline["results"] if "seconds" in r]
+        names = list(dict.fromkeys(r["case"] for r in recorded))
+        scales = sorted({r["n"] for r in recorded})
+        args.seed = baseline["meta"].get("seed", args.seed)
+
+    unknown = [n for n in names if n not in suite.CASES]
+    if unknown:
+        parser.error(f"unknown cases: {', '.join(unknown)}")
+
+    pairs = [(name, n) for name in names for n in scales]
+    if baseline is not None:
+        recorded = {(r["case"], r["n"]) for r in baseline["results"]}
+        pairs = [p for p in pairs if p in recorded]
+
+    print(f"cases={len(names)} scales={scales} seed={args.seed}")
+    report = suite.run_suite(pairs, args.seed, args.repeat, progress=_print_result)
+
+    if args.save:
+        Path(args.save).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.save).write_text(json.dumps(report, indent=2) + "\n")
+        print(f"saved {args.save}")
+
+    if baseline is None:
+        return 0
+    rows = suite.compare(baseline, report, args.threshold, args.memory_threshold)
+    regressed = [r for r in rows if r["regressed"]]
+    missing = [r for r in rows if "missing" in r]
+    for r in rows:
+        if "missing" in r:
+            print(f"  {'MISSING':<9} {r['case']:<28} n={r['n']:<9} {r['missing']}")
+            continue
+        flag = "REGRESSED" if r["regressed"] else "ok"
+        print(
+            f"  {flag:<9} {r['case']:<28} n={r['n']:<9} "
+            f"time x{r['timeRatio']:<6} memory x{r['memoryRatio']}"
+        )
+    print(f"{len(regressed)} of {len(rows)} regressed, {len(missing)} missing")
+    failed = regressed or (missing and not args.allow_missing)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
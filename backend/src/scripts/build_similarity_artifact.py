@@ -0,0 +1,49 @@
+"""
+Build the shelter-similarity artifact from the interactions collection.
+
+    cd backend/src && python -m scripts.build_similarity_artifact
+        [--out $SIMILARITY_ARTIFACT_DIR] [--top-k 20] [--keep 3]
+
+Writes a new version under --out and points CURRENT at it. Running app
+workers pick it up within a few seconds, with no restart. Needs numpy,
+pandas and scikit-learn; the workers that serve it only need numpy.
+"""
+
+import argparse
+import os
+import sys
+
+from dotenv import load_dotenv
+
+from algorithms import shelter_similarity
+from services import clients
+
+FIELDS = ("foster_id", "shelter_id", "follow", "star", "lowest_age", "quantity_anim")
+
+
+def interaction_records(db):
+    for doc in db.collection("interactions").stream():
+        data = doc.to_dict() or {}
+        yield {k: data.get(k) for k in FIELDS}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--out", default=os.environ.get("SIMILARITY_ARTIFACT_DIR"))
+    parser.add_argument("--top-k", type=int, default=shelter_similarity.TOP_K)
+    parser.add_argument("--keep", type=int, default=3)
+    args = parser.parse_args(argv)
+    if not args.out:
+        parser.error("--out or SIMILARITY_ARTIFACT_DIR is required")
+
+    load_dotenv()
+    records = list(interaction_records(clients.get("firestore")))
+    version = shelter_similarity.build_artifact(
+        records, args.out, top_k=args.top_k, keep=args.keep
+    )
+    print(f"records={len(records)} version={version} dir={args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
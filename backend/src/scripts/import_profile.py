@@ -0,0 +1,135 @@
+"""
+Import-time profile of the app entry points.
+
+    cd backend/src && python -m scripts.import_profile [--check] [--top 15]
+
+Each module is imported in a fresh interpreter under ``python -X importtime``
+and the report lists the slowest imports by cumulative time. ``--check``
+exits non-zero when a heavy SDK is imported at module load (they must only
+be loaded through services/clients.py) or when an entry point goes over its
+budget, so startup regressions fail CI instead of slowing every worker.
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+from typing import Any, Dict, List
+
+SRC = Path(__file__).resolve().parent.parent
+DEFAULT_TARGETS = ("app", "algorithms.recommender", "asgi")
+DEFAULT_BUDGET_MS = float(os.environ.get("IMPORT_BUDGET_MS", "1500"))
+
+# must never be imported just by loading an entry point
+HEAVY_MODULES = (
+    "firebase_admin",
+    "google.cloud",
+    "google.genai",
+    "google.api_core",
+    "elevenlabs",
+    "bs4",
+    "pandas",
+    "numpy",
+    "sklearn",
+)
+
+_LINE_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$")
+
+
+def parse_importtime(stderr: str) -> List[Dict[str, Any]]:
+    rows = []
+    for line in stderr.splitlines():
+        m = _LINE_RE.match(line)
+        if m:
+            rows.append(
+                {
+                    "module": m.group(4),
+                    "selfUs": int(m.group(1)),
+                    "cumulativeUs": int(m.group(2)),
+                    "depth": (len(m.group(3)) - 1) // 2,
+                }
+            )
+    return rows
+
+
+def profile(target: str) -> Dict[str, Any]:
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        cwd=SRC,
+        capture_output=True,
+        text=True,
+    )
+    rows = parse_importtime(proc.stderr)
+    own = [r for r in rows if r["module"] == target]
+    total_us = (
+        own[-1]["cumulativeUs"]
+        if own
+        else sum(r["cumulativeUs"] for r in rows if r["depth"] == 0)
+    )
+    heavy = sorted(
+        {
+            r["module"]
+            for r in rows
+            if any(
+                r["module"] == h or r["module"].startswith(h + ".")
+                for h in HEAVY_MODULES
+            )
+        }
+    )
+    return {
+        "target": target,
+        "ok": proc.returncode == 0,
+        "error": proc.stderr.strip().splitlines()[-1] if proc.returncode else None,
+        "totalMs": round(total_us / 1000, 1),
+        "modules": len(rows),
+        "heavy": heavy,
+        "slowest": sorted(rows, key=lambda r: r["cumulativeUs"], reverse=True),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("targets", nargs="*", default=list(DEFAULT_TARGETS))
+    parser.add_argument("--check", action="store_true")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    reports = [profile(t) for t in args.targets]
+    failures = []
+    for r in reports:
+        if not r["ok"]:
+            failures.append(f"{r['target']}: import failed: {r['error']}")
+        if r["heavy"]:
+            failures.append(
+                f"{r['target']}: heavy imports at load: {', '.join(r['heavy'])}"
+            )
+        if r["totalMs"] > args.budget_ms:
+            failures.append(
+                f"{r['target']}: {r['totalMs']} ms over budget of {args.budget_ms} ms"
+            )
+
+    if args.json:
+        for r in reports:
+            r["slowest"] = r["slowest"][: args.top]
+        print(json.dumps({"reports": reports, "failures": failures}, indent=2))
+    else:
+        for r in reports:
+            print(f"== {r['target']}: {r['totalMs']} ms, {r['modules']} modules")
+            for row in r["slowest"][: args.top]:
+                print(
+                    f"  {row['cumulativeUs'] / 1000:9.1f} ms "
+                    f"{row['selfUs'] / 1000:8.1f} ms self  {row['module']}"
+                )
+        for f in failures:
+            print(f"FAIL {f}")
+
+    return 1 if args.check and failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,162 @@
+"""
+Load-test both Flask apps without touching any real upstream.
+
+    cd backend/src && python -m scripts.loadtest [--duration 30] [--concurrency 32]
+        [--pets 5000] [--mix urgent=30,match=10] [--latency overpass=300,elevenlabs=900]
+        [--error-rate elevenlabs=0.02] [--json report.json]
+
+By default the harness runs everything in this process:
+  - a MemoryFirestore seeded with --pets synthetic pets;
+  - stub Overpass, ip-api, Gemini and ElevenLabs servers (loadtest/stubs.py)
+    with the given mean latency (ms) and error rates;
+  - app.py and algorithms/recommender.py on local threaded servers.
+The driver then replays the frontend's calls against them and prints
+throughput and p50/p95/p99 latency per route. Everything shares one GIL
+in this mode, so use it to compare changes, not as absolute capacity.
+
+Pass --app-url and --recommender-url to drive servers started elsewhere,
+e.g. a staging deployment with the stub_env() variables set (otherwise it
+calls the real upstreams). Match requests then use the generator's pet ids
+(--pets, --seed), which only resolve against data seeded the same way.
+Virtual clients are told apart by X-Forwarded-For, which those servers
+only honour for TRUSTED_PROXY_HOPS; set ADMISSION_RATE_LIMITS=0 on them to
+measure without per-client rate limits.
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+from pathlib import Path
+
+from benchmarks import generators
+from loadtest import driver, fixtures, stubs
+
+
+def _per_upstream(spec: str, cast=float):
+    out = {}
+    for part in (spec or "").split(","):
+        if part.strip():
+            name, _, value = part.partition("=")
+            if name.strip() not in stubs.UPSTREAMS:
+                raise ValueError(f"unknown upstream: {name.strip()}")
+            out[name.strip()] = cast(value)
+    return out
+
+
+def _serve(wsgi_app):
+    import logging
+
+    from werkzeug.serving import make_server
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+
+    server = make_server("127.0.0.1", 0, wsgi_app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def start_local(args):
+    """Stubs + seeded Firestore + both apps in this process."""
+    behaviours = {name: stubs.Behaviour() for name in stubs.UPSTREAMS}
+    for name, ms in _per_upstream(args.latency).items():
+        behaviours[name].latency_ms = ms
+    for name, rate in _per_upstream(args.error_rate).items():
+        behaviours[name].error_rate = rate
+    upstreams = stubs.start_stubs(behaviours, seed=args.seed)
+    # read at import time by app.py and by the SDK client factories
+    os.environ.update(stubs.stub_env(upstreams))
+    os.environ.setdefault("GEMINI_API_KEY", "loadtest")
+    os.environ.setdefault("ELEVEN_LABS_API_KEY", "loadtest")
+    os.environ.setdefault("FOSTER_WRITE_BEHIND", "0")
+    # the driver stands in for the load balancer: trust the one
+    # X-Forwarded-For hop it adds, so each virtual client gets its own bucket
+    os.environ.setdefault("TRUSTED_PROXY_HOPS", "1")
+
+    from services import clients
+
+    seeded = fixtures.seed_firestore(args.pets, args.seed)
+    clients.override("firestore", seeded["db"])
+
+    import app as flask_app_module
+    from algorithms import recommender
+
+    servers = [_serve(flask_app_module.app), _serve(recommender.app)]
+    targets = {"app": servers[0][1], "recommender": servers[1][1]}
+    return targets, seeded, upstreams
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--warmup", type=float, default=3.0)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--pets", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--mix", default="")
+    parser.add_argument("--latency", default="", help="upstream=ms,...")
+    parser.add_argument("--error-rate", default="", help="upstream=fraction,...")
+    parser.add_argument("--app-url")
+    parser.add_argument("--recommender-url")
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args(argv)
+
+    try:
+        mix = driver.parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+
+    upstreams = {}
+    if args.app_url or args.recommender_url:
+        if not (args.app_url and args.recommender_url):
+            parser.error("--app-url and --recommender-url go together")
+        targets = {"app": args.app_url, "recommender": args.recommender_url}
+        pet_ids = [p["id"] for p in generators.pets(args.pets, args.seed)]
+        context = {"adoptableIds": pet_ids}
+    else:
+        targets, seeded, upstreams = start_local(args)
+        context = {"adoptableIds": seeded["adoptableIds"] or seeded["petIds"]}
+    context["profiles"] = generators.user_profiles(200, args.seed)
+    context["names"] = [f"Pet {i}" for i in range(50)]
+
+    print(
+        f"driving {targets} for {args.duration}s, concurrency={args.concurrency}",
+        flush=True,
+    )
+    samples, elapsed = driver.run(
+        targets,
+        context,
+        duration=args.duration,
+        concurrency=args.concurrency,
+        mix=mix,
+        clients=args.clients,
+        seed=args.seed,
+    )
+    result = driver.report(samples, elapsed, warmup=args.warmup)
+    result["upstreams"] = {name: s.stats for name, s in upstreams.items()}
+
+    print(
+        f"{'route':<16}{'reqs':>8}{'rps':>9}{'errors':>8}"
+        f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+    )
+    rows = list(result["routes"].items()) + [("TOTAL", result["total"])]
+    for name, r in rows:
+        print(
+            f"{name:<16}{r['requests']:>8}{r['rps']:>9}{r['errors']:>8}"
+            f"{r['p50Ms']:>10}{r['p95Ms']:>10}{r['p99Ms']:>10}{r['maxMs']:>10}"
+        )
+    for name, r in rows:
+        if r["errors"]:
+            print(f"  {name} statuses: {r['statuses']}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(result, indent=2) + "\n")
+    for server in upstreams.values():
+        server.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,33 @@
+"""
+Recompute shelterStats/* and the stats/global shards from the pets and inbox entries.
+
+    cd backend/src && python -m scripts.reconcile_counters [--dry-run]
+
+The counters are kept up to date incrementally by the write paths; this
+repairs any drift (racing status edits, a failed chunk of a bulk write).
+Run it off-peak: writes that land during the recount can be overwritten.
+"""
+
+import argparse
+import json
+import sys
+
+from dotenv import load_dotenv
+
+from services import clients, counters
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    report = counters.reconcile(clients.get("firestore"), dry_run=args.dry_run)
+    print(f"shelters={report['shelters']} zeroed={report['zeroed']}")
+    print(json.dumps(report["global"], sort_keys=True))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
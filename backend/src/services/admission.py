@@ -0,0 +1,368 @@
+"""Admission control for expensive, quota-metered endpoints.
+
+Two gates run in front of a guarded handler:
+
+* a token bucket per (policy, client key), so one client in a loop runs out
+  of tokens instead of draining the ElevenLabs/Gemini quota;
+* a per-policy concurrency cap with a short, bounded wait queue, so a burst
+  sheds load instead of tying up every worker.
+
+A rejected request gets ``429`` with ``Retry-After``. Buckets live in process
+by default. With ``ADMISSION_STORE=sqlite`` they are kept in a local SQLite
+file (``ADMISSION_DB``), so every worker on the host draws from the same
+bucket. Concurrency caps are per process.
+"""
+
+import asyncio
+import functools
+import math
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Tuple
+
+STORE = os.environ.get("ADMISSION_STORE", "memory")
+DB_PATH = os.environ.get("ADMISSION_DB", "/tmp/instanimals-admission.sqlite3")
+RATE_LIMITS = os.environ.get("ADMISSION_RATE_LIMITS", "1") != "0"
+# idle buckets are refilled to full, so dropping them loses nothing
+IDLE_BUCKET_SECONDS = 3600.0
+PRUNE_EVERY = 1000
+
+
+def _env(name: str, key: str, default: float) -> float:
+    return float(os.environ.get(f"ADMISSION_{name.upper()}_{key}", default))
+
+
+@dataclass
+class Policy:
+    name: str
+    rate: float  # tokens per second
+    burst: float
+    concurrency: int
+    queue: int
+    queue_timeout: float
+
+    @classmethod
+    def from_env(cls, name, rate, burst, concurrency, queue, queue_timeout):
+        return cls(
+            name=name,
+            rate=_env(name, "RATE", rate),
+            burst=_env(name, "BURST", burst),
+            concurrency=int(_env(name, "CONCURRENCY", concurrency)),
+            queue=int(_env(name, "QUEUE", queue)),
+            queue_timeout=_env(name, "QUEUE_TIMEOUT", queue_timeout),
+        )
+
+
+POLICIES: Dict[str, Policy] = {
+    # ~12 clips a minute per client
+    "tts": Policy.from_env("tts", 0.2, 5, 8, 8, 2.0),
+    "nearby": Policy.from_env("nearby", 1.0, 10, 16, 32, 2.0),
+    # one website extraction a minute per client
+    "extract": Policy.from_env("extract", 1 / 60, 3, 4, 4, 5.0),
+}
+
+
+class Rejected(Exception):
+    def __init__(self, policy: str, reason: str, retry_after: float):
+        super().__init__(f"{policy}: {reason}")
+        self.policy = policy
+        self.reason = reason
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+# --------------------------
+# Token bucket stores
+# --------------------------
+def _refill(
+    tokens: float, updated: float, now: float, rate: float, burst: float
+) -> float:
+    return min(burst, tokens + max(0.0, now - updated) * rate)
+
+
+def _decide(tokens: float, cost: float, rate: float) -> Tuple[bool, float, float]:
+    """(allowed, tokens left, seconds until enough tokens)."""
+    if tokens >= cost:
+        return True, tokens - cost, 0.0
+    wait = (cost - tokens) / rate if rate > 0 else IDLE_BUCKET_SECONDS
+    return False, tokens, wait
+
+
+class MemoryBucketStore:
+    blocking = False
+
+    def __init__(self):
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+        self._ops = 0
+
+    def take(
+        self, key: str, rate: float, burst: float, cost: float = 1.0
+    ) -> Tuple[bool, float]:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (burst, now))
+            tokens = _refill(tokens, updated, now, rate, burst)
+            allowed, tokens, wait = _decide(tokens, cost, rate)
+            self._buckets[key] = (tokens, now)
+            self._ops += 1
+            if self._ops % PRUNE_EVERY == 0:
+                self._prune(now)
+        return allowed, wait
+
+    def _prune(self, now: float):
+        stale = [
+            k
+            for k, (_, updated) in self._buckets.items()
+            if now - updated > IDLE_BUCKET_SECONDS
+        ]
+        for k in stale:
+            del self._buckets[k]
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class SqliteBucketStore:
+    """Buckets shared by every worker on the host through one SQLite file."""
+
+    # take() can wait on the file lock, so keep it off the event loop
+    blocking = True
+
+    def __init__(self, path: str = DB_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._ops = 0
+        self.errors = 0
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS buckets ("
+            " key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn = conn
+        return conn
+
+    def take(
+        self, key: str, rate: float, burst: float, cost: float = 1.0
+    ) -> Tuple[bool, float]:
+        # wall clock: monotonic time is not comparable across processes
+        now = time.time()
+        conn = self._conn()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT tokens, updated FROM buckets WHERE key = ?", (key,)
+                ).fetchone()
+                tokens, updated = row if row else (burst, now)
+                tokens = _refill(tokens, updated, now, rate, burst)
+                allowed, tokens, wait = _decide(tokens, cost, rate)
+                conn.execute(
+                    "INSERT OR REPLACE INTO buckets (key, tokens, updated)"
+                    " VALUES (?, ?, ?)",
+                    (key, tokens, now),
+                )
+                self._ops += 1
+                if self._ops % PRUNE_EVERY == 0:
+                    conn.execute(
+                        "DELETE FROM buckets WHERE updated < ?",
+                        (now - IDLE_BUCKET_SECONDS,),
+                    )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        except sqlite3.Error as e:
+            # fail open: a broken limiter must not take the endpoint down
+            self.errors += 1
+            print(f"[admission] bucket store error: {e}")
+            return True, 0.0
+        return allowed, wait
+
+    def __len__(self):
+        return self._conn().execute("SELECT COUNT(*) FROM buckets").fetchone()[0]
+
+
+def _make_store():
+    if STORE == "sqlite":
+        return SqliteBucketStore(DB_PATH)
+    return MemoryBucketStore()
+
+
+# --------------------------
+# Concurrency caps
+# --------------------------
+class ConcurrencyLimiter:
+    """At most ``limit`` in flight and ``queue`` waiting; the rest are shed."""
+
+    def __init__(self, policy: Policy):
+        self.policy = policy
+        self._cond = threading.Condition()
+        self.active = 0
+        self.waiting = 0
+
+    def acquire(self):
+        p = self.policy
+        with self._cond:
+            if self.active < p.concurrency:
+                self.active += 1
+                return
+            if self.waiting >= p.queue:
+                raise Rejected(p.name, "busy", p.queue_timeout)
+            self.waiting += 1
+            try:
+                ok = self._cond.wait_for(
+                    lambda: self.active < p.concurrency, p.queue_timeout
+                )
+            finally:
+                self.waiting -= 1
+            if not ok:
+                raise Rejected(p.name, "busy", p.queue_timeout)
+            self.active += 1
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify()
+
+
+class AsyncConcurrencyLimiter:
+    """asyncio version for the ASGI serving mode."""
+
+    def __init__(self, policy: Policy):
+        self.policy = policy
+        self._sem: Optional[asyncio.Semaphore] = None
+        self.active = 0
+        self.waiting = 0
+
+    async def acquire(self):
+        p = self.policy
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(p.concurrency)
+        if self.active >= p.concurrency and self.waiting >= p.queue:
+            raise Rejected(p.name, "busy", p.queue_timeout)
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._sem.acquire(), p.queue_timeout)
+        except asyncio.TimeoutError:
+            raise Rejected(p.name, "busy", p.queue_timeout)
+        finally:
+            self.waiting -= 1
+        self.active += 1
+
+    def release(self):
+        self.active -= 1
+        self._sem.release()
+
+
+# --------------------------
+# Controller
+# --------------------------
+class AdmissionController:
+    def __init__(self, policies: Dict[str, Policy], store=None):
+        self.policies = policies
+        self.store = store if store is not None else _make_store()
+        self._limiters = {n: ConcurrencyLimiter(p) for n, p in policies.items()}
+        self._async_limiters = {
+            n: AsyncConcurrencyLimiter(p) for n, p in policies.items()
+        }
+        self._lock = threading.Lock()
+        self._stats = {
+            n: {"admitted": 0, "rateLimited": 0, "shed": 0} for n in policies
+        }
+
+    def _count(self, name: str, field: str):
+        with self._lock:
+            self._stats[name][field] += 1
+
+    def check_rate(self, name: str, key: Optional[str], cost: float = 1.0):
+        p = self.policies[name]
+        if not RATE_LIMITS or not key:
+            return
+        allowed, wait = self.store.take(f"{name}:{key}", p.rate, p.burst, cost)
+        if not allowed:
+            self._count(name, "rateLimited")
+            raise Rejected(name, "rate limited", wait)
+
+    def enter(self, name: str, key: Optional[str]) -> ConcurrencyLimiter:
+        """Raises Rejected; on success the caller must ``release()`` the limiter."""
+        self.check_rate(name, key)
+        limiter = self._limiters[name]
+        try:
+            limiter.acquire()
+        except Rejected:
+            self._count(name, "shed")
+            raise
+        self._count(name, "admitted")
+        return limiter
+
+    async def enter_async(self, name: str, key: Optional[str]):
+        if getattr(self.store, "blocking", False):
+            await asyncio.to_thread(self.check_rate, name, key)
+        else:
+            self.check_rate(name, key)
+        limiter = self._async_limiters[name]
+        try:
+            await limiter.acquire()
+        except Rejected:
+            self._count(name, "shed")
+            raise
+        self._count(name, "admitted")
+        return limiter
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            out = {n: dict(s) for n, s in self._stats.items()}
+        for n, p in self.policies.items():
+            sync, aio = self._limiters[n], self._async_limiters[n]
+            out[n].update(
+                {
+                    "active": sync.active + aio.active,
+                    "waiting": sync.waiting + aio.waiting,
+                    "concurrency": p.concurrency,
+                    "queue": p.queue,
+                    "ratePerMinute": round(p.rate * 60, 3),
+                    "burst": p.burst,
+                }
+            )
+        return out
+
+
+controller = AdmissionController(POLICIES)
+
+
+def guard(name: str, key: Callable[[], Optional[str]]):
+    """Flask view decorator: admit or answer 429 with Retry-After."""
+
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            from flask import jsonify
+
+            try:
+                limiter = controller.enter(name, key())
+            except Rejected as e:
+                resp = jsonify({"error": str(e), "retryAfter": e.retry_after_header})
+                resp.status_code = 429
+                resp.headers["Retry-After"] = e.retry_after_header
+                return resp
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                limiter.release()
+
+        return inner
+
+    return wrap
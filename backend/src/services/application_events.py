@@ -0,0 +1,111 @@
+"""Application status changes as hub events.
+
+One snapshot listener per process watches pet inbox entries
+(``pets/*/applications`` with ``inbox == true``) that were updated after the
+listener started. It publishes each new application or status change to
+``user:<applicant>`` and ``shelter:<shelterId>``, so SSE connections never
+open listeners of their own, and changes made by any worker reach every
+connection. Needs a collection-group index on applications: inbox ASC,
+updatedAt ASC.
+"""
+
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from services.events import EventHub
+
+# statuses remembered to tell status changes from other edits
+MAX_TRACKED = 100_000
+
+
+def topics_for(uid: str, role: str):
+    topics = [f"user:{uid}"]
+    if role == "shelter":
+        topics.append(f"shelter:{uid}")
+    return topics
+
+
+class ApplicationStatusFeed:
+    def __init__(self, db, hub: EventHub):
+        self.db = db
+        self.hub = hub
+        self._status: "OrderedDict[str, Optional[str]]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._watch = None
+        self._primed = False
+        self.started_at: Optional[datetime] = None
+        self.stats = {"snapshots": 0, "published": 0, "errors": 0}
+
+    def ensure_started(self):
+        if self._watch is not None:
+            return
+        with self._lock:
+            if self._watch is not None:
+                return
+            self.started_at = datetime.now(timezone.utc)
+            q = (
+                self.db.collection_group("applications")
+                .where("inbox", "==", True)
+                .where("updatedAt", ">=", self.started_at)
+            )
+            try:
+                self._watch = q.on_snapshot(self._on_snapshot)
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"[app-events] listen failed: {e}")
+
+    def stop(self):
+        if self._watch is not None:
+            self._watch.unsubscribe()
+            self._watch = None
+
+    def _remember(self, path: str, status: Optional[str]) -> Optional[str]:
+        prev = self._status.pop(path, None)
+        self._status[path] = status
+        if len(self._status) > MAX_TRACKED:
+            self._status.popitem(last=False)
+        return prev
+
+    def _on_snapshot(self, docs, changes, read_time):
+        try:
+            with self._lock:
+                self.stats["snapshots"] += 1
+                if not self._primed:
+                    # the first snapshot is the current state, not news
+                    self._primed = True
+                    for snap in docs:
+                        d = snap.to_dict() or {}
+                        self._remember(snap.reference.path, d.get("status"))
+                    return
+                for change in changes:
+                    if change.type.name == "REMOVED":
+                        self._status.pop(change.document.reference.path, None)
+                        continue
+                    self._handle(change.document)
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"[app-events] snapshot handling failed: {e}")
+
+    def _handle(self, snap):
+        d: Dict[str, Any] = snap.to_dict() or {}
+        if d.get("inbox") is not True:
+            return
+        path = snap.reference.path
+        known = path in self._status
+        prev = self._remember(path, d.get("status"))
+        if known and prev == d.get("status"):
+            return
+        self.hub.publish(
+            [f"user:{d.get('userId')}", f"shelter:{d.get('shelterId')}"],
+            "application.status",
+            {
+                "appId": snap.id,
+                "petId": d.get("petId"),
+                "status": d.get("status"),
+                "previousStatus": prev,
+                "updatedAt": d.get("updatedAt"),
+            },
+        )
+        self.stats["published"] += 1
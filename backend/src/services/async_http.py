@@ -0,0 +1,146 @@
+"""asyncio counterpart of ``http_client`` for the ASGI serving mode.
+
+One pooled ``httpx.AsyncClient`` per process, with the same retry, backoff
+and deadline rules as the sync client, plus a per-upstream semaphore so a
+slow upstream can hold at most N sockets no matter how many requests are
+waiting on it. Latency and error metrics are recorded into the sync
+client's per-upstream stats so both modes report in one place.
+"""
+
+import asyncio
+import os
+import random
+import time
+from typing import Dict, Optional
+
+import httpx
+
+from services import http_client
+from services.http_client import (
+    BACKOFF_BASE,
+    BACKOFF_MAX,
+    DEFAULT_RETRIES,
+    DEFAULT_TIMEOUT,
+    RETRY_STATUSES,
+    DeadlineExceeded,
+    remaining,
+)
+
+DEFAULT_CONCURRENCY = int(os.environ.get("ASYNC_UPSTREAM_CONCURRENCY", "32"))
+UPSTREAM_CONCURRENCY = {
+    "overpass": int(os.environ.get("ASYNC_OVERPASS_CONCURRENCY", "8")),
+    "elevenlabs": int(os.environ.get("ASYNC_ELEVENLABS_CONCURRENCY", "8")),
+    "gemini": int(os.environ.get("ASYNC_GEMINI_CONCURRENCY", "8")),
+}
+
+
+class AsyncHttpClient:
+    def __init__(self):
+        self._client: Optional[httpx.AsyncClient] = None
+        self._sems: Dict[str, asyncio.Semaphore] = {}
+
+    def _http(self) -> httpx.AsyncClient:
+        # created lazily so it binds to the serving event loop
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=256, max_keepalive_connections=64),
+                follow_redirects=True,
+            )
+        return self._client
+
+    def limiter(self, upstream: str) -> asyncio.Semaphore:
+        sem = self._sems.get(upstream)
+        if sem is None:
+            sem = self._sems[upstream] = asyncio.Semaphore(
+                UPSTREAM_CONCURRENCY.get(upstream, DEFAULT_CONCURRENCY)
+            )
+        return sem
+
+    async def acquire(self, upstream: str):
+        """Take an upstream slot, waiting no longer than the request deadline."""
+        budget = remaining()
+        sem = self.limiter(upstream)
+        try:
+            await asyncio.wait_for(sem.acquire(), budget)
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded(f"{upstream}: no free slot before deadline")
+        return sem
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        upstream: str,
+        timeout: float = DEFAULT_TIMEOUT,
+        retries: Optional[int] = None,
+        idempotent: Optional[bool] = None,
+        **kwargs,
+    ) -> httpx.Response:
+        if idempotent is None:
+            idempotent = method.upper() in ("GET", "HEAD", "OPTIONS")
+        attempts = 1 + (DEFAULT_RETRIES if retries is None else retries)
+        if not idempotent:
+            attempts = 1
+        stat = http_client.client._stat(upstream)
+
+        sem = await self.acquire(upstream)
+        try:
+            for attempt in range(attempts):
+                budget = remaining()
+                if budget is not None and budget <= 0:
+                    stat.observe(0.0, "deadline", True)
+                    raise DeadlineExceeded(f"{upstream}: request deadline exceeded")
+                call_timeout = timeout if budget is None else min(timeout, budget)
+
+                started = time.perf_counter()
+                try:
+                    resp = await self._http().request(
+                        method, url, timeout=call_timeout, **kwargs
+                    )
+                except httpx.TransportError as e:
+                    stat.observe(time.perf_counter() - started, type(e).__name__, True)
+                    if attempt + 1 >= attempts or not await self._backoff(attempt):
+                        raise
+                    stat.retries += 1
+                    continue
+
+                stat.observe(
+                    time.perf_counter() - started,
+                    str(resp.status_code),
+                    resp.status_code >= 500,
+                )
+                if resp.status_code in RETRY_STATUSES and attempt + 1 < attempts:
+                    if await self._backoff(attempt, resp.headers.get("Retry-After")):
+                        stat.retries += 1
+                        continue
+                return resp
+        finally:
+            sem.release()
+        raise RuntimeError("unreachable")
+
+    async def _backoff(self, attempt: int, retry_after: Optional[str] = None) -> bool:
+        delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2**attempt)))
+        try:
+            if retry_after is not None:
+                delay = max(delay, float(retry_after))
+        except ValueError:
+            pass
+        budget = remaining()
+        if (budget is not None and delay >= budget) or delay > BACKOFF_MAX * 2:
+            return False
+        await asyncio.sleep(delay)
+        return True
+
+    async def get(self, url: str, upstream: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, upstream, **kwargs)
+
+    async def post(self, url: str, upstream: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, upstream, **kwargs)
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+client = AsyncHttpClient()
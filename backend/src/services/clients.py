@@ -0,0 +1,168 @@
+"""Lazily constructed SDK clients.
+
+Importing ``google.genai``, ``elevenlabs`` or ``firebase_admin`` costs far
+more than the rest of the app put together, so nothing here imports them
+until a client is actually used. Each client has a named factory; ``get``
+builds it once per process under a lock, and ``proxy`` hands out a stand-in
+that can sit in a module global (``db = clients.proxy("firestore")``) without
+triggering the import.
+
+Tests and local tools swap in fakes with ``override``:
+
+    clients.override("firestore", MemoryFirestore())
+"""
+
+import importlib
+import os
+import threading
+from types import ModuleType
+from typing import Any, Callable, Dict, Optional
+
+_factories: Dict[str, Callable[[], Any]] = {}
+_instances: Dict[str, Any] = {}
+_lock = threading.RLock()  # factories may depend on other clients
+
+
+def register(name: str, factory: Callable[[], Any]):
+    _factories[name] = factory
+
+
+def get(name: str) -> Any:
+    try:
+        return _instances[name]
+    except KeyError:
+        pass
+    with _lock:
+        if name not in _instances:
+            if name not in _factories:
+                raise KeyError(f"no client factory registered for {name!r}")
+            _instances[name] = _factories[name]()
+        return _instances[name]
+
+
+def override(name: str, instance: Any):
+    with _lock:
+        _instances[name] = instance
+
+
+def reset(name: Optional[str] = None):
+    with _lock:
+        if name is None:
+            _instances.clear()
+        else:
+            _instances.pop(name, None)
+
+
+def loaded() -> Dict[str, bool]:
+    return {name: name in _instances for name in _factories}
+
+
+class LazyClient:
+    """Forwards attribute access to ``get(name)``."""
+
+    __slots__ = ("_name",)
+
+    def __init__(self, name: str):
+        self._name = name
+
+    def __getattr__(self, attr):
+        return getattr(get(self._name), attr)
+
+    def __repr__(self):
+        return f"<lazy client {self._name!r}>"
+
+
+def proxy(name: str) -> LazyClient:
+    return LazyClient(name)
+
+
+class LazyModule(ModuleType):
+    """Module stand-in that imports the real module on first attribute access."""
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self._module: Optional[ModuleType] = None
+
+    def __getattr__(self, attr):
+        if attr == "_module":
+            raise AttributeError(attr)
+        if self._module is None:
+            self._module = importlib.import_module(self.__name__)
+        return getattr(self._module, attr)
+
+
+def lazy_import(name: str) -> LazyModule:
+    return LazyModule(name)
+
+
+# --------------------------
+# Default factories
+# --------------------------
+def _firebase_app():
+    cred_path = os.environ.get("FIREBASE_CREDENTIALS")
+    if not cred_path:
+        raise RuntimeError(
+            "Missing FIREBASE_CREDENTIALS env var (path to service account json)."
+        )
+    import firebase_admin
+    from firebase_admin import credentials
+
+    if not firebase_admin._apps:
+        return firebase_admin.initialize_app(credentials.Certificate(cred_path))
+    return firebase_admin.get_app()
+
+
+def _firestore():
+    from firebase_admin import firestore
+
+    get("firebase-app")
+    return firestore.client()
+
+
+def _auth():
+    from firebase_admin import auth
+
+    get("firebase-app")
+    return auth
+
+
+def _base_url_kwargs(env_name: str, key: str) -> Dict[str, Any]:
+    # GEMINI_BASE_URL / ELEVEN_LABS_BASE_URL point the SDKs at local stubs
+    url = os.environ.get(env_name)
+    return {key: url} if url else {}
+
+
+def _gemini():
+    import google.genai as genai
+
+    base = _base_url_kwargs("GEMINI_BASE_URL", "base_url")
+    return genai.Client(
+        api_key=os.environ.get("GEMINI_API_KEY"),
+        **({"http_options": base} if base else {}),
+    )
+
+
+def _elevenlabs():
+    from elevenlabs import ElevenLabs
+
+    return ElevenLabs(
+        api_key=os.environ.get("ELEVEN_LABS_API_KEY"),
+        **_base_url_kwargs("ELEVEN_LABS_BASE_URL", "base_url"),
+    )
+
+
+def _elevenlabs_async():
+    from elevenlabs.client import AsyncElevenLabs
+
+    return AsyncElevenLabs(
+        api_key=os.environ.get("ELEVEN_LABS_API_KEY"),
+        **_base_url_kwargs("ELEVEN_LABS_BASE_URL", "base_url"),
+    )
+
+
+register("firebase-app", _firebase_app)
+register("firestore", _firestore)
+register("auth", _auth)
+register("gemini", _gemini)
+register("elevenlabs", _elevenlabs)
+register("elevenlabs-async", _elevenlabs_async)
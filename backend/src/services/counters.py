@@ -0,0 +1,216 @@
+"""Aggregate pet and application counters for dashboards.
+
+Per-shelter counts live in ``shelterStats/{shelterId}``. Platform-wide
+counts are spread over ``stats/global/shards/{0..GLOBAL_SHARDS-1}`` so that
+every write in the system doesn't contend on one document; each write bumps
+one random shard and ``read_global_stats`` sums them. All have the shape:
+
+    {"pets": {"adoptable": 12, "pending": 3, ...},
+     "applications": {"submitted": 40, "reviewing": 5, ...},
+     "updatedAt": ...}
+
+Write paths add ``Increment`` deltas for the status transitions they make
+to the same batch as the write itself, so a counter moves only when the
+change it counts commits. Concurrent edits of one document can still race
+on its old status, and so can partial failures of a chunked bulk write.
+``reconcile`` recomputes every counter from scratch to repair that drift.
+"""
+
+import os
+import random
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from services import clients
+from services.firestore_batch import Write, commit_in_chunks
+
+firestore = clients.lazy_import("firebase_admin.firestore")
+
+SHELTER_STATS = "shelterStats"
+GLOBAL_REF = ("stats", "global")
+# only ever raise this: shards past the count are no longer summed
+GLOBAL_SHARDS = int(os.environ.get("COUNTER_GLOBAL_SHARDS", "16"))
+KINDS = ("pets", "applications")
+
+# (kind, shelter_id, old status or None, new status or None)
+Transition = Tuple[str, str, Optional[str], Optional[str]]
+
+
+def shelter_stats_ref(db, shelter_id: str):
+    return db.collection(SHELTER_STATS).document(shelter_id)
+
+
+def global_shard_ref(db, shard: int):
+    return (
+        db.collection(GLOBAL_REF[0])
+        .document(GLOBAL_REF[1])
+        .collection("shards")
+        .document(str(shard))
+    )
+
+
+def _deltas(transitions: Iterable[Transition]) -> Dict[str, Dict[str, Counter]]:
+    """shelter id -> kind -> status -> net change."""
+    out: Dict[str, Dict[str, Counter]] = {}
+    for kind, shelter_id, old, new in transitions:
+        if old == new or not shelter_id:
+            continue
+        per_kind = out.setdefault(shelter_id, {k: Counter() for k in KINDS})
+        if old:
+            per_kind[kind][old] -= 1
+        if new:
+            per_kind[kind][new] += 1
+    return out
+
+
+def _increments(per_kind: Dict[str, Counter]) -> Dict[str, Any]:
+    doc: Dict[str, Any] = {}
+    for kind, counts in per_kind.items():
+        fields = {s: firestore.Increment(n) for s, n in counts.items() if n}
+        if fields:
+            doc[kind] = fields
+    return doc
+
+
+def counter_writes(db, transitions: Iterable[Transition]) -> List[Write]:
+    """``(ref, data, merge)`` increments for the given status transitions."""
+    deltas = _deltas(transitions)
+    writes: List[Write] = []
+    total = {k: Counter() for k in KINDS}
+    for shelter_id, per_kind in deltas.items():
+        doc = _increments(per_kind)
+        if not doc:
+            continue
+        doc["updatedAt"] = firestore.SERVER_TIMESTAMP
+        writes.append((shelter_stats_ref(db, shelter_id), doc, True))
+        for kind, counts in per_kind.items():
+            total[kind].update(counts)
+    global_doc = _increments(total)
+    if global_doc:
+        global_doc["updatedAt"] = firestore.SERVER_TIMESTAMP
+        shard = random.randrange(GLOBAL_SHARDS)
+        writes.append((global_shard_ref(db, shard), global_doc, True))
+    return writes
+
+
+def add_to_batch(batch, db, transitions: Iterable[Transition]) -> int:
+    writes = counter_writes(db, transitions)
+    for ref, data, merge in writes:
+        batch.set(ref, data, merge=merge)
+    return len(writes)
+
+
+def _as_counts(doc: Optional[Dict[str, Any]]) -> Dict[str, Dict[str, int]]:
+    doc = doc or {}
+    out = {}
+    for kind in KINDS:
+        counts = {s: int(n) for s, n in (doc.get(kind) or {}).items() if n}
+        out[kind] = {**counts, "total": sum(counts.values())}
+    return out
+
+
+def read_stats(snap) -> Dict[str, Any]:
+    doc = snap.to_dict() if snap.exists else None
+    return {
+        **_as_counts(doc),
+        "updatedAt": (doc or {}).get("updatedAt"),
+        "reconciledAt": (doc or {}).get("reconciledAt"),
+    }
+
+
+def read_global_stats(db) -> Dict[str, Any]:
+    """Platform-wide counts, summed over the shards."""
+    total: Dict[str, Counter] = {k: Counter() for k in KINDS}
+    stamps: Dict[str, List[Any]] = {"updatedAt": [], "reconciledAt": []}
+    refs = [global_shard_ref(db, i) for i in range(GLOBAL_SHARDS)]
+    for snap in db.get_all(refs):
+        if not snap.exists:
+            continue
+        doc = snap.to_dict() or {}
+        for kind in KINDS:
+            total[kind].update({s: int(n) for s, n in (doc.get(kind) or {}).items()})
+        for field, seen in stamps.items():
+            if doc.get(field) is not None:
+                seen.append(doc[field])
+    return {
+        **_as_counts(total),
+        **{field: max(seen) if seen else None for field, seen in stamps.items()},
+    }
+
+
+def recount(db) -> Dict[str, Dict[str, Counter]]:
+    counts: Dict[str, Dict[str, Counter]] = {}
+
+    def bucket(shelter_id):
+        return counts.setdefault(shelter_id, {k: Counter() for k in KINDS})
+
+    for s in db.collection("pets").select(["shelterId", "status"]).stream():
+        d = s.to_dict() or {}
+        if d.get("shelterId") and d.get("status"):
+            bucket(d["shelterId"])["pets"][d["status"]] += 1
+
+    apps = (
+        db.collection_group("applications")
+        .where("inbox", "==", True)
+        .select(["shelterId", "status"])
+    )
+    for s in apps.stream():
+        d = s.to_dict() or {}
+        if d.get("shelterId") and d.get("status"):
+            bucket(d["shelterId"])["applications"][d["status"]] += 1
+    return counts
+
+
+def reconcile(db, dry_run: bool = False) -> Dict[str, Any]:
+    """
+    Overwrite every counter document with freshly counted values. Writes
+    that land while the recount runs can be lost, so run it off-peak.
+    """
+    counts = recount(db)
+    stale = [
+        s.id
+        for s in db.collection(SHELTER_STATS).select(["updatedAt"]).stream()
+        if s.id not in counts
+    ]
+    total = {k: Counter() for k in KINDS}
+    writes: List[Write] = []
+    for shelter_id, per_kind in counts.items():
+        doc = {k: dict(+per_kind[k]) for k in KINDS}
+        doc["reconciledAt"] = firestore.SERVER_TIMESTAMP
+        doc["updatedAt"] = firestore.SERVER_TIMESTAMP
+        writes.append((shelter_stats_ref(db, shelter_id), doc, False))
+        for k in KINDS:
+            total[k].update(per_kind[k])
+    for shelter_id in stale:
+        writes.append(
+            (
+                shelter_stats_ref(db, shelter_id),
+                {
+                    "pets": {},
+                    "applications": {},
+                    "reconciledAt": firestore.SERVER_TIMESTAMP,
+                    "updatedAt": firestore.SERVER_TIMESTAMP,
+                },
+                False,
+            )
+        )
+    # the whole total goes on shard 0; the other shards start again from zero
+    for shard in range(GLOBAL_SHARDS):
+        writes.append(
+            (
+                global_shard_ref(db, shard),
+                {
+                    **{k: dict(+total[k]) if shard == 0 else {} for k in KINDS},
+                    "reconciledAt": firestore.SERVER_TIMESTAMP,
+                    "updatedAt": firestore.SERVER_TIMESTAMP,
+                },
+                False,
+            )
+        )
+    if not dry_run:
+        commit_in_chunks(db, writes)
+    return {
+        "shelters": len(counts),
+        "zeroed": len(stale),
+        "global": {k: dict(+total[k]) for k in KINDS},
+    }
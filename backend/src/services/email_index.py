@@ -0,0 +1,34 @@
+"""Unique-email index for accounts.
+
+``userEmailIndex/{sha256(normalized email)}`` points at the
+``userIdentification`` document that owns the address. Signup creates it in
+the same batch as the account, so a second signup for the address fails.
+Hashing keeps the id a valid document id whatever the address contains
+("/", ".", ".."). The entry holds no credentials: login follows ``userId``
+to the account document to check the password.
+"""
+
+import hashlib
+from typing import Any, Dict
+
+COLLECTION = "userEmailIndex"
+# copied from the account so login can answer from the index entry
+ENTRY_FIELDS = ("email", "username", "handle")
+
+
+def normalize_email(email) -> str:
+    return str(email or "").strip().lower()
+
+
+def index_id(email) -> str:
+    return hashlib.sha256(normalize_email(email).encode("utf-8")).hexdigest()
+
+
+def index_ref(db, email):
+    return db.collection(COLLECTION).document(index_id(email))
+
+
+def index_entry(account: Dict[str, Any], user_id: str) -> Dict[str, Any]:
+    entry = {k: account.get(k) for k in ENTRY_FIELDS}
+    entry["userId"] = user_id
+    return entry
@@ -0,0 +1,272 @@
+"""In-process pub/sub hub for server-sent events.
+
+Publishers call ``hub.publish(topics, type, data)`` from any thread. Every
+connection subscribes to a few topics (``user:<uid>``, ``shelter:<uid>``)
+and gets its own small bounded queue, so a connection costs one queue and no
+listener of its own. Slow consumers that overflow their queue are closed.
+The client reconnects with ``Last-Event-ID``, and the hub replays what it
+missed from a ring buffer of recent events.
+
+Event ids are ``<boot>-<seq>``. An id from another process or an older boot,
+or one that has already scrolled out of the buffer, can't be replayed. The
+client gets a ``reset`` event instead and should refetch its state.
+"""
+
+import asyncio
+import itertools
+import json
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+BUFFER_SIZE = 2000
+QUEUE_SIZE = 100
+HEARTBEAT_SECONDS = 15.0
+RETRY_MS = 3000
+
+
+class Event:
+    __slots__ = ("id", "seq", "topics", "type", "data", "at")
+
+    def __init__(self, boot: str, seq: int, topics, type_: str, data):
+        self.id = f"{boot}-{seq}"
+        self.seq = seq
+        self.topics = frozenset(topics)
+        self.type = type_
+        self.data = data
+        self.at = time.time()
+
+    def to_sse(self) -> str:
+        return format_sse(self.type, self.data, self.id)
+
+
+def format_sse(
+    event: Optional[str], data: Any = None, event_id: Optional[str] = None
+) -> str:
+    lines = []
+    if event_id:
+        lines.append(f"id: {event_id}")
+    if event:
+        lines.append(f"event: {event}")
+    payload = json.dumps(data, separators=(",", ":"), default=str)
+    lines.extend(f"data: {chunk}" for chunk in payload.splitlines() or [""])
+    return "\n".join(lines) + "\n\n"
+
+
+HEARTBEAT = ": ping\n\n"
+PREAMBLE = f"retry: {RETRY_MS}\n\n"
+
+
+class _Subscriber:
+    """Base for sync and async subscribers; ``deliver`` runs on the publisher's thread."""
+
+    def __init__(self, topics: Set[str]):
+        self.topics = topics
+        self.closed = False
+        self.overflowed = False
+
+    def deliver(self, event: Event):
+        raise NotImplementedError
+
+
+class Subscription(_Subscriber):
+    """Blocking subscription for threaded (WSGI) handlers."""
+
+    def __init__(self, hub: "EventHub", topics: Set[str]):
+        super().__init__(topics)
+        self._hub = hub
+        self._queue: Deque[Event] = deque()
+        self._cond = threading.Condition()
+
+    def deliver(self, event: Event):
+        with self._cond:
+            if len(self._queue) >= QUEUE_SIZE:
+                self.overflowed = True
+                self.closed = True
+            else:
+                self._queue.append(event)
+            self._cond.notify()
+
+    def get(self, timeout: float) -> Optional[Event]:
+        """Next event, or None on timeout/close."""
+        with self._cond:
+            if not self._queue and not self.closed:
+                self._cond.wait(timeout)
+            return self._queue.popleft() if self._queue else None
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify()
+        self._hub._unsubscribe(self)
+
+
+class AsyncSubscription(_Subscriber):
+    """asyncio subscription; events published from other threads hop onto the loop."""
+
+    def __init__(self, hub: "EventHub", topics: Set[str]):
+        super().__init__(topics)
+        self._hub = hub
+        self._loop = asyncio.get_running_loop()
+        self._queue: asyncio.Queue = asyncio.Queue(QUEUE_SIZE)
+
+    def _put(self, event: Optional[Event]):
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+            self.closed = True
+            self._queue.get_nowait()
+            self._queue.put_nowait(None)
+
+    def deliver(self, event: Event):
+        self._loop.call_soon_threadsafe(self._put, event)
+
+    async def get(self, timeout: float) -> Optional[Event]:
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.closed = True
+        self._hub._unsubscribe(self)
+
+
+class EventHub:
+    def __init__(self, buffer_size: int = BUFFER_SIZE):
+        self.boot = uuid.uuid4().hex[:8]
+        self._seq = itertools.count(1)
+        self._buffer: Deque[Event] = deque(maxlen=buffer_size)
+        self._subs: Dict[str, Set[_Subscriber]] = {}
+        self._lock = threading.Lock()
+        self.stats = {"published": 0, "delivered": 0, "overflows": 0, "replayed": 0}
+
+    def publish(self, topics: Iterable[str], type_: str, data: Any) -> Event:
+        topics = [t for t in topics if t]
+        with self._lock:
+            event = Event(self.boot, next(self._seq), topics, type_, data)
+            self._buffer.append(event)
+            targets = set()
+            for t in topics:
+                targets.update(self._subs.get(t, ()))
+            self.stats["published"] += 1
+        for sub in targets:
+            if sub.closed:
+                continue
+            sub.deliver(event)
+            if sub.overflowed:
+                self.stats["overflows"] += 1
+            else:
+                self.stats["delivered"] += 1
+        return event
+
+    def _register(self, sub: _Subscriber):
+        with self._lock:
+            for t in sub.topics:
+                self._subs.setdefault(t, set()).add(sub)
+
+    def _unsubscribe(self, sub: _Subscriber):
+        with self._lock:
+            for t in sub.topics:
+                subs = self._subs.get(t)
+                if subs is not None:
+                    subs.discard(sub)
+                    if not subs:
+                        del self._subs[t]
+
+    def subscribe(self, topics: Iterable[str]) -> Subscription:
+        sub = Subscription(self, set(topics))
+        self._register(sub)
+        return sub
+
+    def subscribe_async(self, topics: Iterable[str]) -> AsyncSubscription:
+        sub = AsyncSubscription(self, set(topics))
+        self._register(sub)
+        return sub
+
+    def replay(
+        self, topics: Iterable[str], last_event_id: Optional[str]
+    ) -> Tuple[List[Event], bool]:
+        """(missed events, gap) for a reconnecting client; gap means refetch."""
+        if not last_event_id:
+            return [], False
+        boot, _, seq = last_event_id.partition("-")
+        try:
+            after = int(seq)
+        except ValueError:
+            return [], True
+        wanted = set(topics)
+        with self._lock:
+            if boot != self.boot:
+                return [], True
+            oldest = self._buffer[0].seq if self._buffer else after + 1
+            missed = [e for e in self._buffer if e.seq > after and e.topics & wanted]
+        self.stats["replayed"] += len(missed)
+        return missed, oldest > after + 1
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            subscribers = set()
+            for subs in self._subs.values():
+                subscribers.update(subs)
+            return {
+                **self.stats,
+                "subscribers": len(subscribers),
+                "topics": len(self._subs),
+                "buffered": len(self._buffer),
+                "boot": self.boot,
+            }
+
+
+def sse_stream(hub: EventHub, topics: Iterable[str], last_event_id: Optional[str]):
+    """Blocking SSE generator for a WSGI response."""
+    topics = list(topics)
+    sub = hub.subscribe(topics)
+    try:
+        yield PREAMBLE
+        missed, gap = hub.replay(topics, last_event_id)
+        if gap:
+            yield format_sse("reset", {"reason": "history unavailable"})
+        for e in missed:
+            yield e.to_sse()
+        # the subscription opened before the replay, so skip any overlap
+        seen = missed[-1].seq if missed else 0
+        while not sub.closed:
+            event = sub.get(HEARTBEAT_SECONDS)
+            if event is None:
+                yield HEARTBEAT
+            elif event.seq > seen:
+                yield event.to_sse()
+    finally:
+        sub.close()
+
+
+async def sse_stream_async(
+    hub: EventHub, topics: Iterable[str], last_event_id: Optional[str]
+):
+    """Async SSE generator for the ASGI serving mode."""
+    topics = list(topics)
+    sub = hub.subscribe_async(topics)
+    try:
+        yield PREAMBLE
+        missed, gap = hub.replay(topics, last_event_id)
+        if gap:
+            yield format_sse("reset", {"reason": "history unavailable"})
+        for e in missed:
+            yield e.to_sse()
+        # the subscription opened before the replay, so skip any overlap
+        seen = missed[-1].seq if missed else 0
+        while not sub.closed:
+            event = await sub.get(HEARTBEAT_SECONDS)
+            if event is None:
+                yield HEARTBEAT
+            elif event.seq > seen:
+                yield event.to_sse()
+    finally:
+        sub.close()
+
+
+hub = EventHub()
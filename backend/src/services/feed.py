@@ -0,0 +1,228 @@
+"""Materialized per-user feeds.
+
+New posts are fanned out at write time into ``users/{uid}/feed/{postId}``
+entries that carry a denormalized copy of the post plus a precomputed
+``score``. Reading a feed page is then one ``order_by("score")`` range read.
+
+Shelters whose follower count passes ``FANOUT_MAX_FOLLOWERS`` switch to
+fan-out-on-read: their posts are not copied, their followers' ``following``
+entries are flagged ``fanoutOnRead`` and the reader merges in the newest
+posts from just those shelters.
+"""
+
+import math
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from services import clients
+from services.firestore_batch import (
+    commit_in_chunks,
+    delete_in_chunks,
+    run_transaction,
+)
+
+firestore = clients.lazy_import("firebase_admin.firestore")
+
+FANOUT_MAX_FOLLOWERS = int(os.environ.get("FEED_FANOUT_MAX_FOLLOWERS", "5000"))
+# one unit of score == one day of freshness
+FRESHNESS_SECONDS = 86400.0
+URGENCY_WEIGHT = 0.05
+URGENCY_CAP = 60.0
+
+_POST_FIELDS = ("shelterId", "petId", "caption", "tags", "imageUrls", "images")
+
+
+def feed_score(created_ts: float, urgency: float = 0.0) -> float:
+    """
+    Time-based score, so entries never need re-ranking: a post about an
+    urgent pet sorts as if it were posted up to a few days later.
+    """
+    boost = URGENCY_WEIGHT * max(0.0, min(URGENCY_CAP, urgency))
+    return created_ts / FRESHNESS_SECONDS + math.log1p(boost)
+
+
+def _follow_refs(db, uid: str, shelter_id: str):
+    shelter_ref = db.collection("shelters").document(shelter_id)
+    following_ref = (
+        db.collection("users")
+        .document(uid)
+        .collection("following")
+        .document(shelter_id)
+    )
+    return shelter_ref, shelter_ref.collection("followers").document(uid), following_ref
+
+
+def follow(db, uid: str, shelter_id: str):
+    shelter_ref, follower_ref, following_ref = _follow_refs(db, uid, shelter_id)
+
+    # the existence check and the increment commit together, so concurrent
+    # follows by the same user count once
+    def _follow(transaction):
+        snap = shelter_ref.get(transaction=transaction)
+        if not snap.exists:
+            raise LookupError("shelter not found")
+        if follower_ref.get(transaction=transaction).exists:
+            return
+        shelter = snap.to_dict() or {}
+        transaction.set(
+            follower_ref, {"uid": uid, "createdAt": firestore.SERVER_TIMESTAMP}
+        )
+        transaction.set(
+            following_ref,
+            {
+                "shelterId": shelter_id,
+                "fanoutOnRead": shelter.get("fanoutMode") == "read",
+                "createdAt": firestore.SERVER_TIMESTAMP,
+            },
+        )
+        transaction.set(
+            shelter_ref, {"followerCount": firestore.Increment(1)}, merge=True
+        )
+
+    run_transaction(db, _follow)
+
+
+def unfollow(db, uid: str, shelter_id: str):
+    shelter_ref, follower_ref, following_ref = _follow_refs(db, uid, shelter_id)
+
+    def _unfollow(transaction):
+        if not follower_ref.get(transaction=transaction).exists:
+            return
+        transaction.delete(follower_ref)
+        transaction.delete(following_ref)
+        transaction.set(
+            shelter_ref, {"followerCount": firestore.Increment(-1)}, merge=True
+        )
+
+    run_transaction(db, _unfollow)
+
+    # the shelter's fanned-out posts would otherwise stay in the feed
+    entries = (
+        db.collection("users")
+        .document(uid)
+        .collection("feed")
+        .where("shelterId", "==", shelter_id)
+        .stream()
+    )
+    delete_in_chunks(db, [s.reference for s in entries])
+
+
+def _switch_to_fanout_on_read(db, shelter_ref, follower_ids: List[str]):
+    writes = [
+        (
+            db.collection("users")
+            .document(uid)
+            .collection("following")
+            .document(shelter_ref.id),
+            {"fanoutOnRead": True},
+            True,
+        )
+        for uid in follower_ids
+    ]
+    writes.append((shelter_ref, {"fanoutMode": "read"}, True))
+    commit_in_chunks(db, writes)
+
+
+def fan_out_post(db, post_id: str, post: Dict[str, Any], score: float) -> int:
+    """Copy a post into every follower's feed. Returns the number of entries."""
+    shelter_ref = db.collection("shelters").document(post["shelterId"])
+    shelter = shelter_ref.get().to_dict() or {}
+    if shelter.get("fanoutMode") == "read":
+        return 0
+
+    follower_ids = [s.id for s in shelter_ref.collection("followers").stream()]
+    if len(follower_ids) > FANOUT_MAX_FOLLOWERS:
+        _switch_to_fanout_on_read(db, shelter_ref, follower_ids)
+        return 0
+
+    entry = {k: post.get(k) for k in _POST_FIELDS}
+    entry.update(
+        {"postId": post_id, "score": score, "createdAt": post.get("createdAt")}
+    )
+    writes = [
+        (
+            db.collection("users").document(uid).collection("feed").document(post_id),
+            entry,
+            False,
+        )
+        for uid in follower_ids
+    ]
+    commit_in_chunks(db, writes)
+    return len(writes)
+
+
+def fan_out_post_async(db, post_id: str, post: Dict[str, Any], score: float):
+    def _run():
+        try:
+            fan_out_post(db, post_id, post, score)
+        except Exception as e:
+            print(f"[feed] fan-out for post {post_id} failed: {e}")
+
+    threading.Thread(target=_run, name=f"feed-fanout-{post_id}", daemon=True).start()
+
+
+def encode_cursor(score: float, doc_id: str) -> str:
+    return f"{score!r}:{doc_id}"
+
+
+def decode_cursor(cursor: str) -> Tuple[float, Optional[str]]:
+    """``"<score>:<doc id>"``; a bare score (older clients) has no tiebreak."""
+    score, _, doc_id = cursor.partition(":")
+    return float(score), doc_id or None
+
+
+def _after(field: str, score: float, doc_id: Optional[str]) -> Dict[str, Any]:
+    return {field: score, "__name__": doc_id} if doc_id else {field: score}
+
+
+def read_feed(db, uid: str, limit: int, cursor: Optional[str] = None) -> Dict[str, Any]:
+    """Feed entries by score, newest first; ties are broken by post id."""
+    desc = firestore.Query.DESCENDING
+    after = decode_cursor(cursor) if cursor else None
+    q = (
+        db.collection("users")
+        .document(uid)
+        .collection("feed")
+        .order_by("score", direction=desc)
+        .order_by("__name__", direction=desc)
+    )
+    if after is not None:
+        q = q.start_after(_after("score", *after))
+    items = []
+    for s in q.limit(limit).stream():
+        d = s.to_dict() or {}
+        items.append({"id": d.get("postId") or s.id, **d})
+
+    big = (
+        db.collection("users")
+        .document(uid)
+        .collection("following")
+        .where("fanoutOnRead", "==", True)
+        .stream()
+    )
+    for f in big:
+        pq = (
+            db.collection("posts")
+            .where("shelterId", "==", f.id)
+            .order_by("feedScore", direction=desc)
+            .order_by("__name__", direction=desc)
+        )
+        if after is not None:
+            pq = pq.start_after(_after("feedScore", *after))
+        for s in pq.limit(limit).stream():
+            d = s.to_dict() or {}
+            items.append({"id": s.id, "postId": s.id, "score": d.get("feedScore"), **d})
+
+    # feed entries are keyed by post id, so both sources share the tiebreak
+    items.sort(key=lambda x: (x.get("score") or 0.0, x["id"]), reverse=True)
+    items = items[:limit]
+    next_cursor = None
+    if len(items) == limit:
+        next_cursor = encode_cursor(items[-1].get("score") or 0.0, items[-1]["id"])
+    return {"items": items, "nextCursor": next_cursor}
+
+
+def now_score(urgency: float = 0.0) -> float:
+    return feed_score(time.time(), urgency)
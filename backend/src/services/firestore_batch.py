@@ -0,0 +1,56 @@
+"""Chunked Firestore write batches, plus a transaction runner.
+
+A single Firestore batch accepts at most 500 operations, so bulk endpoints
+collect their writes as ``(ref, data, merge)`` tuples and commit them here.
+"""
+
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+BATCH_LIMIT = 500
+
+Write = Tuple[Any, Dict[str, Any], bool]
+
+
+def chunked(items: List[Any], size: int) -> Iterable[List[Any]]:
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
+
+
+def commit_in_chunks(db, writes: List[Write], limit: int = BATCH_LIMIT) -> int:
+    """Commit writes in order, ``limit`` operations per batch. Returns batch count."""
+    limit = max(1, min(BATCH_LIMIT, limit))
+    commits = 0
+    for chunk in chunked(writes, limit):
+        batch = db.batch()
+        for ref, data, merge in chunk:
+            batch.set(ref, data, merge=merge)
+        batch.commit()
+        commits += 1
+    return commits
+
+
+def delete_in_chunks(db, refs: List[Any], limit: int = BATCH_LIMIT) -> int:
+    """Delete refs, ``limit`` per batch. Returns batch count."""
+    limit = max(1, min(BATCH_LIMIT, limit))
+    commits = 0
+    for chunk in chunked(refs, limit):
+        batch = db.batch()
+        for ref in chunk:
+            batch.delete(ref)
+        batch.commit()
+        commits += 1
+    return commits
+
+
+def run_transaction(db, fn: Callable[[Any], Any]) -> Any:
+    """Run ``fn(transaction)`` atomically; Firestore retries it on contention.
+
+    Reads inside ``fn`` must go through the transaction
+    (``ref.get(transaction=transaction)``) and come before its writes.
+    """
+    own = getattr(db, "run_transaction", None)
+    if own is not None:  # Repository, MemoryFirestore
+        return own(fn)
+    from firebase_admin import firestore
+
+    return firestore.transactional(fn)(db.transaction())
@@ -0,0 +1,203 @@
+"""Shared outbound HTTP client.
+
+All upstream calls (ip-api, Overpass, scraped shelter sites, ...) go
+through one ``requests.Session`` so TCP/TLS connections are kept alive and
+pooled per host. Every call names its upstream, which is used for metrics.
+
+Timeouts compose with a per-request deadline: inside ``with deadline(5):``
+no call waits longer than what is left of the 5 s, so stacked timeouts can
+no longer blow a route's latency budget. Idempotent calls are retried with
+jittered exponential backoff while the budget allows.
+"""
+
+import contextvars
+import functools
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from services import metrics
+
+POOL_CONNECTIONS = 16
+POOL_MAXSIZE = 32
+DEFAULT_TIMEOUT = 8.0
+DEFAULT_RETRIES = 2
+BACKOFF_BASE = 0.2
+BACKOFF_MAX = 2.0
+RETRY_STATUSES = {429, 502, 503, 504}
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class DeadlineExceeded(requests.exceptions.Timeout):
+    pass
+
+
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar(
+    "http_deadline", default=None
+)
+
+
+@contextmanager
+def deadline(seconds: float):
+    """Bound every outbound call in this block; nested deadlines only shrink."""
+    new = time.monotonic() + seconds
+    cur = _deadline.get()
+    token = _deadline.set(new if cur is None else min(cur, new))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def with_deadline(seconds: float):
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            with deadline(seconds):
+                return fn(*args, **kwargs)
+
+        return inner
+
+    return wrap
+
+
+def remaining() -> Optional[float]:
+    d = _deadline.get()
+    return None if d is None else d - time.monotonic()
+
+
+class _UpstreamStats:
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.latency_sum = 0.0
+        self.latency_max = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.statuses: Dict[str, int] = {}
+
+    def observe(self, seconds: float, status: str, error: bool):
+        self.calls += 1
+        self.errors += int(error)
+        self.latency_sum += seconds
+        self.latency_max = max(self.latency_max, seconds)
+        i = 0
+        while i < len(LATENCY_BUCKETS) and seconds > LATENCY_BUCKETS[i]:
+            i += 1
+        self.buckets[i] += 1
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        metrics.observe_dependency(self.name, seconds, status)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "retries": self.retries,
+            "latencyAvg": round(self.latency_sum / self.calls, 4) if self.calls else 0,
+            "latencyMax": round(self.latency_max, 4),
+            "latencySum": self.latency_sum,
+            "buckets": dict(
+                zip([str(b) for b in LATENCY_BUCKETS] + ["+Inf"], self.buckets)
+            ),
+            "statuses": dict(self.statuses),
+        }
+
+
+class HttpClient:
+    def __init__(self, pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=pool_connections, pool_maxsize=pool_maxsize
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._stats: Dict[str, _UpstreamStats] = {}
+        self._lock = threading.Lock()
+
+    def _stat(self, upstream: str) -> _UpstreamStats:
+        s = self._stats.get(upstream)
+        if s is None:
+            with self._lock:
+                s = self._stats.setdefault(upstream, _UpstreamStats(upstream))
+        return s
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {name: s.to_dict() for name, s in self._stats.items()}
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        upstream: str,
+        timeout: float = DEFAULT_TIMEOUT,
+        retries: Optional[int] = None,
+        idempotent: Optional[bool] = None,
+        **kwargs,
+    ) -> requests.Response:
+        if idempotent is None:
+            idempotent = method.upper() in ("GET", "HEAD", "OPTIONS")
+        attempts = 1 + (DEFAULT_RETRIES if retries is None else retries)
+        if not idempotent:
+            attempts = 1
+        stat = self._stat(upstream)
+
+        for attempt in range(attempts):
+            budget = remaining()
+            if budget is not None and budget <= 0:
+                stat.observe(0.0, "deadline", True)
+                raise DeadlineExceeded(f"{upstream}: request deadline exceeded")
+            call_timeout = timeout if budget is None else min(timeout, budget)
+
+            started = time.perf_counter()
+            try:
+                resp = self.session.request(method, url, timeout=call_timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                stat.observe(time.perf_counter() - started, type(e).__name__, True)
+                if attempt + 1 >= attempts or not self._backoff(attempt, None):
+                    raise
+                stat.retries += 1
+                continue
+
+            elapsed = time.perf_counter() - started
+            retryable = resp.status_code in RETRY_STATUSES
+            stat.observe(elapsed, str(resp.status_code), resp.status_code >= 500)
+            if retryable and attempt + 1 < attempts:
+                if self._backoff(attempt, resp.headers.get("Retry-After")):
+                    stat.retries += 1
+                    resp.close()
+                    continue
+            return resp
+        raise RuntimeError("unreachable")
+
+    def _backoff(self, attempt: int, retry_after: Optional[str]) -> bool:
+        """Sleep before the next attempt; False if the deadline leaves no room."""
+        delay = min(BACKOFF_MAX, BACKOFF_BASE * (2**attempt))
+        delay = random.uniform(0, delay)
+        try:
+            if retry_after is not None:
+                delay = max(delay, float(retry_after))
+        except ValueError:
+            pass
+        budget = remaining()
+        if budget is not None and delay >= budget:
+            return False
+        if delay > BACKOFF_MAX * 2:
+            return False
+        time.sleep(delay)
+        return True
+
+    def get(self, url: str, upstream: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, upstream, **kwargs)
+
+    def post(self, url: str, upstream: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, upstream, **kwargs)
+
+
+client = HttpClient()
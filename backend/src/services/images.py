@@ -0,0 +1,366 @@
+"""Resized derivatives of pet and post photos.
+
+Shelters upload full-size phone photos. A small worker pool downloads each
+new ``coverImageUrl`` / ``imageUrls`` entry, resizes it to ``WIDTHS`` as
+WebP and JPEG, and uploads the results to the image storage backend:
+
+    IMAGE_STORAGE=firebase   Firebase Storage bucket IMAGE_BUCKET (the
+                             images/ prefix must be publicly readable)
+    IMAGE_STORAGE=local      files under IMAGE_DIR, served from IMAGE_BASE_URL
+
+With IMAGE_STORAGE unset nothing is processed and the originals are served.
+Derivatives are recorded next to the original URL:
+
+    pets/{id}.coverImage = {"source": url, "sizes": [{"width": 320,
+                            "height": 240, "webp": ..., "jpeg": ...}, ...]}
+    posts/{id}.images    = [{"source": url, "sizes": [...]}, ...]
+
+and ``pick`` chooses the smallest size that covers the width a card needs.
+A record whose ``source`` no longer matches the current URL is ignored, so
+a changed photo falls back to the original until it has been processed.
+Object keys hash the source bytes, so re-uploads of one photo share files.
+Source URLs are shelter-supplied, so they are fetched only over http(s), and
+only from hosts that resolve to public addresses (and, with
+IMAGE_SOURCE_HOSTS set, only from those hosts and their subdomains).
+Redirects are followed by hand and checked the same way.
+Needs Pillow (``pip install pillow``).
+"""
+
+import hashlib
+import io
+import ipaddress
+import os
+import socket
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from urllib.parse import urljoin, urlsplit
+
+from services import clients
+
+WIDTHS = (320, 640, 1280)
+CARD_WIDTH = int(os.environ.get("IMAGE_CARD_WIDTH", "640"))
+FORMATS = ("webp", "jpeg")
+WEBP_QUALITY = 80
+JPEG_QUALITY = 82
+MAX_SOURCE_BYTES = int(os.environ.get("IMAGE_MAX_SOURCE_BYTES", str(25 * 1024 * 1024)))
+MAX_SOURCE_PIXELS = 50_000_000
+MAX_REDIRECTS = 3
+# optional allow-list, e.g. "firebasestorage.googleapis.com,cdn.example.org"
+SOURCE_HOSTS = tuple(
+    h.strip().lower()
+    for h in os.environ.get("IMAGE_SOURCE_HOSTS", "").split(",")
+    if h.strip()
+)
+WORKERS = int(os.environ.get("IMAGE_WORKERS", "2"))
+KEY_PREFIX = "images"
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+_CONTENT_TYPES = {"webp": "image/webp", "jpeg": "image/jpeg"}
+
+
+# --------------------------
+# Storage backends
+# --------------------------
+class LocalStorage:
+    """Files on disk; for development and tests."""
+
+    def __init__(self, root: str, base_url: str):
+        self.root = Path(root)
+        self.base_url = base_url.rstrip("/")
+
+    def put(self, key: str, data: bytes, content_type: str) -> str:
+        path = self.root / key
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+        return self.url(key)
+
+    def exists(self, key: str) -> bool:
+        return (self.root / key).is_file()
+
+    def url(self, key: str) -> str:
+        return f"{self.base_url}/{key}"
+
+
+class FirebaseStorage:
+    def __init__(self, bucket_name: Optional[str] = None):
+        self.bucket_name = bucket_name
+        self._bucket = None
+
+    @property
+    def bucket(self):
+        if self._bucket is None:
+            from firebase_admin import storage
+
+            clients.get("firebase-app")
+            self._bucket = storage.bucket(self.bucket_name)
+        return self._bucket
+
+    def put(self, key: str, data: bytes, content_type: str) -> str:
+        blob = self.bucket.blob(key)
+        blob.cache_control = CACHE_CONTROL
+        blob.upload_from_string(data, content_type=content_type)
+        return blob.public_url
+
+    def exists(self, key: str) -> bool:
+        return self.bucket.blob(key).exists()
+
+    def url(self, key: str) -> str:
+        return self.bucket.blob(key).public_url
+
+
+def storage_from_env():
+    kind = os.environ.get("IMAGE_STORAGE", "").lower()
+    if kind == "firebase":
+        return FirebaseStorage(os.environ.get("IMAGE_BUCKET") or None)
+    if kind == "local":
+        return LocalStorage(
+            os.environ.get("IMAGE_DIR", "media"),
+            os.environ.get("IMAGE_BASE_URL", "/api/media"),
+        )
+    return None
+
+
+clients.register("image-storage", storage_from_env)
+
+
+# --------------------------
+# Resizing
+# --------------------------
+def _load(data: bytes, largest: int):
+    from PIL import Image, ImageOps
+
+    Image.MAX_IMAGE_PIXELS = MAX_SOURCE_PIXELS
+    img = Image.open(io.BytesIO(data))
+    # lets the JPEG decoder scale down by 1/2..1/8 while decoding
+    img.draft("RGB", (largest, largest))
+    img = ImageOps.exif_transpose(img)
+    if img.mode in ("RGBA", "LA", "P"):
+        img = img.convert("RGBA")
+        flat = Image.new("RGB", img.size, (255, 255, 255))
+        flat.paste(img, mask=img.getchannel("A"))
+        return flat
+    return img.convert("RGB")
+
+
+def _encode(img, fmt: str) -> bytes:
+    out = io.BytesIO()
+    if fmt == "webp":
+        img.save(out, "WEBP", quality=WEBP_QUALITY, method=4)
+    else:
+        img.save(out, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+    return out.getvalue()
+
+
+def target_widths(width: int) -> List[int]:
+    """Fixed widths below the original, or just the original if it is smaller."""
+    return [w for w in WIDTHS if w < width] or [width]
+
+
+def build_sizes(storage, data: bytes) -> List[Dict[str, Any]]:
+    """Resize ``data`` and upload every width/format; smallest first."""
+    from PIL import Image
+
+    digest = hashlib.sha256(data).hexdigest()[:32]
+    img = _load(data, max(WIDTHS))
+    sizes = []
+    # largest first, each step resampling the previous one
+    for width in sorted(target_widths(img.width), reverse=True):
+        height = max(1, round(img.height * width / img.width))
+        if width != img.width:
+            img = img.resize((width, height), Image.LANCZOS)
+        entry: Dict[str, Any] = {"width": width, "height": height}
+        for fmt in FORMATS:
+            key = f"{KEY_PREFIX}/{digest}/{width}.{'jpg' if fmt == 'jpeg' else fmt}"
+            entry[fmt] = (
+                storage.url(key)
+                if storage.exists(key)
+                else storage.put(key, _encode(img, fmt), _CONTENT_TYPES[fmt])
+            )
+        sizes.append(entry)
+    return sizes[::-1]
+
+
+def check_source_url(url: str):
+    """Raise ValueError unless ``url`` is http(s) on an allowed, public host."""
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise ValueError("image URL must be http(s)")
+    host = parts.hostname.lower()
+    if SOURCE_HOSTS and not any(
+        host == h or host.endswith("." + h) for h in SOURCE_HOSTS
+    ):
+        raise ValueError("image host not allowed")
+    try:
+        infos = socket.getaddrinfo(host, None, proto=socket.IPPROTO_TCP)
+    except (socket.gaierror, ValueError):
+        raise ValueError("image host does not resolve")
+    for info in infos:
+        ip = ipaddress.ip_address(info[4][0].split("%", 1)[0])
+        if ip.version == 6 and ip.ipv4_mapped:
+            ip = ip.ipv4_mapped
+        # private, loopback, link-local (metadata servers), reserved, ...
+        if not ip.is_global or ip.is_multicast:
+            raise ValueError("image host not allowed")
+
+
+def fetch_source(url: str) -> bytes:
+    from services import http_client
+
+    for _ in range(MAX_REDIRECTS + 1):
+        check_source_url(url)
+        resp = http_client.client.get(
+            url, "images", timeout=20, stream=True, allow_redirects=False
+        )
+        if not resp.is_redirect:
+            break
+        resp.close()
+        url = urljoin(url, resp.headers["Location"])
+    else:
+        raise ValueError("too many redirects")
+    try:
+        resp.raise_for_status()
+        chunks, size = [], 0
+        for chunk in resp.iter_content(64 * 1024):
+            size += len(chunk)
+            if size > MAX_SOURCE_BYTES:
+                raise ValueError(f"image larger than {MAX_SOURCE_BYTES} bytes")
+            chunks.append(chunk)
+        return b"".join(chunks)
+    finally:
+        resp.close()
+
+
+def derive(storage, url: str) -> Dict[str, Any]:
+    return {"source": url, "sizes": build_sizes(storage, fetch_source(url))}
+
+
+# --------------------------
+# Choosing a size
+# --------------------------
+def pick(
+    record: Optional[Dict[str, Any]],
+    original: Optional[str],
+    width: int = CARD_WIDTH,
+    fmt: str = "webp",
+) -> Optional[str]:
+    """Smallest derivative at least ``width`` wide (else the largest one)."""
+    if not original or not record or record.get("source") != original:
+        return original
+    sizes = record.get("sizes") or []
+    if not sizes:
+        return original
+    best = next((s for s in sizes if s.get("width", 0) >= width), sizes[-1])
+    return best.get(fmt if fmt in FORMATS else "webp") or original
+
+
+def pet_card(pet: Dict[str, Any], width: int = CARD_WIDTH, fmt: str = "webp"):
+    """``pet`` for list responses: coverImageUrl points at a derivative."""
+    out = dict(pet)
+    record = out.pop("coverImage", None)
+    out["coverImageUrl"] = pick(record, pet.get("coverImageUrl"), width, fmt)
+    return out
+
+
+def post_card(post: Dict[str, Any], width: int = CARD_WIDTH, fmt: str = "webp"):
+    out = dict(post)
+    records = {r.get("source"): r for r in out.pop("images", None) or [] if r}
+    out["imageUrls"] = [
+        pick(records.get(u), u, width, fmt) for u in post.get("imageUrls") or []
+    ]
+    return out
+
+
+# --------------------------
+# Background processing
+# --------------------------
+def _log_failure(future):
+    if future.exception() is not None:
+        print(f"[images] job failed: {future.exception()}")
+
+
+def _stored_error(e: Exception) -> str:
+    """
+    What a failure looks like on the pet document. Our own checks explain
+    themselves; network errors are reduced to a class or status, so the
+    record can't be used to probe what answers where.
+    """
+    if isinstance(e, ValueError):
+        return str(e)[:200]
+    resp = getattr(e, "response", None)
+    if resp is not None:
+        return f"source returned HTTP {resp.status_code}"
+    return f"failed: {type(e).__name__}"
+
+
+class ImagePipeline:
+    def __init__(self, db, storage, workers: int = WORKERS):
+        self.db = db
+        self.storage = storage
+        self._pool = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="images"
+        )
+        self._lock = threading.Lock()
+        self.stats = {"queued": 0, "processed": 0, "failed": 0, "stale": 0}
+
+    def _count(self, key: str, n: int = 1):
+        with self._lock:
+            self.stats[key] += n
+
+    def _derive(self, url: str) -> Dict[str, Any]:
+        try:
+            record = derive(self.storage, url)
+            self._count("processed")
+            return record
+        except Exception as e:
+            self._count("failed")
+            print(f"[images] {url}: {e}")
+            # recorded so list endpoints stop waiting on it; the backfill
+            # script retries records with no sizes
+            return {"source": url, "sizes": [], "error": _stored_error(e)}
+
+    def process_pet(self, pet_id: str, url: str):
+        record = self._derive(url)
+        ref = self.db.collection("pets").document(pet_id)
+        snap = ref.get()
+        if not snap.exists or (snap.to_dict() or {}).get("coverImageUrl") != url:
+            self._count("stale")
+            return
+        ref.set({"coverImage": record}, merge=True)
+
+    def process_post(self, post_id: str, urls: List[str], then=None):
+        records = [self._derive(u) for u in urls]
+        ref = self.db.collection("posts").document(post_id)
+        if not ref.get().exists:
+            self._count("stale")
+            return
+        ref.set({"images": records}, merge=True)
+        if then is not None:
+            then(records)
+
+    def _submit(self, fn, *args):
+        self._count("queued")
+        future = self._pool.submit(fn, *args)
+        future.add_done_callback(_log_failure)
+        return future
+
+    def submit_pet(self, pet_id: str, url: Optional[str]):
+        return self._submit(self.process_pet, pet_id, url) if url else None
+
+    def submit_post(self, post_id: str, urls: List[str], then=None):
+        """Process a post's images, then call ``then(records)``."""
+        return self._submit(self.process_post, post_id, list(urls), then)
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.stats)
+
+
+def needs_processing(record: Optional[Dict[str, Any]], url: Optional[str]) -> bool:
+    return bool(url) and (
+        not record or record.get("source") != url or not record.get("sizes")
+    )
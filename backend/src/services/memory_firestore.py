@@ -0,0 +1,482 @@
+"""In-memory stand-in for the Firestore client.
+
+Implements the slice of the ``google.cloud.firestore`` API this backend uses
+(documents, subcollections, simple queries, collection groups, batches,
+``get_all`` and snapshot listeners) on top of a dict, so the repository
+layer, benchmarks and the load-test harness can run without the real
+service. Reads and writes are counted the way Firestore bills them.
+"""
+
+import copy
+import itertools
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    from firebase_admin import firestore as _fs
+
+    SERVER_TIMESTAMP = _fs.SERVER_TIMESTAMP
+except Exception:  # firebase_admin not installed
+    SERVER_TIMESTAMP = object()
+
+
+class AlreadyExists(Exception):
+    pass
+
+
+class NotFound(Exception):
+    pass
+
+
+try:
+    from google.api_core import exceptions as _gexc
+
+    AlreadyExists = _gexc.AlreadyExists  # noqa: F811
+    NotFound = _gexc.NotFound  # noqa: F811
+except Exception:
+    pass
+
+
+_DESC = "DESCENDING"
+_tick = itertools.count()
+
+
+def _now():
+    # strictly increasing, so documents written back-to-back still order
+    return datetime.now(timezone.utc) + timedelta(microseconds=next(_tick) % 1000)
+
+
+def _transform(old: Any, value: Any) -> Any:
+    if value is SERVER_TIMESTAMP:
+        return _now()
+    kind = type(value).__name__
+    if kind == "Increment":
+        return (old or 0) + value.value
+    if kind == "ArrayUnion":
+        cur = list(old or [])
+        return cur + [v for v in value.values if v not in cur]
+    if kind == "ArrayRemove":
+        return [v for v in (old or []) if v not in value.values]
+    if kind == "Sentinel" and "DELETE" in repr(value).upper():
+        return _DELETE
+    return copy.deepcopy(value)
+
+
+_DELETE = object()
+
+
+def _merge(old: Optional[Dict[str, Any]], data: Dict[str, Any], merge: bool):
+    out = copy.deepcopy(old) if (merge and old) else {}
+    for key, value in data.items():
+        parts = key.split(".") if merge else [key]
+        node = out
+        for p in parts[:-1]:
+            if not isinstance(node.get(p), dict):
+                node[p] = {}
+            node = node[p]
+        if merge and isinstance(value, dict):
+            # nested maps merge field by field, so transforms inside them apply
+            prev = node.get(parts[-1])
+            node[parts[-1]] = _merge(
+                prev if isinstance(prev, dict) else None, value, True
+            )
+            continue
+        v = _transform(node.get(parts[-1]), value)
+        if v is _DELETE:
+            node.pop(parts[-1], None)
+        else:
+            node[parts[-1]] = v
+    return out
+
+
+def _field(data: Dict[str, Any], path: str) -> Any:
+    node: Any = data
+    for p in path.split("."):
+        if not isinstance(node, dict):
+            return None
+        node = node.get(p)
+    return node
+
+
+def _order_value(snap, field: str) -> Any:
+    # "__name__" (FieldPath.document_id()) orders by id within a collection
+    if field == "__name__":
+        return snap.id
+    return _field(snap._data or {}, field)
+
+
+def _sort_key(v: Any):
+    # Firestore orders mixed types by type first; None sorts lowest
+    if v is None:
+        return (0, 0)
+    if isinstance(v, bool):
+        return (1, v)
+    if isinstance(v, (int, float)):
+        return (2, v)
+    if isinstance(v, datetime):
+        return (3, v)
+    if isinstance(v, str):
+        return (4, v)
+    return (5, str(v))
+
+
+_OPS: Dict[str, Callable[[Any, Any], bool]] = {
+    "==": lambda a, b: a == b,
+    "!=": lambda a, b: a is not None and a != b,
+    "<": lambda a, b: a is not None and _sort_key(a) < _sort_key(b),
+    "<=": lambda a, b: a is not None and _sort_key(a) <= _sort_key(b),
+    ">": lambda a, b: a is not None and _sort_key(a) > _sort_key(b),
+    ">=": lambda a, b: a is not None and _sort_key(a) >= _sort_key(b),
+    "in": lambda a, b: a in b,
+    "not-in": lambda a, b: a is not None and a not in b,
+    "array_contains": lambda a, b: isinstance(a, list) and b in a,
+    "array_contains_any": lambda a, b: isinstance(a, list) and any(x in a for x in b),
+}
+
+
+class DocumentSnapshot:
+    def __init__(self, reference, data: Optional[Dict[str, Any]]):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+        self.exists = data is not None
+
+    def to_dict(self) -> Optional[Dict[str, Any]]:
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+    def get(self, field: str) -> Any:
+        return _field(self._data or {}, field)
+
+
+class DocumentReference:
+    def __init__(self, client: "MemoryFirestore", path: str):
+        self._client = client
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+
+    def __eq__(self, other):
+        return isinstance(other, DocumentReference) and other.path == self.path
+
+    def __hash__(self):
+        return hash(self.path)
+
+    @property
+    def parent(self) -> "CollectionReference":
+        return CollectionReference(self._client, self.path.rsplit("/", 1)[0])
+
+    def collection(self, name: str) -> "CollectionReference":
+        return CollectionReference(self._client, f"{self.path}/{name}")
+
+    def get(self, transaction=None) -> DocumentSnapshot:
+        return self._client._read(self)
+
+    def set(self, data: Dict[str, Any], merge: bool = False):
+        self._client._commit([("set", self, data, merge)])
+
+    def update(self, data: Dict[str, Any]):
+        self._client._commit([("update", self, data, True)])
+
+    def create(self, data: Dict[str, Any]):
+        self._client._commit([("create", self, data, False)])
+
+    def delete(self):
+        self._client._commit([("delete", self, None, False)])
+
+    def on_snapshot(self, callback):
+        return self._client._listen(
+            lambda path: path == self.path, callback, lambda: [self.get()]
+        )
+
+
+class Query:
+    def __init__(
+        self,
+        client: "MemoryFirestore",
+        path: str,
+        all_descendants: bool = False,
+        filters: Tuple = (),
+        orders: Tuple = (),
+        limit_: Optional[int] = None,
+        cursor: Optional[Tuple[str, Any]] = None,
+    ):
+        self._client = client
+        self._path = path
+        self._group = all_descendants
+        self._filters = filters
+        self._orders = orders
+        self._limit = limit_
+        self._cursor = cursor
+
+    def _copy(self, **kw) -> "Query":
+        args = dict(
+            filters=self._filters,
+            orders=self._orders,
+            limit_=self._limit,
+            cursor=self._cursor,
+        )
+        args.update(kw)
+        return Query(self._client, self._path, self._group, **args)
+
+    def where(self, field_path=None, op_string=None, value=None, filter=None):
+        if filter is not None:
+            field_path, op_string, value = (
+                filter.field_path,
+                filter.op_string,
+                filter.value,
+            )
+        if op_string not in _OPS:
+            raise ValueError(f"unsupported operator: {op_string}")
+        return self._copy(filters=self._filters + ((field_path, op_string, value),))
+
+    def order_by(self, field_path: str, direction: str = "ASCENDING"):
+        return self._copy(orders=self._orders + ((field_path, direction),))
+
+    def limit(self, count: int):
+        return self._copy(limit_=count)
+
+    def start_after(self, document_fields_or_snapshot):
+        return self._copy(cursor=("after", document_fields_or_snapshot))
+
+    def start_at(self, document_fields_or_snapshot):
+        return self._copy(cursor=("at", document_fields_or_snapshot))
+
+    def select(self, field_paths):
+        return self
+
+    def _matches_path(self, path: str) -> bool:
+        parent, _ = path.rsplit("/", 1)
+        if self._group:
+            return parent.rsplit("/", 1)[-1] == self._path
+        return parent == self._path
+
+    def _matches(self, path: str, data: Dict[str, Any]) -> bool:
+        if not self._matches_path(path):
+            return False
+        return all(_OPS[op](_field(data, f), v) for f, op, v in self._filters)
+
+    def _order_key(self, snap: DocumentSnapshot):
+        return [_sort_key(_order_value(snap, f)) for f, _ in self._orders]
+
+    def _run(self) -> List[DocumentSnapshot]:
+        with self._client._lock:
+            rows = [
+                DocumentSnapshot(DocumentReference(self._client, p), copy.deepcopy(d))
+                for p, d in self._client._docs.items()
+                if self._matches(p, d)
+            ]
+        rows.sort(key=lambda s: s.reference.path)
+        for f, direction in reversed(self._orders):
+            rows.sort(
+                key=lambda s: _sort_key(_order_value(s, f)),
+                reverse=(direction == _DESC),
+            )
+
+        if self._cursor and self._orders:
+            mode, at = self._cursor
+            if isinstance(at, DocumentSnapshot):
+                values = [_order_value(at, f) for f, _ in self._orders]
+            else:
+                values = [at.get(f) for f, _ in self._orders]
+                # "__name__" cursors may carry a reference or a bare id
+                values = [getattr(v, "id", v) for v in values]
+            cut = [_sort_key(v) for v in values]
+
+            def after(s):
+                key = self._order_key(s)
+                for (f, direction), k, c in zip(self._orders, key, cut):
+                    if k != c:
+                        return (k < c) if direction == _DESC else (k > c)
+                return mode == "at"
+
+            rows = [s for s in rows if after(s)]
+
+        if self._limit is not None:
+            rows = rows[: self._limit]
+        # Firestore bills at least one read per query
+        self._client.stats["reads"] += max(1, len(rows))
+        self._client.stats["queries"] += 1
+        return rows
+
+    def stream(self, transaction=None):
+        return iter(self._run())
+
+    def get(self, transaction=None) -> List[DocumentSnapshot]:
+        return self._run()
+
+    def on_snapshot(self, callback):
+        return self._client._listen(
+            lambda path: self._matches_path(path), callback, self._run
+        )
+
+
+class CollectionReference(Query):
+    def __init__(self, client: "MemoryFirestore", path: str):
+        super().__init__(client, path)
+        self.id = path.rsplit("/", 1)[-1]
+
+    def document(self, document_id: Optional[str] = None) -> DocumentReference:
+        return DocumentReference(
+            self._client, f"{self._path}/{document_id or uuid.uuid4().hex[:20]}"
+        )
+
+    def add(self, data: Dict[str, Any]):
+        ref = self.document()
+        ref.set(data)
+        return _now(), ref
+
+
+class WriteBatch:
+    def __init__(self, client: "MemoryFirestore"):
+        self._client = client
+        self._ops: List[Tuple[str, DocumentReference, Any, bool]] = []
+
+    def set(self, reference, document_data, merge=False):
+        self._ops.append(("set", reference, document_data, merge))
+
+    def update(self, reference, field_updates):
+        self._ops.append(("update", reference, field_updates, True))
+
+    def create(self, reference, document_data):
+        self._ops.append(("create", reference, document_data, False))
+
+    def delete(self, reference):
+        self._ops.append(("delete", reference, None, False))
+
+    def __len__(self):
+        return len(self._ops)
+
+    def commit(self):
+        if len(self._ops) > 500:
+            raise ValueError("maximum 500 writes allowed per request")
+        self._client._commit(self._ops)
+        self._ops = []
+
+
+class Transaction(WriteBatch):
+    def get(self, ref_or_query):
+        if isinstance(ref_or_query, DocumentReference):
+            return ref_or_query.get()
+        return ref_or_query.stream()
+
+
+class _Watch:
+    def __init__(self, client: "MemoryFirestore", token: int):
+        self._client = client
+        self._token = token
+
+    def unsubscribe(self):
+        with self._client._lock:
+            self._client._listeners.pop(self._token, None)
+
+
+class MemoryFirestore:
+    def __init__(self, data: Optional[Dict[str, Dict[str, Any]]] = None):
+        self._docs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.RLock()
+        self._listeners: Dict[int, Tuple[Callable, Callable, Callable]] = {}
+        self._listener_ids = itertools.count()
+        self.stats = {"reads": 0, "writes": 0, "commits": 0, "queries": 0}
+        for path, doc in (data or {}).items():
+            self._docs[path] = copy.deepcopy(doc)
+
+    # --- client surface ---
+    def collection(self, name: str) -> CollectionReference:
+        return CollectionReference(self, name)
+
+    def collection_group(self, collection_id: str) -> Query:
+        return Query(self, collection_id, all_descendants=True)
+
+    def document(self, path: str) -> DocumentReference:
+        return DocumentReference(self, path)
+
+    def batch(self) -> WriteBatch:
+        return WriteBatch(self)
+
+    def transaction(self, **kwargs) -> Transaction:
+        return Transaction(self)
+
+    def run_transaction(self, fn):
+        # the client lock makes the whole read-modify-write serializable
+        with self._lock:
+            transaction = Transaction(self)
+            result = fn(transaction)
+            transaction.commit()
+            return result
+
+    def get_all(self, references, field_paths=None, transaction=None):
+        for ref in references:
+            yield self._read(ref)
+
+    # --- helpers for tests/benchmarks ---
+    def dump(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return copy.deepcopy(self._docs)
+
+    def reset_stats(self):
+        for k in self.stats:
+            self.stats[k] = 0
+
+    # --- internals ---
+    def _read(self, ref: DocumentReference) -> DocumentSnapshot:
+        with self._lock:
+            data = copy.deepcopy(self._docs.get(ref.path))
+            self.stats["reads"] += 1
+        return DocumentSnapshot(ref, data)
+
+    def _commit(self, ops):
+        staged: Dict[str, Optional[Dict[str, Any]]] = {}
+        kinds: Dict[str, str] = {}
+        with self._lock:
+            for op, ref, data, merge in ops:
+                old = (
+                    staged[ref.path] if ref.path in staged else self._docs.get(ref.path)
+                )
+                if op == "create" and old is not None:
+                    raise AlreadyExists(f"document already exists: {ref.path}")
+                if op == "update" and old is None:
+                    raise NotFound(f"no document to update: {ref.path}")
+                if ref.path not in kinds:
+                    kinds[ref.path] = "MODIFIED" if old is not None else "ADDED"
+                staged[ref.path] = None if op == "delete" else _merge(old, data, merge)
+            for path, doc in staged.items():
+                if doc is None:
+                    self._docs.pop(path, None)
+                    kinds[path] = "REMOVED"
+                else:
+                    self._docs[path] = doc
+            self.stats["writes"] += len(ops)
+            self.stats["commits"] += 1
+            listeners = list(self._listeners.values())
+        for matches, callback, snapshot in listeners:
+            hits = [p for p in staged if matches(p)]
+            if hits:
+                self._notify(callback, snapshot, [(p, kinds[p]) for p in hits])
+
+    def _notify(self, callback, snapshot, paths):
+        docs = snapshot()
+        changes = [_Change(self, p, kind) for p, kind in paths]
+        callback(docs, changes, _now())
+
+    def _listen(self, matches, callback, snapshot):
+        with self._lock:
+            token = next(self._listener_ids)
+            self._listeners[token] = (matches, callback, snapshot)
+        callback(snapshot(), [], _now())
+        return _Watch(self, token)
+
+
+class _Change:
+    """Mirrors google.cloud.firestore's DocumentChange (type.name, document)."""
+
+    class _Type:
+        def __init__(self, name):
+            self.name = name
+
+    def __init__(self, client: MemoryFirestore, path: str, kind: str):
+        ref = DocumentReference(client, path)
+        with client._lock:
+            data = copy.deepcopy(client._docs.get(path))
+        self.document = DocumentSnapshot(ref, data)
+        self.type = self._Type(kind)
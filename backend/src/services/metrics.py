@@ -0,0 +1,299 @@
+"""Process-local request and dependency metrics in Prometheus text format.
+
+Recording takes no lock. Each thread adds into its own shard (a plain dict
+keyed by metric and label values), and a scrape sums the shards. Shards of
+threads that have exited are folded into one retired shard, so servers
+that start a thread per request don't grow without bound.
+
+    GET /api/metrics    # both Flask apps; the ASGI mode adds its native routes
+
+Recorded per route: request count by status, latency histogram, and the
+Firestore document reads, writes and round trips counted by the request's
+Repository. Recorded per outbound dependency (ip-api, overpass, scrape,
+images, gemini, elevenlabs): call count by outcome and latency histogram.
+Every worker process keeps its own numbers; scrape each one, or sum them
+in the query.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DEPENDENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# fold exited threads' shards after this many new ones
+RETIRE_EVERY = 64
+
+_Key = Tuple[str, Tuple[str, ...]]
+
+
+# --------------------------
+# Per-thread shards
+# --------------------------
+class _Shards:
+    def __init__(self):
+        self._tls = threading.local()
+        self._live: List[Tuple[threading.Thread, Dict]] = []
+        self._retired: Dict[_Key, object] = {}
+        self._lock = threading.Lock()
+        self._created = 0
+
+    def mine(self) -> Dict:
+        try:
+            return self._tls.shard
+        except AttributeError:
+            shard: Dict = {}
+            self._tls.shard = shard
+            with self._lock:
+                self._live.append((threading.current_thread(), shard))
+                self._created += 1
+                if self._created % RETIRE_EVERY == 0:
+                    self._retire()
+            return shard
+
+    def _retire(self):
+        """Move shards of exited threads into the retired shard (lock held)."""
+        alive = []
+        for thread, shard in self._live:
+            if thread.is_alive():
+                alive.append((thread, shard))
+            else:
+                _merge_into(self._retired, shard)
+        self._live = alive
+
+    def snapshot(self) -> Dict[_Key, object]:
+        with self._lock:
+            self._retire()
+            total: Dict[_Key, object] = {}
+            _merge_into(total, self._retired)
+            shards = [s for _, s in self._live]
+        for shard in shards:
+            _merge_into(total, shard)
+        return total
+
+
+def _merge_into(total: Dict, shard: Dict):
+    # list() copies in one step, so a thread adding a key meanwhile is harmless
+    for key, value in list(shard.items()):
+        if isinstance(value, list):
+            cur = total.get(key)
+            if cur is None:
+                total[key] = list(value)
+            else:
+                for i, v in enumerate(value):
+                    cur[i] += v
+        else:
+            total[key] = total.get(key, 0) + value
+
+
+_shards = _Shards()
+
+
+# --------------------------
+# Metric types
+# --------------------------
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help_: str, labels: Tuple[str, ...]):
+        self.name, self.help, self.labels = name, help_, labels
+
+    def inc(self, values: Tuple[str, ...], amount: float = 1):
+        shard = _shards.mine()
+        key = (self.name, values)
+        shard[key] = shard.get(key, 0) + amount
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, help_: str, labels: Tuple[str, ...], buckets: Tuple[float, ...]
+    ):
+        self.name, self.help, self.labels, self.buckets = name, help_, labels, buckets
+
+    def observe(self, values: Tuple[str, ...], seconds: float):
+        shard = _shards.mine()
+        key = (self.name, values)
+        # per-bucket counts (not cumulative), then +Inf, sum and count
+        cell = shard.get(key)
+        if cell is None:
+            cell = shard[key] = [0] * (len(self.buckets) + 3)
+        i = 0
+        for bound in self.buckets:
+            if seconds <= bound:
+                break
+            i += 1
+        cell[i] += 1
+        cell[-2] += seconds
+        cell[-1] += 1
+
+
+_registry: Dict[str, object] = {}
+
+
+def counter(name: str, help_: str, labels: Iterable[str]) -> Counter:
+    return _registry.setdefault(name, Counter(name, help_, tuple(labels)))
+
+
+def histogram(
+    name: str, help_: str, labels: Iterable[str], buckets: Tuple[float, ...]
+) -> Histogram:
+    return _registry.setdefault(name, Histogram(name, help_, tuple(labels), buckets))
+
+
+REQUESTS = counter(
+    "http_requests_total",
+    "HTTP requests handled, by route and status.",
+    ("app", "route", "method", "status"),
+)
+REQUEST_SECONDS = histogram(
+    "http_request_duration_seconds",
+    "Time to produce a response (to the first byte for streams).",
+    ("app", "route", "method"),
+    REQUEST_BUCKETS,
+)
+FIRESTORE_READS = counter(
+    "firestore_document_reads_total",
+    "Firestore documents read by requests, by route.",
+    ("app", "route"),
+)
+FIRESTORE_WRITES = counter(
+    "firestore_document_writes_total",
+    "Firestore documents written by requests, by route.",
+    ("app", "route"),
+)
+FIRESTORE_ROUND_TRIPS = counter(
+    "firestore_round_trips_total",
+    "Firestore RPCs made by requests, by route.",
+    ("app", "route"),
+)
+DEPENDENCY_CALLS = counter(
+    "dependency_requests_total",
+    "Outbound calls, by dependency and outcome (HTTP status or error type).",
+    ("dependency", "outcome"),
+)
+DEPENDENCY_SECONDS = histogram(
+    "dependency_request_duration_seconds",
+    "Outbound call latency, by dependency.",
+    ("dependency",),
+    DEPENDENCY_BUCKETS,
+)
+
+
+# --------------------------
+# Recording helpers
+# --------------------------
+def observe_request(
+    app: str,
+    route: str,
+    method: str,
+    status: int,
+    seconds: float,
+    repo_stats: Optional[Dict[str, int]] = None,
+):
+    REQUESTS.inc((app, route, method, str(status)))
+    REQUEST_SECONDS.observe((app, route, method), seconds)
+    if repo_stats:
+        FIRESTORE_READS.inc((app, route), repo_stats.get("reads", 0))
+        FIRESTORE_WRITES.inc((app, route), repo_stats.get("writes", 0))
+        FIRESTORE_ROUND_TRIPS.inc((app, route), repo_stats.get("roundTrips", 0))
+
+
+def observe_dependency(name: str, seconds: float, outcome: str):
+    DEPENDENCY_CALLS.inc((name, outcome))
+    DEPENDENCY_SECONDS.observe((name,), seconds)
+
+
+@contextmanager
+def dependency(name: str):
+    """Time an SDK call: ``with metrics.dependency("gemini"): ...``."""
+    started = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except BaseException as e:
+        outcome = type(e).__name__
+        raise
+    finally:
+        observe_dependency(name, time.perf_counter() - started, outcome)
+
+
+def instrument_flask(app, name: str):
+    """Record every request of ``app`` and serve GET /api/metrics."""
+    from flask import Response, g, request
+
+    @app.before_request
+    def _metrics_start():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def _metrics_record(response):
+        started = g.get("metrics_started")
+        if started is not None:
+            rule = request.url_rule.rule if request.url_rule else "<unmatched>"
+            repo = g.get("repo")
+            observe_request(
+                name,
+                rule,
+                request.method,
+                response.status_code,
+                time.perf_counter() - started,
+                repo.stats if repo is not None else None,
+            )
+        return response
+
+    @app.get("/api/metrics")
+    def metrics_endpoint():
+        return Response(render(), content_type=CONTENT_TYPE)
+
+    return app
+
+
+# --------------------------
+# Exposition
+# --------------------------
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _num(v: float) -> str:
+    return str(int(v)) if float(v).is_integer() else repr(float(v))
+
+
+def render() -> str:
+    data = _shards.snapshot()
+    by_metric: Dict[str, List[Tuple[Tuple[str, ...], object]]] = {}
+    for (name, values), value in data.items():
+        by_metric.setdefault(name, []).append((values, value))
+
+    lines = []
+    for name, metric in _registry.items():
+        lines.append(f"# HELP {name} {metric.help}")
+        lines.append(f"# TYPE {name} {metric.kind}")
+        for values, value in sorted(by_metric.get(name, ())):
+            if metric.kind == "counter":
+                lines.append(f"{name}{_labels(metric.labels, values)} {_num(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(metric.buckets + ("+Inf",), value):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(
+                    f"{name}_bucket{_labels(metric.labels, values, le)} {cumulative}"
+                )
+            lines.append(
+                f"{name}_sum{_labels(metric.labels, values)} {_num(value[-2])}"
+            )
+            lines.append(f"{name}_count{_labels(metric.labels, values)} {value[-1]}")
+    return "\n".join(lines) + "\n"
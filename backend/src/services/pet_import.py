@@ -0,0 +1,235 @@
+"""Bulk pet import for shelters.
+
+Rows are streamed from a CSV or NDJSON upload, validated with the same
+``build_pet_doc`` used by ``POST /api/pets``, and committed in chunked write
+batches. Each row is keyed by ``externalId`` so re-running an import updates
+the same pet documents instead of creating duplicates. A re-run only
+overwrites the optional fields (status, city, cover image) that the row
+actually supplies.
+
+Background jobs keep their progress in ``importJobs/{id}``, so any worker
+can answer a status poll.
+"""
+
+import csv
+import hashlib
+import io
+import json
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from services import counters
+from services.firestore_batch import BATCH_LIMIT, commit_in_chunks
+
+IMPORT_SYNC_MAX_BYTES = 256 * 1024
+MAX_ROW_ERRORS = 500
+JOBS_COLLECTION = "importJobs"
+# pet fields build_doc fills with a default when the row leaves them out
+OPTIONAL_FIELDS = ("status", "locationCity", "coverImageUrl")
+
+_FORMATS = {
+    "csv": "csv",
+    "text/csv": "csv",
+    "ndjson": "ndjson",
+    "jsonl": "ndjson",
+    "application/x-ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+}
+
+
+def detect_format(explicit: Optional[str], mimetype: Optional[str]) -> Optional[str]:
+    return _FORMATS.get((explicit or "").lower()) or _FORMATS.get(
+        (mimetype or "").lower()
+    )
+
+
+def external_doc_id(shelter_id: str, external_id: str) -> str:
+    h = hashlib.sha1(f"{shelter_id}:{external_id}".encode("utf-8")).hexdigest()
+    return f"imp_{h[:24]}"
+
+
+def iter_rows(stream, fmt: str) -> Iterator[Tuple[int, Any]]:
+    """Yield ``(line_no, row)``; a row is a dict or an Exception for bad input."""
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, {
+                k.strip(): v for k, v in row.items() if k is not None
+            }
+        return
+
+    for line_no, line in enumerate(text, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_no, ValueError(f"invalid json: {e}")
+            continue
+        if not isinstance(row, dict):
+            row = ValueError("row must be a json object")
+        yield line_no, row
+
+
+class ImportJob:
+    def __init__(self, shelter_id: str, fmt: str, db=None):
+        # with a db, progress is saved to importJobs/{id} as the job runs
+        self.db = db
+        self.id = uuid.uuid4().hex
+        self.shelter_id = shelter_id
+        self.format = fmt
+        self.state = "queued"
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.failed = 0
+        self.errors: List[Dict[str, Any]] = []
+        self.detail: Optional[str] = None
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def add_error(self, line: int, external_id: Optional[str], message: str):
+        with self._lock:
+            self.failed += 1
+            if len(self.errors) < MAX_ROW_ERRORS:
+                self.errors.append(
+                    {"line": line, "externalId": external_id, "error": message}
+                )
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "id": self.id,
+                "shelterId": self.shelter_id,
+                "state": self.state,
+                "format": self.format,
+                "rows": self.rows,
+                "created": self.created,
+                "updated": self.updated,
+                "failed": self.failed,
+                "errors": list(self.errors),
+                "errorsTruncated": self.failed > len(self.errors),
+                "detail": self.detail,
+                "startedAt": self.started_at,
+                "finishedAt": self.finished_at,
+            }
+
+    def save(self):
+        if self.db is not None:
+            self.db.collection(JOBS_COLLECTION).document(self.id).set(self.to_dict())
+
+
+def _update_fields(doc: Dict[str, Any], row: Dict[str, Any]) -> Dict[str, Any]:
+    """The part of a built doc that may overwrite an existing pet."""
+    skip = {"createdAt"}
+    skip.update(f for f in OPTIONAL_FIELDS if row.get(f) in (None, ""))
+    return {k: v for k, v in doc.items() if k not in skip}
+
+
+Pending = List[Tuple[str, Dict[str, Any], Dict[str, Any]]]
+
+
+def _flush(db, job: ImportJob, pending: Pending):
+    refs = [db.collection("pets").document(doc_id) for doc_id, _, _ in pending]
+    existing = {s.id: s.to_dict() or {} for s in db.get_all(refs) if s.exists}
+
+    writes = []
+    transitions = []
+    for ref, (doc_id, doc, row) in zip(refs, pending):
+        old_status = None
+        if doc_id in existing:
+            doc = _update_fields(doc, row)
+            old_status = existing[doc_id].get("status")
+        writes.append((ref, doc, True))
+        new_status = doc.get("status", old_status)
+        transitions.append(("pets", job.shelter_id, old_status, new_status))
+    writes.extend(counters.counter_writes(db, transitions))
+    commit_in_chunks(db, writes)
+
+    with job._lock:
+        job.updated += len(existing)
+        job.created += len(pending) - len(existing)
+    job.save()
+
+
+def run_import(
+    db,
+    job: ImportJob,
+    stream,
+    build_doc: Callable[[Dict[str, Any], str], Dict[str, Any]],
+):
+    job.state = "running"
+    job.save()
+    pending: Pending = []
+    seen = set()
+    try:
+        for line_no, row in iter_rows(stream, job.format):
+            with job._lock:
+                job.rows += 1
+            if isinstance(row, Exception):
+                job.add_error(line_no, None, str(row))
+                continue
+
+            external_id = str(row.get("externalId") or "").strip()
+            if not external_id:
+                job.add_error(line_no, None, "missing field: externalId")
+                continue
+            if external_id in seen:
+                job.add_error(line_no, external_id, "duplicate externalId in upload")
+                continue
+
+            try:
+                doc = build_doc(row, job.shelter_id)
+            except ValueError as e:
+                job.add_error(line_no, external_id, str(e))
+                continue
+
+            seen.add(external_id)
+            doc["externalId"] = external_id
+            doc_id = external_doc_id(job.shelter_id, external_id)
+            pending.append((doc_id, doc, row))
+            if len(pending) >= BATCH_LIMIT:
+                _flush(db, job, pending)
+                pending = []
+
+        if pending:
+            _flush(db, job, pending)
+        job.state = "done"
+    except Exception as e:
+        job.state = "failed"
+        job.detail = str(e)
+    finally:
+        job.finished_at = time.time()
+        try:
+            job.save()
+        except Exception as e:
+            print(f"[pet-import] could not save job {job.id}: {e}")
+
+
+def get_job(db, job_id: str) -> Optional[Dict[str, Any]]:
+    snap = db.collection(JOBS_COLLECTION).document(job_id).get()
+    return snap.to_dict() if snap.exists else None
+
+
+def start_background_import(db, shelter_id: str, fmt: str, stream, build_doc):
+    # the request body is gone once we respond, so spool it first
+    spool = tempfile.SpooledTemporaryFile(max_size=IMPORT_SYNC_MAX_BYTES * 4)
+    shutil.copyfileobj(stream, spool)
+    spool.seek(0)
+
+    job = ImportJob(shelter_id, fmt, db)
+    job.save()
+
+    def _run():
+        with spool:
+            run_import(db, job, spool, build_doc)
+
+    threading.Thread(target=_run, name=f"pet-import-{job.id}", daemon=True).start()
+    return job
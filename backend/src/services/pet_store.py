@@ -0,0 +1,227 @@
+"""In-process mirror of the pets collection.
+
+The store subscribes to ``pets`` (optionally restricted to a set of
+statuses) with ``on_snapshot`` and keeps every matching pet in memory along
+with secondary indexes by shelter, city, breed and status. Read endpoints
+can then filter and rank without touching Firestore. Until the first
+snapshot arrives, or if the listener dies, ``ready`` is False and callers
+fall back to querying Firestore.
+"""
+
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+INDEXED_FIELDS = ("shelterId", "locationCity", "breed", "status")
+
+_OLDEST = datetime.min.replace(tzinfo=timezone.utc)
+
+
+def _created_key(p: Dict[str, Any]):
+    ts = p.get("createdAt")
+    if isinstance(ts, datetime):
+        return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+    return _OLDEST
+
+
+class PetStore:
+    def __init__(
+        self,
+        db,
+        statuses: Optional[Iterable[str]] = None,
+        resync_seconds: float = 3600.0,
+    ):
+        self.db = db
+        self.statuses = sorted(set(statuses)) if statuses else None
+        self.resync_seconds = resync_seconds
+        self._pets: Dict[str, Dict[str, Any]] = {}
+        self._index: Dict[str, Dict[Any, Set[str]]] = {f: {} for f in INDEXED_FIELDS}
+        self._lock = threading.RLock()
+        self._watch = None
+        self._started = False
+        self._resyncing = False
+        self._listeners: List[Any] = []
+        self.ready = False
+        self.stats = {
+            "events": 0,
+            "changes": 0,
+            "resyncs": 0,
+            "errors": 0,
+            "loadedAt": None,
+            "lastEventAt": None,
+            "lastReadTime": None,
+        }
+
+    # --- lifecycle ---
+    def _query(self):
+        q = self.db.collection("pets")
+        if self.statuses:
+            q = q.where("status", "in", self.statuses)
+        return q
+
+    def ensure_started(self):
+        if self._started:
+            self._maybe_resync()
+            return
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        self._subscribe()
+
+    def _subscribe(self):
+        try:
+            self._watch = self._query().on_snapshot(self._on_snapshot)
+        except Exception as e:
+            self.stats["errors"] += 1
+            self.ready = False
+            print(f"[pet-store] listen failed: {e}")
+
+    def _maybe_resync(self):
+        loaded = self.stats["loadedAt"]
+        if loaded and time.time() - loaded > self.resync_seconds:
+            self.resync(if_older_than=self.resync_seconds)
+
+    def resync(self, if_older_than: Optional[float] = None):
+        """Drop the listener and rebuild from a fresh initial snapshot.
+
+        Only one resync runs at a time; concurrent callers return at once.
+        With ``if_older_than``, the staleness check is repeated under the lock.
+        """
+        with self._lock:
+            if self._resyncing:
+                return
+            loaded = self.stats["loadedAt"]
+            if if_older_than is not None and (
+                not loaded or time.time() - loaded <= if_older_than
+            ):
+                return
+            self._resyncing = True
+            watch, self._watch = self._watch, None
+            self.ready = False
+            self.stats["resyncs"] += 1
+            self.stats["loadedAt"] = time.time()
+        try:
+            if watch is not None:
+                try:
+                    watch.unsubscribe()
+                except Exception:
+                    pass
+            self._subscribe()
+        finally:
+            with self._lock:
+                self._resyncing = False
+
+    def stop(self):
+        if self._watch is not None:
+            self._watch.unsubscribe()
+            self._watch = None
+        self.ready = False
+
+    def subscribe(self, callback):
+        """``callback(kind, pet_id, before, after)`` for every applied change."""
+        self._listeners.append(callback)
+
+    # --- snapshot handling ---
+    def _on_snapshot(self, docs, changes, read_time):
+        try:
+            with self._lock:
+                self.stats["events"] += 1
+                self.stats["lastEventAt"] = time.time()
+                self.stats["lastReadTime"] = str(read_time) if read_time else None
+                if not self.ready:
+                    self._rebuild(docs)
+                    self.ready = True
+                    self.stats["loadedAt"] = time.time()
+                    return
+                for change in changes:
+                    self._apply(change.type.name, change.document)
+        except Exception as e:
+            self.stats["errors"] += 1
+            self.ready = False
+            print(f"[pet-store] snapshot handling failed: {e}")
+
+    def _rebuild(self, docs):
+        old = self._pets
+        self._pets = {}
+        self._index = {f: {} for f in INDEXED_FIELDS}
+        for snap in docs:
+            self._put(snap.id, snap.to_dict() or {})
+        for cb in self._listeners:
+            cb("RESET", None, old, self._pets)
+
+    def _apply(self, kind: str, snap):
+        self.stats["changes"] += 1
+        before = self._pets.get(snap.id)
+        if before is not None:
+            self._remove(snap.id)
+        after = None
+        if kind != "REMOVED":
+            after = self._put(snap.id, snap.to_dict() or {})
+        for cb in self._listeners:
+            cb(kind, snap.id, before, after)
+
+    def _put(self, pet_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        data["id"] = pet_id
+        self._pets[pet_id] = data
+        for f in INDEXED_FIELDS:
+            self._index[f].setdefault(data.get(f), set()).add(pet_id)
+        return data
+
+    def _remove(self, pet_id: str):
+        data = self._pets.pop(pet_id, None) or {}
+        for f in INDEXED_FIELDS:
+            ids = self._index[f].get(data.get(f))
+            if ids is not None:
+                ids.discard(pet_id)
+                if not ids:
+                    del self._index[f][data.get(f)]
+
+    # --- reads ---
+    def covers(self, status: Optional[str]) -> bool:
+        if self.statuses is None:
+            return True
+        return status is not None and status in self.statuses
+
+    def get(self, pet_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            p = self._pets.get(pet_id)
+            return dict(p) if p is not None else None
+
+    def find(
+        self,
+        limit: Optional[int] = None,
+        newest_first: bool = False,
+        **filters: Any,
+    ) -> List[Dict[str, Any]]:
+        """Equality filters on INDEXED_FIELDS, e.g. ``find(status="adoptable")``."""
+        with self._lock:
+            ids: Optional[Set[str]] = None
+            for field, value in filters.items():
+                if value is None:
+                    continue
+                if field not in self._index:
+                    raise KeyError(f"not an indexed field: {field}")
+                hits = self._index[field].get(value, set())
+                ids = set(hits) if ids is None else ids & hits
+                if not ids:
+                    return []
+            pets = [dict(self._pets[i]) for i in (self._pets if ids is None else ids)]
+        if newest_first:
+            pets.sort(key=_created_key, reverse=True)
+        return pets[:limit] if limit is not None else pets
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            last = self.stats["lastEventAt"]
+            return {
+                "ready": self.ready,
+                "pets": len(self._pets),
+                "statuses": self.statuses,
+                "secondsSinceLastEvent": (
+                    round(time.time() - last, 3) if last else None
+                ),
+                "indexSizes": {f: len(v) for f, v in self._index.items()},
+                **self.stats,
+            }
@@ -0,0 +1,256 @@
+"""On-demand stack-sampling profiles of live requests.
+
+A request is profiled when it carries ``X-Profile-Token: <PROFILE_TOKEN>``,
+or when it falls in the ``PROFILE_SAMPLE_RATE`` fraction of traffic. With
+neither set, the hook returns before touching the request.
+
+One sampler thread reads ``sys._current_frames()`` every
+``PROFILE_INTERVAL_MS`` and counts the stacks of the threads that are
+handling profiled requests. So concurrent profiles share one thread, and
+the handler runs without a tracing hook. When the request finishes, its
+stacks are written in collapsed format ("a;b;c 12" per line), which
+flamegraph.pl, speedscope and inferno read directly:
+
+    GET /api/profiles          # newest first, with route, status and timings
+    GET /api/profiles/<id>     # the collapsed stacks
+
+Both need the token. Profiles go to a bounded ring in ``PROFILE_DIR``:
+the oldest are deleted once there are more than ``PROFILE_RING_SIZE``
+files or ``PROFILE_RING_BYTES`` bytes. Native ASGI routes run on the event
+loop thread, where one thread's stack mixes many requests, so they are not
+profiled. Routes that fall through to Flask are.
+"""
+
+import hmac
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN", "")
+SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0"))
+INTERVAL = float(os.environ.get("PROFILE_INTERVAL_MS", "5")) / 1000
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "/tmp/instanimals-profiles")
+RING_SIZE = int(os.environ.get("PROFILE_RING_SIZE", "200"))
+RING_BYTES = int(os.environ.get("PROFILE_RING_BYTES", str(50 * 1024 * 1024)))
+# deeper stacks are cut at the root end
+MAX_DEPTH = 128
+
+TOKEN_HEADER = "X-Profile-Token"
+_ID = re.compile(r"^[0-9]{8}T[0-9]{12}-[0-9a-f]{8}$")
+
+
+# --------------------------
+# Sampler
+# --------------------------
+def _frame_label(code) -> str:
+    path = code.co_filename.replace("\\", "/")
+    short = "/".join(path.rsplit("/", 2)[-2:])
+    return f"{code.co_name} ({short}:{code.co_firstlineno})".replace(";", ",")
+
+
+def _collapse(frame) -> str:
+    names: List[str] = []
+    while frame is not None and len(names) < MAX_DEPTH:
+        names.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class Sampler:
+    """Samples the stacks of registered threads from one background thread."""
+
+    def __init__(self, interval: float = INTERVAL):
+        self.interval = interval
+        self._targets: Dict[int, Counter] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, ident: int):
+        with self._lock:
+            self._targets[ident] = Counter()
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="profile-sampler", daemon=True
+                )
+                self._thread.start()
+            self._wake.notify()
+
+    def stop(self, ident: int) -> Counter:
+        with self._lock:
+            return self._targets.pop(ident, Counter())
+
+    def _run(self):
+        me = threading.get_ident()
+        while True:
+            with self._lock:
+                while not self._targets:
+                    self._wake.wait()
+                targets = dict(self._targets)
+            frames = sys._current_frames()
+            for ident, counts in targets.items():
+                frame = frames.get(ident)
+                if frame is not None and ident != me:
+                    counts[_collapse(frame)] += 1
+            del frames
+            time.sleep(self.interval)
+
+
+# --------------------------
+# On-disk ring
+# --------------------------
+class ProfileRing:
+    """``<id>.folded`` stacks plus ``<id>.json`` metadata, oldest evicted."""
+
+    def __init__(
+        self,
+        root: str = PROFILE_DIR,
+        size: int = RING_SIZE,
+        max_bytes: int = RING_BYTES,
+    ):
+        self.root = Path(root)
+        self.size = size
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def save(self, stacks: Counter, meta: Dict[str, Any]) -> str:
+        now = datetime.now(timezone.utc)
+        # sortable by name: microsecond timestamp, then a random suffix
+        pid = f"{now:%Y%m%dT%H%M%S%f}-{uuid.uuid4().hex[:8]}"
+        folded = "".join(f"{stack} {n}\n" for stack, n in stacks.most_common())
+        meta = {
+            **meta,
+            "id": pid,
+            "createdAt": now.isoformat(),
+            "samples": sum(stacks.values()),
+            "bytes": len(folded.encode("utf-8")),
+        }
+        with self._lock:
+            self.root.mkdir(parents=True, exist_ok=True)
+            (self.root / f"{pid}.folded").write_text(folded, encoding="utf-8")
+            (self.root / f"{pid}.json").write_text(json.dumps(meta), encoding="utf-8")
+            self._evict()
+        return pid
+
+    def _evict(self):
+        metas = sorted(self.root.glob("*.json"))
+        total = sum(_size(self.root / f"{m.stem}.folded") for m in metas)
+        while metas and (len(metas) > self.size or total > self.max_bytes):
+            oldest = metas.pop(0)
+            total -= _size(self.root / f"{oldest.stem}.folded")
+            for path in (oldest, self.root / f"{oldest.stem}.folded"):
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+
+    def list(self, limit: int = 100) -> List[Dict[str, Any]]:
+        out = []
+        for path in sorted(self.root.glob("*.json"), reverse=True)[:limit]:
+            try:
+                out.append(json.loads(path.read_text(encoding="utf-8")))
+            except (OSError, ValueError):
+                continue  # evicted or half-written meanwhile
+        return out
+
+    def read(self, pid: str) -> Optional[str]:
+        if not _ID.match(pid):
+            return None
+        try:
+            return (self.root / f"{pid}.folded").read_text(encoding="utf-8")
+        except FileNotFoundError:
+            return None
+
+
+def _size(path: Path) -> int:
+    try:
+        return path.stat().st_size
+    except FileNotFoundError:
+        return 0
+
+
+sampler = Sampler()
+ring = ProfileRing()
+
+
+def authorized(token: Optional[str]) -> bool:
+    return bool(PROFILE_TOKEN) and hmac.compare_digest(
+        (token or "").encode("utf-8"), PROFILE_TOKEN.encode("utf-8")
+    )
+
+
+# --------------------------
+# Flask hook
+# --------------------------
+def install_flask(app, name: str):
+    """Profile requests of ``app`` on demand and serve the profile listing."""
+    from flask import Response, g, jsonify, request
+
+    enabled = bool(PROFILE_TOKEN) or SAMPLE_RATE > 0
+
+    @app.before_request
+    def _profile_start():
+        if not enabled:
+            return
+        if request.path.startswith("/api/profiles"):
+            return
+        requested = TOKEN_HEADER in request.headers
+        if requested and not authorized(request.headers.get(TOKEN_HEADER)):
+            return
+        if requested or random.random() < SAMPLE_RATE:
+            g.profile = (threading.get_ident(), time.perf_counter(), requested)
+            sampler.start(threading.get_ident())
+
+    @app.after_request
+    def _profile_stop(response):
+        started = g.pop("profile", None)
+        if started is None:
+            return response
+        ident, t0, requested = started
+        stacks = sampler.stop(ident)
+        try:
+            pid = ring.save(
+                stacks,
+                {
+                    "app": name,
+                    "route": request.url_rule.rule if request.url_rule else None,
+                    "method": request.method,
+                    "path": request.path,
+                    "status": response.status_code,
+                    "durationMs": round((time.perf_counter() - t0) * 1000, 2),
+                    "trigger": "header" if requested else "sampled",
+                },
+            )
+        except OSError as e:
+            print(f"[profiling] could not store profile: {e}")
+            return response
+        if requested:
+            response.headers["X-Profile-Id"] = pid
+        return response
+
+    @app.get("/api/profiles")
+    def list_profiles():
+        if not authorized(request.headers.get(TOKEN_HEADER)):
+            return jsonify({"error": f"{TOKEN_HEADER} required"}), 403
+        limit = min(int(request.args.get("limit", 100)), 1000)
+        return jsonify({"ok": True, "profiles": ring.list(limit)})
+
+    @app.get("/api/profiles/<pid>")
+    def get_profile(pid: str):
+        if not authorized(request.headers.get(TOKEN_HEADER)):
+            return jsonify({"error": f"{TOKEN_HEADER} required"}), 403
+        folded = ring.read(pid)
+        if folded is None:
+            return jsonify({"error": "profile not found"}), 404
+        return Response(folded, mimetype="text/plain")
+
+    return app
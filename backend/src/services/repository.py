@@ -0,0 +1,189 @@
+"""Per-request data access.
+
+Handlers go through a ``Repository`` instead of calling the Firestore client
+directly. Within one request it
+
+* keeps an identity map, so each document is fetched at most once (query
+  results seed the map too),
+* coalesces independent gets: ``load()`` returns a deferred handle and the
+  first one to be resolved fetches every pending document in one
+  ``get_all``,
+* counts document reads, writes and round trips.
+
+The repository also quacks like the client (``collection``, ``batch``,
+``get_all``), so helpers such as ``commit_in_chunks`` accept either.
+"""
+
+from typing import Any, Dict, Iterable, List, Optional
+
+from flask import g
+
+from services.firestore_batch import run_transaction
+
+
+class Deferred:
+    def __init__(self, repo: "Repository", ref):
+        self._repo = repo
+        self.ref = ref
+
+    def result(self):
+        return self._repo._resolve(self.ref)
+
+    @property
+    def exists(self) -> bool:
+        return self.result().exists
+
+    def to_dict(self) -> Optional[Dict[str, Any]]:
+        return self.result().to_dict()
+
+
+class RepoBatch:
+    def __init__(self, repo: "Repository"):
+        self._repo = repo
+        self._batch = repo.db.batch()
+        self._paths: List[str] = []
+
+    def _track(self, ref):
+        self._paths.append(ref.path)
+
+    def set(self, ref, data, merge=False):
+        self._track(ref)
+        self._batch.set(ref, data, merge=merge)
+
+    def update(self, ref, data):
+        self._track(ref)
+        self._batch.update(ref, data)
+
+    def create(self, ref, data):
+        self._track(ref)
+        self._batch.create(ref, data)
+
+    def delete(self, ref):
+        self._track(ref)
+        self._batch.delete(ref)
+
+    def commit(self):
+        try:
+            return self._batch.commit()
+        finally:
+            self._repo._written(self._paths)
+            self._paths = []
+
+
+class Repository:
+    def __init__(self, db):
+        self.db = db
+        self._snaps: Dict[str, Any] = {}
+        self._pending: Dict[str, Any] = {}
+        self.stats = {
+            "reads": 0,
+            "writes": 0,
+            "roundTrips": 0,
+            "cacheHits": 0,
+        }
+
+    # --- client surface ---
+    def collection(self, name: str):
+        return self.db.collection(name)
+
+    def collection_group(self, name: str):
+        return self.db.collection_group(name)
+
+    def ref(self, *path: str):
+        """``ref("pets", pet_id, "applications", app_id)`` -> DocumentReference."""
+        if not path or len(path) % 2:
+            raise ValueError("document path needs an even number of segments")
+        ref = self.db.collection(path[0]).document(path[1])
+        for i in range(2, len(path), 2):
+            ref = ref.collection(path[i]).document(path[i + 1])
+        return ref
+
+    def batch(self) -> RepoBatch:
+        return RepoBatch(self)
+
+    def run_transaction(self, fn):
+        # whatever the transaction touched is stale in the snapshot cache
+        self._snaps.clear()
+        self.stats["roundTrips"] += 1
+        return run_transaction(self.db, fn)
+
+    # --- reads ---
+    def load(self, ref) -> Deferred:
+        if ref.path not in self._snaps:
+            self._pending[ref.path] = ref
+        return Deferred(self, ref)
+
+    def get(self, ref):
+        return self._resolve(ref)
+
+    def get_all(self, refs: Iterable[Any]) -> List[Any]:
+        refs = list(refs)
+        for ref in refs:
+            self.load(ref)
+        return [self._resolve(ref) for ref in refs]
+
+    def stream(self, query) -> List[Any]:
+        snaps = list(query.stream())
+        self.stats["roundTrips"] += 1
+        self.stats["reads"] += max(1, len(snaps))
+        for s in snaps:
+            self._snaps[s.reference.path] = s
+        return snaps
+
+    def _resolve(self, ref):
+        snap = self._snaps.get(ref.path)
+        if snap is not None:
+            self.stats["cacheHits"] += 1
+            return snap
+        self._pending[ref.path] = ref
+        self._flush()
+        return self._snaps[ref.path]
+
+    def _flush(self):
+        pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        refs = list(pending.values())
+        if len(refs) == 1:
+            snaps = [refs[0].get()]
+        else:
+            snaps = list(self.db.get_all(refs))
+        self.stats["roundTrips"] += 1
+        self.stats["reads"] += len(refs)
+        for snap in snaps:
+            self._snaps[snap.reference.path] = snap
+
+    # --- writes ---
+    def set(self, ref, data, merge=False):
+        batch = self.batch()
+        batch.set(ref, data, merge=merge)
+        batch.commit()
+
+    def _written(self, paths: List[str]):
+        self.stats["writes"] += len(paths)
+        self.stats["roundTrips"] += 1
+        # stale after a write; the next read goes back to Firestore
+        for p in paths:
+            self._snaps.pop(p, None)
+
+
+def request_repository(db) -> Repository:
+    """The Repository for the current Flask request, created on first use."""
+    if "repo" not in g:
+        g.repo = Repository(db)
+    return g.repo
+
+
+def install_request_stats(app):
+    """Expose the current request's Firestore counters as response headers."""
+
+    @app.after_request
+    def _repo_stats_headers(response):
+        repo = g.get("repo")
+        if repo is not None:
+            response.headers["X-Firestore-Reads"] = str(repo.stats["reads"])
+            response.headers["X-Firestore-Writes"] = str(repo.stats["writes"])
+            response.headers["X-Firestore-Round-Trips"] = str(repo.stats["roundTrips"])
+        return response
+
+    return app
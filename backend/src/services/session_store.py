@@ -0,0 +1,75 @@
+"""Bounded in-process session store with idle expiry.
+
+Sessions are keyed by an unguessable token. Each access renews the idle
+TTL and moves the session to the back of an LRU order. Inserts first drop
+expired sessions from the front, then the least recently used ones until
+the store is back under ``max_sessions``. The state lives in the worker's
+memory, so a session only resolves on the worker that created it. Behind
+a multi-worker server, route on the token or accept that a client whose
+request lands elsewhere gets a miss and starts over.
+"""
+
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+
+class SessionStore:
+    def __init__(self, max_sessions: int = 5000, ttl: float = 900.0):
+        self.max_sessions = max(1, max_sessions)
+        self.ttl = ttl
+        # token -> (expires at, value), least recently used first
+        self._sessions: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"created": 0, "hits": 0, "misses": 0, "expired": 0, "evicted": 0}
+
+    def create(self, value: Any) -> str:
+        token = secrets.token_urlsafe(16)
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            while len(self._sessions) >= self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.stats["evicted"] += 1
+            self._sessions[token] = (now + self.ttl, value)
+            self.stats["created"] += 1
+        return token
+
+    def get(self, token: str) -> Optional[Any]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._sessions.get(token)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._sessions[token]
+                    self.stats["expired"] += 1
+                self.stats["misses"] += 1
+                return None
+            self._sessions[token] = (now + self.ttl, entry[1])
+            self._sessions.move_to_end(token)
+            self.stats["hits"] += 1
+            return entry[1]
+
+    def delete(self, token: str):
+        with self._lock:
+            self._sessions.pop(token, None)
+
+    def _expire(self, now: float):
+        # renewals move to the back, so expired sessions gather at the front
+        while self._sessions:
+            token, (expires, _) = next(iter(self._sessions.items()))
+            if expires > now:
+                break
+            del self._sessions[token]
+            self.stats["expired"] += 1
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "maxSessions": self.max_sessions,
+                "ttlSeconds": self.ttl,
+                **self.stats,
+            }
@@ -0,0 +1,115 @@
+"""Single-flight deduplication of identical in-flight calls.
+
+When many requests need the same upstream result at the same moment (a
+campaign link sending a whole city to /api/nearby-posts, say), only the
+first caller for a key runs the call; the rest block on it and get the same
+result or the same exception. Nothing is cached: once the call finishes the
+key is forgotten, so the next caller starts a fresh one.
+
+Waiters honour the request deadline from ``http_client``: a waiter whose
+budget runs out gives up with ``DeadlineExceeded`` without cancelling the
+call the others are still waiting on.
+"""
+
+import asyncio
+import threading
+from typing import Any, Callable, Dict, Hashable
+
+from services.http_client import DeadlineExceeded, remaining
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "shared": 0, "abandoned": 0}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.stats["calls"] += 1
+            else:
+                call.waiters += 1
+                self.stats["shared"] += 1
+
+        if leader:
+            try:
+                call.result = fn()
+            except BaseException as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    self._calls.pop(key, None)
+                call.done.set()
+        else:
+            budget = remaining()
+            if not call.done.wait(None if budget is None else max(0.0, budget)):
+                with self._lock:
+                    self.stats["abandoned"] += 1
+                raise DeadlineExceeded(f"{self.name}: gave up waiting on shared call")
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+
+class AsyncSingleFlight:
+    """asyncio version: the shared call runs as its own task.
+
+    A cancelled waiter only stops waiting; the task is cancelled once no
+    caller is left waiting on it.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._tasks: Dict[Hashable, Any] = {}
+        self._waiters: Dict[Hashable, int] = {}
+        self.stats = {"calls": 0, "shared": 0, "cancelled": 0}
+
+    async def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._tasks[key] = task
+            self._waiters[key] = 0
+            self.stats["calls"] += 1
+            task.add_done_callback(lambda _t, k=key: self._forget(k, _t))
+        else:
+            self.stats["shared"] += 1
+
+        self._waiters[key] += 1
+        try:
+            budget = remaining()
+            return await asyncio.wait_for(asyncio.shield(task), budget)
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded(f"{self.name}: gave up waiting on shared call")
+        finally:
+            left = self._waiters.get(key, 0) - 1
+            if key in self._waiters:
+                self._waiters[key] = left
+            if left <= 0 and not task.done():
+                task.cancel()
+                self.stats["cancelled"] += 1
+
+    def _forget(self, key: Hashable, task):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+            self._waiters.pop(key, None)
@@ -0,0 +1,60 @@
+"""Short-lived, single-use tickets for EventSource connections.
+
+EventSource can't set an Authorization header, and a Firebase ID token in a
+query string ends up in proxy and access logs, where it stays valid for up
+to an hour. Instead the client POSTs with its bearer token for a ticket and
+opens the stream with ``?ticket=``. A ticket is good for one connection
+within ``STREAM_TICKET_TTL_SECONDS``; reconnecting takes a new one.
+
+Tickets live in ``streamTickets/{sha256(ticket)}`` so any worker can redeem
+one, and only the hash is stored. Redeeming deletes the document in a
+transaction, so two connections racing on one ticket can't both win.
+Set a Firestore TTL policy on ``expiresAt`` to sweep unredeemed tickets.
+"""
+
+import hashlib
+import os
+import secrets
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from services.firestore_batch import run_transaction
+
+COLLECTION = "streamTickets"
+TTL_SECONDS = float(os.environ.get("STREAM_TICKET_TTL_SECONDS", "60"))
+
+
+def _ref(db, ticket: str):
+    digest = hashlib.sha256(ticket.encode("utf-8")).hexdigest()
+    return db.collection(COLLECTION).document(digest)
+
+
+def issue(db, uid: str) -> str:
+    ticket = secrets.token_urlsafe(32)
+    expires = datetime.now(timezone.utc) + timedelta(seconds=TTL_SECONDS)
+    _ref(db, ticket).set({"uid": uid, "expiresAt": expires})
+    return ticket
+
+
+def redeem(db, ticket: Optional[str]) -> Optional[str]:
+    """The uid the ticket was issued to, or None if it's unknown, used or expired."""
+    if not ticket:
+        return None
+    ref = _ref(db, ticket)
+
+    def _redeem(transaction):
+        snap = ref.get(transaction=transaction)
+        if not snap.exists:
+            return None
+        transaction.delete(ref)
+        doc = snap.to_dict() or {}
+        expires = doc.get("expiresAt")
+        if not isinstance(expires, datetime):
+            return None
+        if expires.tzinfo is None:
+            expires = expires.replace(tzinfo=timezone.utc)
+        if expires <= datetime.now(timezone.utc):
+            return None
+        return doc.get("uid")
+
+    return run_transaction(db, _redeem)
@@ -0,0 +1,190 @@
+"""Rolling 7-day pet view counts.
+
+``POST /api/pets/<id>/view`` only bumps an in-memory counter. A background
+thread flushes the aggregated counts every ``VIEW_FLUSH_SECONDS`` into
+per-day sharded counter documents (``pets/{id}/viewShards/{day}-{shard}``),
+so a popular pet never sees more than a handful of writes per second no
+matter how many workers serve it. Every ``VIEW_ROLLUP_SECONDS`` the last
+seven daily buckets are summed back into ``pets/{id}.views7d``, which is what
+``compute_urgency`` and ``build_why_urgent`` read.
+
+The endpoint is unauthenticated, so at most ``VIEW_MAX_PENDING_PETS``
+distinct ids are buffered between flushes; views of further new ids are
+dropped until the next flush.
+"""
+
+import atexit
+import os
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, Optional, Set
+
+from services import clients
+from services.firestore_batch import commit_in_chunks
+
+firestore = clients.lazy_import("firebase_admin.firestore")
+
+WINDOW_DAYS = 7
+RETENTION_DAYS = WINDOW_DAYS + 2
+NUM_SHARDS = int(os.environ.get("VIEW_SHARDS", "8"))
+FLUSH_SECONDS = float(os.environ.get("VIEW_FLUSH_SECONDS", "10"))
+ROLLUP_SECONDS = float(os.environ.get("VIEW_ROLLUP_SECONDS", "900"))
+MAX_PENDING_PETS = int(os.environ.get("VIEW_MAX_PENDING_PETS", "10000"))
+
+
+def day_key(dt: Optional[datetime] = None) -> str:
+    return (dt or datetime.now(timezone.utc)).strftime("%Y-%m-%d")
+
+
+def window_start(now: Optional[datetime] = None, days: int = WINDOW_DAYS) -> str:
+    now = now or datetime.now(timezone.utc)
+    return day_key(now - timedelta(days=days - 1))
+
+
+class ViewCounter:
+    def __init__(
+        self,
+        db,
+        num_shards: int = NUM_SHARDS,
+        max_pending: int = MAX_PENDING_PETS,
+    ):
+        self.db = db
+        self.num_shards = max(1, num_shards)
+        self.max_pending = max(1, max_pending)
+        self._pending: Dict[str, int] = {}
+        self._touched: Set[str] = set()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.stats = {
+            "recorded": 0,
+            "flushes": 0,
+            "flushedPets": 0,
+            "droppedPets": 0,
+            "droppedViews": 0,
+            "rollups": 0,
+        }
+
+    def record(self, pet_id: str, n: int = 1) -> bool:
+        """Buffer ``n`` views; False if the id was dropped because the buffer is full."""
+        with self._lock:
+            if pet_id not in self._pending and len(self._pending) >= self.max_pending:
+                self.stats["droppedViews"] += n
+                return False
+            self._pending[pet_id] = self._pending.get(pet_id, 0) + n
+            self.stats["recorded"] += n
+        self.start()
+        return True
+
+    def _restore(self, pending: Dict[str, int]):
+        # put the counts back so the next flush retries them
+        with self._lock:
+            for pet_id, count in pending.items():
+                self._pending[pet_id] = self._pending.get(pet_id, 0) + count
+
+    def flush(self) -> int:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        try:
+            # view ids come from clients; drop the ones that aren't pets so a
+            # caller can't make us create shard docs under arbitrary ids
+            refs = [self.db.collection("pets").document(pet_id) for pet_id in pending]
+            known = {s.id for s in self.db.get_all(refs) if s.exists}
+        except Exception:
+            self._restore(pending)
+            raise
+        dropped = len(pending) - len(known)
+        pending = {k: v for k, v in pending.items() if k in known}
+
+        day = day_key()
+        writes = []
+        for pet_id, count in pending.items():
+            shard = random.randrange(self.num_shards)
+            ref = (
+                self.db.collection("pets")
+                .document(pet_id)
+                .collection("viewShards")
+                .document(f"{day}-{shard}")
+            )
+            writes.append(
+                (ref, {"day": day, "count": firestore.Increment(count)}, True)
+            )
+        try:
+            commit_in_chunks(self.db, writes)
+        except Exception:
+            self._restore(pending)
+            raise
+
+        with self._lock:
+            self._touched.update(pending)
+            self.stats["flushes"] += 1
+            self.stats["flushedPets"] += len(pending)
+            self.stats["droppedPets"] += dropped
+        return len(pending)
+
+    def rollup(self, pet_ids: Optional[Iterable[str]] = None) -> int:
+        """Recompute views7d for touched pets plus any pet whose window may shrink."""
+        with self._lock:
+            touched, self._touched = self._touched, set()
+        ids = set(pet_ids) if pet_ids is not None else set(touched)
+        if pet_ids is None:
+            decaying = self.db.collection("pets").where("views7d", ">", 0).stream()
+            ids.update(s.id for s in decaying)
+
+        start = window_start()
+        oldest_kept = window_start(days=RETENTION_DAYS)
+        # view ids come from clients; never materialize a pet that doesn't exist
+        refs = [self.db.collection("pets").document(pet_id) for pet_id in ids]
+        existing = [s.reference for s in self.db.get_all(refs) if s.exists]
+
+        writes = []
+        for pet_ref in existing:
+            total = 0
+            for shard in pet_ref.collection("viewShards").stream():
+                d = shard.to_dict() or {}
+                day = d.get("day", "")
+                if day >= start:
+                    total += int(d.get("count", 0) or 0)
+                elif day < oldest_kept:
+                    shard.reference.delete()
+            writes.append((pet_ref, {"views7d": total}, True))
+        commit_in_chunks(self.db, writes)
+
+        with self._lock:
+            self.stats["rollups"] += 1
+        return len(writes)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=self._run, name="view-counter", daemon=True
+            )
+            self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        self._stop.set()
+        try:
+            self.flush()
+        except Exception:
+            pass
+
+    def _run(self):
+        next_rollup = time.monotonic() + ROLLUP_SECONDS
+        while not self._stop.wait(FLUSH_SECONDS):
+            try:
+                self.flush()
+                if time.monotonic() >= next_rollup:
+                    next_rollup = time.monotonic() + ROLLUP_SECONDS
+                    self.rollup()
+            except Exception as e:
+                print(f"[views] flush/rollup failed: {e}")
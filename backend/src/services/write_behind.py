@@ -0,0 +1,334 @@
+"""Write-behind ingestion through a local journal.
+
+``submit`` appends the document to an on-disk journal segment (fsynced)
+and returns at once. A background flusher rotates the segment every
+``WRITE_BEHIND_FLUSH_SECONDS``, or sooner once ``WRITE_BEHIND_BATCH`` entries
+are waiting, and commits it to Firestore in chunked batches. The segment is
+deleted only after every chunk has committed.
+
+Document ids are derived from the client's idempotency key, so a retried
+submit or a segment replayed after a crash rewrites the same document instead
+of adding a second one.
+
+Segments are per process (``<name>-<owner>-<seq>``, where the owner is the
+pid plus a random nonce, since containers reuse pids). Each owner holds an
+flock on ``<name>-<owner>.lock`` for as long as it runs. A worker flushes
+its own segments and those of owners whose lock is free or gone, so a crash
+between acknowledging and flushing loses nothing, and a live worker's
+segments are never taken from it.
+"""
+
+import atexit
+import fcntl
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from services.firestore_batch import commit_in_chunks
+
+JOURNAL_DIR = os.environ.get("WRITE_BEHIND_DIR", "/tmp/instanimals-journal")
+FLUSH_SECONDS = float(os.environ.get("WRITE_BEHIND_FLUSH_SECONDS", "1"))
+FLUSH_BATCH = int(os.environ.get("WRITE_BEHIND_BATCH", "200"))
+FSYNC = os.environ.get("WRITE_BEHIND_FSYNC", "1") != "0"
+RETRY_MAX_SECONDS = 60.0
+
+_OPEN = ".open"
+_READY = ".ready"
+_FLUSHING = ".flushing"
+_LOCK = ".lock"
+
+
+def doc_id_for(idempotency_key: str) -> str:
+    return "wb_" + hashlib.sha256(idempotency_key.encode("utf-8")).hexdigest()[:32]
+
+
+def _owner_of(path: Path) -> Optional[str]:
+    """Writer for open/ready segments, claiming flusher for flushing ones."""
+    parts = path.stem.split("-")
+    if len(parts) < 3:
+        return None
+    return parts[-1] if path.suffix == _FLUSHING else parts[-2]
+
+
+class WriteBehindJournal:
+    def __init__(self, db, collection: str, directory: str = JOURNAL_DIR):
+        self.db = db
+        self.collection = collection
+        self.dir = Path(directory)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._fh = None
+        self._seq = 0
+        self._pid: Optional[int] = None
+        self._owner = ""
+        self._lock_fh = None
+        self._open_path: Optional[Path] = None
+        self._open_count = 0
+        # acceptedAt of the oldest entry not yet committed, open / rotated
+        self._oldest_open: Optional[float] = None
+        self._oldest_unflushed: Optional[float] = None
+        self._retry_at = 0.0
+        self._failures_in_row = 0
+        self.stats = {
+            "accepted": 0,
+            "flushed": 0,
+            "segmentsFlushed": 0,
+            "recoveredSegments": 0,
+            "recoveredEntries": 0,
+            "flushFailures": 0,
+            "lastFlushAt": None,
+            "lastError": None,
+        }
+
+    # --- write path ---
+    def submit(
+        self, data: Dict[str, Any], idempotency_key: Optional[str] = None
+    ) -> str:
+        """Journal one document and return its id; raises OSError if the disk write fails."""
+        key = idempotency_key or uuid.uuid4().hex
+        doc_id = doc_id_for(key)
+        line = json.dumps(
+            {"id": doc_id, "acceptedAt": time.time(), "data": data},
+            separators=(",", ":"),
+            default=str,
+        )
+        with self._lock:
+            fh = self._segment()
+            fh.write(line + "\n")
+            fh.flush()
+            if FSYNC:
+                os.fsync(fh.fileno())
+            self._open_count += 1
+            self.stats["accepted"] += 1
+            if self._oldest_open is None:
+                self._oldest_open = time.time()
+            full = self._open_count >= FLUSH_BATCH
+        self.start()
+        if full:
+            self._wake.set()
+        return doc_id
+
+    # --- ownership ---
+    def _identity(self) -> str:
+        """This process's owner id, renewed after a fork so children don't share it."""
+        if self._pid != os.getpid():
+            if self._lock_fh is not None:
+                # the parent's lock and open segment stay the parent's
+                self._lock_fh.close()
+                self._lock_fh = None
+                if self._fh is not None:
+                    self._fh.close()
+                self._fh = None
+                self._open_path = None
+                self._open_count = 0
+            self._pid = os.getpid()
+            self._owner = f"{self._pid}_{uuid.uuid4().hex[:8]}"
+            self._seq = 0
+        return self._owner
+
+    def _lock_path(self, owner: str) -> Path:
+        return self.dir / f"{self.collection}-{owner}{_LOCK}"
+
+    def _hold_lock(self):
+        if self._lock_fh is None:
+            fh = open(self._lock_path(self._identity()), "a")
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            self._lock_fh = fh
+
+    def _owner_alive(self, owner: str, seen: Dict[str, bool]) -> bool:
+        """An owner is alive while it holds its lock; dead owners' locks are removed."""
+        if owner == self._identity():
+            return True
+        if owner not in seen:
+            try:
+                fh = open(self._lock_path(owner))
+            except OSError:
+                seen[owner] = False
+                return False
+            with fh:
+                try:
+                    fcntl.flock(fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    seen[owner] = True
+                    return True
+                # no segment of a dead owner needs the lock: missing means dead
+                self._lock_path(owner).unlink(missing_ok=True)
+            seen[owner] = False
+        return seen[owner]
+
+    def _segment(self):
+        owner = self._identity()
+        if self._fh is None:
+            self.dir.mkdir(parents=True, exist_ok=True)
+            self._hold_lock()
+            self._seq += 1
+            name = f"{self.collection}-{owner}-{self._seq}"
+            self._open_path = self.dir / (name + _OPEN)
+            self._fh = open(self._open_path, "a", encoding="utf-8")
+            self._open_count = 0
+        return self._fh
+
+    def _rotate(self):
+        with self._lock:
+            if self._fh is None:
+                return
+            self._fh.close()
+            self._fh = None
+            self._open_path.rename(self._open_path.with_suffix(_READY))
+            self._open_path = None
+            if self._oldest_unflushed is None:
+                self._oldest_unflushed = self._oldest_open
+            self._oldest_open = None
+
+    # --- flush path ---
+    def _recover(self, seen: Dict[str, bool]):
+        """Requeue segments orphaned by processes that are no longer running."""
+        if not self.dir.exists():
+            return
+        for path in self.dir.glob(f"{self.collection}-*"):
+            if path.suffix not in (_OPEN, _FLUSHING):
+                continue
+            owner = _owner_of(path)
+            if owner is None or self._owner_alive(owner, seen):
+                continue
+            # a flushing segment goes back under its writer's name
+            stem = (
+                path.stem.rsplit("-", 1)[0] if path.suffix == _FLUSHING else path.stem
+            )
+            try:
+                path.rename(path.with_name(stem + _READY))
+                self.stats["recoveredSegments"] += 1
+            except OSError:
+                pass  # another worker got it first
+
+    def _read_segment(self, path: Path) -> List[Dict[str, Any]]:
+        entries = []
+        with open(path, encoding="utf-8") as fh:
+            for line in fh:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    # torn final line from a crash mid-append; it was never acked
+                    continue
+        return entries
+
+    def _commit(self, entries: List[Dict[str, Any]]):
+        col = self.db.collection(self.collection)
+        writes = []
+        for e in entries:
+            doc = dict(e["data"])
+            doc["submittedAt"] = datetime.fromtimestamp(e["acceptedAt"], timezone.utc)
+            writes.append((col.document(e["id"]), doc, False))
+        commit_in_chunks(self.db, writes)
+
+    def flush(self) -> int:
+        """
+        Rotate the open segment and commit every ready one this process owns
+        or has inherited from a dead owner. Returns docs written.
+        """
+        self._rotate()
+        seen: Dict[str, bool] = {}
+        self._recover(seen)
+        if not self.dir.exists():
+            return 0
+        me = self._identity()
+        # claimed segments are named after us, so be visibly alive first
+        self._hold_lock()
+        written = 0
+        for path in sorted(self.dir.glob(f"{self.collection}-*{_READY}")):
+            writer = _owner_of(path)
+            if writer is None:
+                continue
+            if writer != me and self._owner_alive(writer, seen):
+                continue  # a live worker flushes its own
+            claimed = path.with_name(f"{path.stem}-{me}{_FLUSHING}")
+            try:
+                path.rename(claimed)
+            except OSError:
+                continue  # claimed by another worker
+            entries = self._read_segment(claimed)
+            try:
+                if entries:
+                    self._commit(entries)
+            except Exception:
+                claimed.rename(path)
+                raise
+            claimed.unlink()
+            written += len(entries)
+            with self._lock:
+                key = "flushed" if writer == me else "recoveredEntries"
+                self.stats[key] += len(entries)
+                self.stats["segmentsFlushed"] += 1
+        with self._lock:
+            self.stats["lastFlushAt"] = time.time()
+            self._oldest_unflushed = None
+        return written
+
+    # --- lifecycle ---
+    def start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=self._run, name=f"write-behind-{self.collection}", daemon=True
+            )
+            self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"[write-behind] final flush failed, journal kept on disk: {e}")
+            return
+        # nothing of ours is left on disk, so the lock file can go too
+        if self._lock_fh is not None and self._pid == os.getpid():
+            self._lock_path(self._owner).unlink(missing_ok=True)
+            self._lock_fh.close()
+            self._lock_fh = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(FLUSH_SECONDS)
+            self._wake.clear()
+            if self._stop.is_set() or time.monotonic() < self._retry_at:
+                continue
+            try:
+                self.flush()
+                self._failures_in_row = 0
+            except Exception as e:
+                self._failures_in_row += 1
+                delay = min(RETRY_MAX_SECONDS, FLUSH_SECONDS * 2**self._failures_in_row)
+                self._retry_at = time.monotonic() + delay
+                with self._lock:
+                    self.stats["flushFailures"] += 1
+                    self.stats["lastError"] = str(e)
+                print(f"[write-behind] flush failed, retrying in {delay:.1f}s: {e}")
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            pending = [t for t in (self._oldest_open, self._oldest_unflushed) if t]
+            oldest = min(pending) if pending else None
+            return {
+                **self.stats,
+                "backlog": self.stats["accepted"] - self.stats["flushed"],
+                "flushLagSeconds": round(time.time() - oldest, 3) if oldest else 0.0,
+                "openSegmentEntries": self._open_count if self._fh else 0,
+                "readySegments": (
+                    len(list(self.dir.glob(f"{self.collection}-*{_READY}")))
+                    if self.dir.exists()
+                    else 0
+                ),
+            }